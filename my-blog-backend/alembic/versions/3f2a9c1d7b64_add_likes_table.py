@@ -0,0 +1,46 @@
+"""add likes table
+
+旧的点赞接口只对 likes 计数加一，没有记录是哪个用户点的赞，因此无法回填 likes 表：
+已有的点赞数保持不变，但没有对应的点赞记录，之前点过赞的用户还可以再点赞一次。
+
+Revision ID: 3f2a9c1d7b64
+Revises: c979517aca26
+Create Date: 2026-10-18 10:12:40.215731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b64'
+down_revision: Union[str, None] = 'c979517aca26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('likes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('target_type', sa.String(length=20), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'target_type', 'target_id', name='uq_likes_user_target'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4'
+    )
+    op.create_index(op.f('ix_likes_id'), 'likes', ['id'], unique=False)
+    op.create_index('ix_likes_target', 'likes', ['target_type', 'target_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_likes_target', table_name='likes')
+    op.drop_index(op.f('ix_likes_id'), table_name='likes')
+    op.drop_table('likes')
@@ -0,0 +1,39 @@
+"""add ip geolocations table
+
+Revision ID: 4d9a7c2e1f85
+Revises: b82d5f0e4c19
+Create Date: 2026-10-18 21:06:43.518274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d9a7c2e1f85'
+down_revision: Union[str, None] = 'b82d5f0e4c19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ip_geolocations',
+        sa.Column('ip_address', sa.String(length=50), nullable=False),
+        sa.Column('province', sa.String(length=50), nullable=False),
+        sa.Column('city', sa.String(length=50), nullable=False),
+        sa.Column('isp', sa.String(length=50), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('ip_address'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4'
+    )
+    op.create_index(op.f('ix_ip_geolocations_province'), 'ip_geolocations', ['province'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ip_geolocations_province'), table_name='ip_geolocations')
+    op.drop_table('ip_geolocations')
@@ -0,0 +1,39 @@
+"""add article rendered fields
+
+Revision ID: 5b7e0c3d9a12
+Revises: 8d41e6b2a5c0
+Create Date: 2026-10-18 18:40:05.112734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e0c3d9a12'
+down_revision: Union[str, None] = '8d41e6b2a5c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('content_html', sa.Text().with_variant(mysql.MEDIUMTEXT(), 'mysql'), nullable=True))
+    op.add_column('articles', sa.Column('toc', sa.JSON(), nullable=True))
+    op.add_column('articles', sa.Column('excerpt', sa.String(length=300), nullable=True))
+    op.add_column('articles', sa.Column('word_count', sa.Integer(), nullable=True))
+    # reading_time 已由 c979517aca26 添加，通过 create_all 建表的库可能没有该列
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('articles')}
+    if 'reading_time' not in columns:
+        op.add_column('articles', sa.Column('reading_time', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'word_count')
+    op.drop_column('articles', 'excerpt')
+    op.drop_column('articles', 'toc')
+    op.drop_column('articles', 'content_html')
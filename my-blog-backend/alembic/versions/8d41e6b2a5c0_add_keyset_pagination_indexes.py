@@ -0,0 +1,35 @@
+"""add keyset pagination indexes
+
+Revision ID: 8d41e6b2a5c0
+Revises: 3f2a9c1d7b64
+Create Date: 2026-10-18 11:02:18.640352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e6b2a5c0'
+down_revision: Union[str, None] = '3f2a9c1d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_articles_status_created_at_id', 'articles', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_comments_article_created_at_id', 'comments', ['article_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_notifications_user_created_at_id', 'notifications', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_visitor_logs_request_time_id', 'visitor_logs', ['request_time', 'id'], unique=False)
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_visitor_logs_request_time_id', table_name='visitor_logs')
+    op.drop_index('ix_notifications_user_created_at_id', table_name='notifications')
+    op.drop_index('ix_comments_article_created_at_id', table_name='comments')
+    op.drop_index('ix_articles_status_created_at_id', table_name='articles')
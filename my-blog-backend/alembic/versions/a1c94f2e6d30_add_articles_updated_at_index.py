@@ -0,0 +1,27 @@
+"""add articles updated_at index
+
+Revision ID: a1c94f2e6d30
+Revises: 5b7e0c3d9a12
+Create Date: 2026-10-18 19:05:41.298017
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c94f2e6d30'
+down_revision: Union[str, None] = '5b7e0c3d9a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_articles_updated_at', 'articles', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_articles_updated_at', table_name='articles')
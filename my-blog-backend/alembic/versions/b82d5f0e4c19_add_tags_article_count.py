@@ -0,0 +1,38 @@
+"""add tags article_count
+
+Revision ID: b82d5f0e4c19
+Revises: e6f3b8a41c27
+Create Date: 2026-10-18 20:14:52.361905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b82d5f0e4c19'
+down_revision: Union[str, None] = 'e6f3b8a41c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tags', sa.Column('article_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_tags_article_count'), 'tags', ['article_count'], unique=False)
+    # 按已发布文章回填
+    op.execute("""
+        UPDATE tags SET article_count = (
+            SELECT COUNT(*) FROM article_tags
+            JOIN articles ON articles.id = article_tags.article_id
+            WHERE article_tags.tag_id = tags.id AND articles.status = 'published'
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tags_article_count'), table_name='tags')
+    op.drop_column('tags', 'article_count')
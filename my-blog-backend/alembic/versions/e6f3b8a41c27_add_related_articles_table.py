@@ -0,0 +1,40 @@
+"""add related articles table
+
+Revision ID: e6f3b8a41c27
+Revises: a1c94f2e6d30
+Create Date: 2026-10-18 19:32:17.804126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f3b8a41c27'
+down_revision: Union[str, None] = 'a1c94f2e6d30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('related_articles',
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('related_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+        sa.ForeignKeyConstraint(['related_id'], ['articles.id'], ),
+        sa.PrimaryKeyConstraint('article_id', 'rank'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8mb4'
+    )
+    op.create_index(op.f('ix_related_articles_related_id'), 'related_articles', ['related_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_related_articles_related_id'), table_name='related_articles')
+    op.drop_table('related_articles')
@@ -0,0 +1,125 @@
+"""
+IP地址段查询性能对比
+
+生成指定数量的连续IPv4地址段（以及一部分IPv6地址段），对比逐段线性扫描与
+IPRangeIndex 二分查找、映射二进制IP库（MappedIPDatabase）的单次查询耗时，并校验结果一致。
+
+用法:
+    python benchmark_ip_lookup.py [--ranges 300000] [--lookups 2000]
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import tempfile
+import time
+
+from src.utils.ip_database import MappedIPDatabase, write_ip_database
+from src.utils.ip_range_index import IPRangeIndex
+
+PROVINCES = ["北京市", "上海市", "广东省", "浙江省", "江苏省", "四川省", "湖北省", "山东省"]
+ISPS = ["电信", "联通", "移动"]
+
+
+def generate_entries(count: int, ipv6_ratio: float = 0.1):
+    """生成互不重叠的地址段记录"""
+    entries = []
+    v6_count = int(count * ipv6_ratio)
+    v4_count = count - v6_count
+
+    step = (2 ** 32 - 2 ** 24) // v4_count
+    for i in range(v4_count):
+        start = 2 ** 24 + i * step
+        entries.append({
+            "start_ip": str(ipaddress.IPv4Address(start)),
+            "end_ip": str(ipaddress.IPv4Address(start + step - 1)),
+            "province": PROVINCES[i % len(PROVINCES)],
+            "city": "未知",
+            "isp": ISPS[i % len(ISPS)]
+        })
+
+    base = int(ipaddress.IPv6Address("2400::"))
+    for i in range(v6_count):
+        start = base + (i << 96)
+        entries.append({
+            "start_ip": str(ipaddress.IPv6Address(start)),
+            "end_ip": str(ipaddress.IPv6Address(start + (1 << 96) - 1)),
+            "province": PROVINCES[i % len(PROVINCES)],
+            "city": "未知",
+            "isp": ISPS[i % len(ISPS)]
+        })
+    random.shuffle(entries)
+    return entries
+
+
+def linear_lookup(ranges, ip: str):
+    """原实现：逐段比较"""
+    address = ipaddress.ip_address(ip)
+    ip_int = int(address)
+    for start, end, version, location in ranges:
+        if version == address.version and start <= ip_int <= end:
+            return location
+    return None
+
+
+def main(range_count: int, lookup_count: int):
+    entries = generate_entries(range_count)
+    sample = [
+        str(ipaddress.IPv4Address(random.randint(2 ** 24, 2 ** 32 - 1))) if random.random() < 0.9
+        else str(ipaddress.IPv6Address(int(ipaddress.IPv6Address("2400::")) + random.randint(0, 2 ** 100)))
+        for _ in range(lookup_count)
+    ]
+
+    t0 = time.perf_counter()
+    ranges = []
+    for item in entries:
+        start, end = ipaddress.ip_address(item["start_ip"]), ipaddress.ip_address(item["end_ip"])
+        ranges.append((int(start), int(end), start.version, {"province": item["province"], "city": item["city"], "isp": item["isp"]}))
+    linear_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = IPRangeIndex(entries)
+    index_build = time.perf_counter() - t0
+    print(f"📦 地址段 {len(index)} 条，构建耗时: 线性表 {linear_build:.2f}s，区间索引 {index_build:.2f}s")
+
+    # 线性扫描很慢，只测一部分
+    linear_sample = sample[:max(1, min(lookup_count, 200))]
+    t0 = time.perf_counter()
+    linear_results = [linear_lookup(ranges, ip) for ip in linear_sample]
+    linear_time = (time.perf_counter() - t0) / len(linear_sample)
+
+    t0 = time.perf_counter()
+    index_results = [index.lookup(ip) for ip in sample]
+    index_time = (time.perf_counter() - t0) / len(sample)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "ip_data.bin")
+        size = write_ip_database(index, path)
+        t0 = time.perf_counter()
+        database = MappedIPDatabase(path)
+        mapped_open = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        mapped_results = [database.lookup(ip) for ip in sample]
+        mapped_time = (time.perf_counter() - t0) / len(sample)
+        database.close()
+    print(f"📦 二进制IP库 {size / 1024 / 1024:.1f} MB，映射打开耗时 {mapped_open * 1000:.2f} ms")
+
+    mismatches = sum(1 for a, b in zip(linear_results, index_results) if a != b)
+    mismatches += sum(1 for a, b in zip(index_results, mapped_results) if a != b)
+    print(f"🐢 线性扫描: {linear_time * 1e6:.1f} µs/次（{len(linear_sample)} 次）")
+    print(f"🚀 二分查找: {index_time * 1e6:.1f} µs/次（{len(sample)} 次）")
+    print(f"🗺️ 映射文件: {mapped_time * 1e6:.1f} µs/次（{len(sample)} 次）")
+    print(f"📈 加速比: {linear_time / index_time:.0f}x")
+    if mismatches:
+        print(f"❌ 结果不一致: {mismatches} 次")
+    else:
+        print("✅ 各种方式的查询结果一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IP地址段查询性能对比")
+    parser.add_argument("--ranges", type=int, default=300000, help="地址段数量")
+    parser.add_argument("--lookups", type=int, default=2000, help="查询次数")
+    args = parser.parse_args()
+    main(args.ranges, args.lookups)
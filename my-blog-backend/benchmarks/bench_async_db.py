@@ -0,0 +1,103 @@
+"""
+同步会话 vs 异步会话 并发延迟基准测试
+
+在 async def 处理函数中使用同步 PyMySQL 会话时，每个查询都会阻塞事件循环，
+并发请求只能排队执行；改用 AsyncSession 后查询等待期间事件循环可以继续处理其他请求。
+
+本脚本构造两个等价的端点，分别通过 get_db 和 get_async_db 执行 SELECT SLEEP(n)
+模拟慢查询，用 httpx 在进程内并发压测，输出 p50/p95/p99 延迟。
+
+用法（需配置好 .env 中的数据库连接）：
+    python -m benchmarks.bench_async_db --requests 200 --concurrency 50 --query-delay 0.02
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.model.database import get_db, get_async_db, async_engine, engine
+
+app = FastAPI()
+QUERY_DELAY = 0.02
+
+
+@app.get('/sync')
+async def sync_endpoint(db: Session = Depends(get_db)):
+    # 旧写法：async def + 同步会话，查询期间阻塞事件循环
+    db.execute(text("SELECT SLEEP(:delay)"), {"delay": QUERY_DELAY})
+    return {"ok": True}
+
+
+@app.get('/async')
+async def async_endpoint(db: AsyncSession = Depends(get_async_db)):
+    await db.execute(text("SELECT SLEEP(:delay)"), {"delay": QUERY_DELAY})
+    return {"ok": True}
+
+
+def percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_load(client: httpx.AsyncClient, path: str, total: int, concurrency: int):
+    """以固定并发度请求指定路径，返回每个请求的耗时（毫秒）"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_request():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def report(name: str, latencies, elapsed: float):
+    print(
+        f"{name:<6} 请求数={len(latencies):<5} 吞吐={len(latencies) / elapsed:8.1f} req/s  "
+        f"p50={percentile(latencies, 50):8.1f}ms  p95={percentile(latencies, 95):8.1f}ms  "
+        f"p99={percentile(latencies, 99):8.1f}ms  max={max(latencies):8.1f}ms  "
+        f"mean={statistics.mean(latencies):8.1f}ms"
+    )
+
+
+async def main():
+    global QUERY_DELAY
+
+    parser = argparse.ArgumentParser(description="同步/异步数据库会话并发延迟对比")
+    parser.add_argument("--requests", type=int, default=200, help="每种模式的请求总数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发请求数")
+    parser.add_argument("--query-delay", type=float, default=0.02, help="模拟查询耗时（秒）")
+    args = parser.parse_args()
+    QUERY_DELAY = args.query_delay
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 预热连接池
+        await client.get('/sync')
+        await client.get('/async')
+
+        for name, path in (("before", "/sync"), ("after", "/async")):
+            latencies, elapsed = await run_load(client, path, args.requests, args.concurrency)
+            report(name, latencies, elapsed)
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+生成二进制IP库
+
+把 JSON 或 CSV 格式的IP地址库编译为紧凑的二进制文件（格式见 src/utils/ip_database.py），
+IPLocationService 启动时映射该文件，不再解析JSON。
+
+输入格式:
+    JSON: 与 data/ip_data.json 相同，[{"start_ip", "end_ip", "province", "city", "isp"}, ...]
+    CSV:  带表头，地址列为 start_ip,end_ip（IP字符串或整数）或 network（CIDR），
+          位置列为 province,city,isp，缺少的位置列记为“未知”
+
+用法:
+    python build_ip_database.py [data/ip_data.json] [--output data/ip_data.bin]
+    python build_ip_database.py ip_ranges.csv
+"""
+
+import argparse
+import csv
+import ipaddress
+import json
+import os
+import random
+import time
+
+from src.utils.ip_database import IP_DATABASE_PATH, MappedIPDatabase, write_ip_database
+from src.utils.ip_range_index import IPRangeIndex
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "data/ip_data.json")
+
+
+def _normalize_ip(value: str) -> str:
+    """整数形式的地址转换为IP字符串"""
+    value = (value or "").strip()
+    if value.isdigit():
+        return str(ipaddress.ip_address(int(value)))
+    return value
+
+
+def read_csv(path: str):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("network"):
+                network = ipaddress.ip_network(row["network"].strip(), strict=False)
+                start_ip, end_ip = str(network.network_address), str(network.broadcast_address)
+            else:
+                start_ip, end_ip = _normalize_ip(row.get("start_ip")), _normalize_ip(row.get("end_ip"))
+            yield {
+                "start_ip": start_ip,
+                "end_ip": end_ip,
+                "province": (row.get("province") or "未知").strip(),
+                "city": (row.get("city") or "未知").strip(),
+                "isp": (row.get("isp") or "未知").strip(),
+            }
+
+
+def read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def verify(index: IPRangeIndex, path: str, samples: int = 10000) -> int:
+    """抽样比较二进制文件与内存索引的查询结果，返回不一致的次数"""
+    database = MappedIPDatabase(path)
+    try:
+        addresses = []
+        for version in (4, 6):
+            starts, ends, _ = index.ranges(version)
+            for i in random.sample(range(len(starts)), min(samples, len(starts))):
+                for value in (starts[i], ends[i], ends[i] + 1):
+                    if value < 2 ** (32 if version == 4 else 128):
+                        addresses.append(ipaddress.IPv4Address(value) if version == 4 else ipaddress.IPv6Address(value))
+        return sum(1 for address in addresses if database.lookup(address) != index.lookup(address))
+    finally:
+        database.close()
+
+
+def main(input_path: str, output_path: str):
+    t0 = time.perf_counter()
+    try:
+        entries = read_csv(input_path) if input_path.lower().endswith(".csv") else read_json(input_path)
+        index = IPRangeIndex(entries)
+    except Exception as e:
+        print(f"❌ 读取IP库失败: {str(e)}")
+        raise
+    print(f"📦 读取 {input_path}: {len(index)} 个地址段，{len(index.locations)} 个不同位置，耗时 {time.perf_counter() - t0:.2f}s")
+
+    size = write_ip_database(index, output_path)
+    print(f"✅ 已写入 {output_path} ({size / 1024:.1f} KB)")
+
+    mismatches = verify(index, output_path)
+    if mismatches:
+        print(f"❌ 校验失败: {mismatches} 次查询结果不一致")
+        raise SystemExit(1)
+
+    t0 = time.perf_counter()
+    MappedIPDatabase(output_path).close()
+    print(f"🚀 映射打开耗时 {(time.perf_counter() - t0) * 1000:.2f} ms")
+    print("🎉 二进制IP库生成完成，重启服务后生效")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成二进制IP库")
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="JSON或CSV格式的IP库")
+    parser.add_argument("--output", default=IP_DATABASE_PATH, help="二进制IP库输出路径")
+    args = parser.parse_args()
+    main(args.input, args.output)
@@ -0,0 +1,29 @@
+"""
+全量重建相关文章
+
+重新计算所有已发布文章的相关文章并写入 related_articles 表。
+首次部署后执行一次，之后文章变化时由应用增量更新，也可以定期执行以校正IDF的漂移。
+
+用法:
+    python rebuild_related_articles.py
+"""
+
+import asyncio
+
+from src.model.database import async_engine
+from src.utils.related_articles import related_engine
+
+
+async def main():
+    try:
+        total = await related_engine.rebuild_all()
+        print(f"🎉 相关文章重建完成，共处理 {total} 篇文章")
+    except Exception as e:
+        print(f"❌ 相关文章重建失败: {str(e)}")
+        raise
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""
+重建标签文章数
+
+按 article_tags 和文章状态重新统计 tags.article_count，修正增量维护中产生的偏差。
+可在迁移数据或直接修改数据库后手动执行，也可以加入定时任务。
+
+用法:
+    python reconcile_tag_counts.py
+"""
+
+import asyncio
+
+from src.model.database import AsyncSessionLocal, async_engine
+from src.utils.tag_counts import reconcile_tag_counts
+
+
+async def main():
+    try:
+        async with AsyncSessionLocal() as db:
+            fixed = await reconcile_tag_counts(db)
+        for tag_id, (old, new) in fixed.items():
+            print(f"🔧 标签 {tag_id}: {old} -> {new}")
+        print(f"🎉 标签文章数校对完成，修正 {len(fixed)} 个标签")
+    except Exception as e:
+        print(f"❌ 校对失败: {str(e)}")
+        raise
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+批量渲染文章Markdown
+
+为已有文章生成 content_html、目录、摘要和阅读时间。
+默认只处理尚未渲染的文章，渲染规则变化后使用 --all 重新渲染全部文章。
+
+用法:
+    python rerender_articles.py [--all] [--batch-size 100]
+"""
+
+import argparse
+
+from sqlalchemy import select, update
+
+from src.model.database import SessionLocal
+from src.model.models import Article
+from src.utils.markdown_render import render_markdown
+
+
+def rerender_articles(rerender_all: bool = False, batch_size: int = 100) -> int:
+    """按ID分批渲染文章，返回处理的文章数"""
+    db = SessionLocal()
+    total = 0
+    last_id = 0
+    try:
+        while True:
+            query = select(Article).filter(Article.id > last_id)
+            if not rerender_all:
+                query = query.filter(Article.content_html.is_(None))
+            articles = db.scalars(query.order_by(Article.id).limit(batch_size)).all()
+            if not articles:
+                break
+
+            for article in articles:
+                rendered = render_markdown(article.content)
+                db.execute(
+                    update(Article).where(Article.id == article.id).values(
+                        content_html=rendered.html,
+                        toc=rendered.toc,
+                        excerpt=rendered.excerpt,
+                        word_count=rendered.word_count,
+                        reading_time=rendered.reading_time,
+                        # 渲染不算文章更新，保持updated_at不变
+                        updated_at=Article.updated_at
+                    ).execution_options(synchronize_session=False)
+                )
+            db.commit()
+
+            total += len(articles)
+            last_id = articles[-1].id
+            print(f"✅ 已渲染 {total} 篇文章（最后ID: {last_id}）")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ 渲染失败: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+    print(f"🎉 渲染完成，共处理 {total} 篇文章")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量渲染文章Markdown")
+    parser.add_argument("--all", action="store_true", help="重新渲染全部文章，而不仅是未渲染的文章")
+    parser.add_argument("--batch-size", type=int, default=100, help="每批处理的文章数")
+    args = parser.parse_args()
+    rerender_articles(rerender_all=args.all, batch_size=args.batch_size)
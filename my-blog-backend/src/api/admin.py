@@ -2,19 +2,34 @@
 管理员相关API
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc
-from typing import List, Optional, Dict, Union, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload, defer
+from sqlalchemy import select, func, desc
+from typing import List, Optional, Dict, Union, Any, Literal
 from datetime import datetime, timedelta
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import math
 
-from src.model.database import get_db
+from src.model.database import get_async_db, get_pool_status, pool_stats
 from src.model import models
 from src.utils.auth import get_current_user_id
 from src.utils.logger import log, api_log
+from src.utils.pagination import apply_keyset, next_cursor, NEXT_CURSOR_HEADER
+from src.utils.count_cache import count_cache, approximate_table_rows
+from src.utils.cache import response_cache
+from src.utils.markdown_render import render_article
+from src.utils.search_index import search_index
+from src.utils.facet_index import facet_index
+from src.utils.tag_counts import adjust_tag_counts
+from src.utils.suggest_index import suggest_index
+from src.utils.related_articles import related_engine
+from src.utils.counter_reconciler import counter_reconciler
+from src.utils.ip_location import ip_location_service, get_ip_location_async
+from src.utils.ip_range_index import parse_ip
+from src.utils.visitor_geo import visitor_geo_locator
+from src.utils.visitor_log_writer import visitor_log_writer
 
 router = APIRouter()
 
@@ -22,7 +37,7 @@ router = APIRouter()
 class ArticleResponse(BaseModel):
     id: int
     title: str
-    content: str
+    content: Optional[str] = None  # 列表card视图不返回正文
     summary: str
     author_id: int
     created_at: datetime
@@ -82,6 +97,12 @@ class UserResponse(BaseModel):
 class UserRoleUpdate(BaseModel):
     role: str
 
+# 批量查询IP地理位置时单次最多的IP数
+MAX_BATCH_IPS = 1000
+
+class IPBatchRequest(BaseModel):
+    ips: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_IPS)
+
 # 访问记录API端点
 @router.get('/visitor-logs', response_model=List[VisitorLogResponse])
 async def get_visitor_logs(
@@ -91,16 +112,21 @@ async def get_visitor_logs(
     path: Optional[str] = None,
     status_code: Optional[int] = None,
     days: Optional[int] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    approximate_count: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """获取访问记录列表（需要管理员权限）"""
+    """获取访问记录列表（需要管理员权限），提供cursor时按游标翻页并忽略offset
+
+    approximate_count为true且无筛选条件时，X-Total-Count使用表统计信息中的估算行数
+    """
     # 验证用户是否为管理员（ID为1）
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="没有权限访问该资源")
     
     # 构建查询
-    query = db.query(models.VisitorLog)
+    query = select(models.VisitorLog)
     
     # 应用过滤条件
     if ip_address:
@@ -113,11 +139,23 @@ async def get_visitor_logs(
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         query = query.filter(models.VisitorLog.request_time >= cutoff_date)
     
-    # 获取总记录数
-    total = query.count()
+    # 获取总记录数：优先使用估算值，其次使用短时缓存的精确值
+    total = None
+    has_filters = any(value for value in (ip_address, path, status_code, days))
+    if approximate_count and not has_filters:
+        total = await approximate_table_rows(db, models.VisitorLog.__tablename__)
+    is_approximate = total is not None
+    if total is None:
+        total = await count_cache.get_or_count(
+            db, ("visitor_logs", ip_address, path, status_code, days), query, ttl=60
+        )
     
     # 应用分页并获取结果
-    logs = query.order_by(models.VisitorLog.request_time.desc()).offset(offset).limit(limit).all()
+    page_query = apply_keyset(query, models.VisitorLog.request_time, models.VisitorLog.id, cursor)
+    if not cursor:
+        page_query = page_query.offset(offset)
+    result = await db.execute(page_query.limit(limit))
+    logs = result.scalars().all()
     
     # 设置响应头，包含总数信息
     response = JSONResponse(content=[{
@@ -133,13 +171,18 @@ async def get_visitor_logs(
         "referer": log.referer
     } for log in logs])
     response.headers["X-Total-Count"] = str(total)
+    if is_approximate:
+        response.headers["X-Total-Count-Approximate"] = "true"
+    cursor_value = next_cursor(logs, limit, sort_attr="request_time")
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
     
     return response
 
 @router.get('/visitor-stats', response_model=VisitorStatsResponse)
 async def get_visitor_stats(
     days: int = 7,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """获取访问统计数据（需要管理员权限）"""
@@ -151,18 +194,20 @@ async def get_visitor_stats(
     cutoff_date = datetime.utcnow() - timedelta(days=days)
     
     # 基本统计
-    total_visits = db.query(models.VisitorLog).filter(models.VisitorLog.request_time >= cutoff_date).count()
-    unique_ips = db.query(models.VisitorLog.ip_address).filter(
+    total_visits = await db.scalar(select(func.count(models.VisitorLog.id)).filter(
+        models.VisitorLog.request_time >= cutoff_date
+    ))
+    unique_ips = await db.scalar(select(func.count(func.distinct(models.VisitorLog.ip_address))).filter(
         models.VisitorLog.request_time >= cutoff_date
-    ).distinct().count()
+    ))
     
     # 平均响应时间
-    avg_response_time = db.query(func.avg(models.VisitorLog.process_time)).filter(
+    avg_response_time = await db.scalar(select(func.avg(models.VisitorLog.process_time)).filter(
         models.VisitorLog.request_time >= cutoff_date
-    ).scalar() or 0.0
+    )) or 0.0
     
     # 路径统计 - 最常访问的路径
-    path_stats_query = db.query(
+    path_stats_query = (await db.execute(select(
         models.VisitorLog.path, 
         func.count(models.VisitorLog.id).label('count')
     ).filter(
@@ -171,12 +216,12 @@ async def get_visitor_stats(
         models.VisitorLog.path
     ).order_by(
         func.count(models.VisitorLog.id).desc()
-    ).limit(10).all()
+    ).limit(10))).all()
     
     path_stats = {path: count for path, count in path_stats_query}
     
     # IP统计 - 最活跃的IP
-    ip_stats_query = db.query(
+    ip_stats_query = (await db.execute(select(
         models.VisitorLog.ip_address, 
         func.count(models.VisitorLog.id).label('count')
     ).filter(
@@ -185,7 +230,7 @@ async def get_visitor_stats(
         models.VisitorLog.ip_address
     ).order_by(
         func.count(models.VisitorLog.id).desc()
-    ).limit(10).all()
+    ).limit(10))).all()
     
     ip_stats = {ip: count for ip, count in ip_stats_query}
     
@@ -201,64 +246,209 @@ async def get_visitor_stats(
 @router.get('/ip-geolocation')
 async def get_ip_geolocation(
     ip: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """获取IP地址的地理位置信息（需要管理员权限）"""
+    """获取IP地址的地理位置信息（需要管理员权限），本地IP库查不到时查询在线API"""
     # 验证用户是否为管理员（ID为1）
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="没有权限访问该资源")
     
-    # 不再查询IP地理位置，直接返回"未知"
+    location = await get_ip_location_async(ip)
     return {
         "ip": ip,
-        "country": "未知",
-        "region": "未知",
-        "city": "未知",
-        "isp": "未知"
+        "country": location.get("country", "未知"),
+        "region": location.get("province", "未知"),
+        "city": location.get("city", "未知"),
+        "isp": location.get("isp", "未知")
+    }
+
+@router.post('/ip-geolocation/batch')
+async def get_ip_geolocation_batch(
+    request: IPBatchRequest,
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """批量查询IP地址的地理位置（需要管理员权限）
+
+    只查询本地IP库和在线查询结果的缓存，不访问网络，一次最多 MAX_BATCH_IPS 个IP；
+    格式错误的IP放在 invalid 中返回。
+    """
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    
+    results = {}
+    invalid = []
+    for ip in dict.fromkeys(ip.strip() for ip in request.ips):
+        if parse_ip(ip) is not None:
+            results[ip] = ip_location_service.get_location(ip)
+        else:
+            invalid.append(ip)
+    return {"results": results, "invalid": invalid}
+
+@router.get('/visitor-log-stats')
+async def get_visitor_log_stats(current_user_id: int = Depends(get_current_user_id)):
+    """获取当前进程访问记录批量写入的统计（需要管理员权限），包括排除、采样和丢弃的条数"""
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    return visitor_log_writer.stats()
+
+# 访客地区统计API
+@router.get('/visitor-geo')
+async def get_visitor_geo_stats(
+    days: int = Query(7, ge=1),
+    level: Literal["province", "city"] = Query("province"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """按省份或城市统计访问量（需要管理员权限）
+
+    地理位置来自后台预先解析的 ip_geolocations，尚未解析的IP的访问计入 unresolved_visits。
+    """
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    group_columns = [models.IPGeolocation.province]
+    if level == "city":
+        group_columns.append(models.IPGeolocation.city)
+    visits = func.count(models.VisitorLog.id)
+    
+    rows = (await db.execute(select(
+        *group_columns,
+        visits.label('visits'),
+        func.count(func.distinct(models.VisitorLog.ip_address)).label('unique_ips')
+    ).join(
+        models.IPGeolocation, models.IPGeolocation.ip_address == models.VisitorLog.ip_address
+    ).filter(
+        models.VisitorLog.request_time >= cutoff_date
+    ).group_by(
+        *group_columns
+    ).order_by(
+        visits.desc()
+    ).limit(limit))).all()
+    
+    total_visits = await db.scalar(select(func.count(models.VisitorLog.id)).filter(
+        models.VisitorLog.request_time >= cutoff_date
+    ))
+    unresolved_visits = await db.scalar(select(func.count(models.VisitorLog.id)).outerjoin(
+        models.IPGeolocation, models.IPGeolocation.ip_address == models.VisitorLog.ip_address
+    ).filter(
+        models.VisitorLog.request_time >= cutoff_date,
+        models.IPGeolocation.ip_address.is_(None)
+    ))
+    
+    regions = []
+    for row in rows:
+        region = {"province": row.province, "visits": row.visits, "unique_ips": row.unique_ips}
+        if level == "city":
+            region["city"] = row.city
+        regions.append(region)
+    
+    return {
+        "days": days,
+        "level": level,
+        "total_visits": total_visits,
+        "unresolved_visits": unresolved_visits,
+        "regions": regions
     }
 
+@router.get('/visitor-geo/locate')
+async def get_visitor_geo_report(current_user_id: int = Depends(get_current_user_id)):
+    """获取当前进程最近一次访客IP地理位置解析的报告（需要管理员权限）"""
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    return visitor_geo_locator.last_report or {}
+
+@router.post('/visitor-geo/locate')
+async def refresh_visitor_geo(current_user_id: int = Depends(get_current_user_id)):
+    """立即解析新增访问记录中的IP并返回报告（需要管理员权限）"""
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    return await visitor_geo_locator.run_once()
+
+# 数据库连接池监控API
+@router.get('/db-pool-stats')
+async def get_db_pool_stats(
+    reset: bool = False,
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """获取数据库连接池状态和取连接耗时统计（需要管理员权限）
+
+    参数:
+    - reset: 返回后清空累计统计，便于观察某一时段的数据
+    """
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    
+    status = get_pool_status()
+    
+    if reset:
+        for stats in pool_stats.values():
+            stats.reset()
+    
+    return status
+
+# 文章计数校对API
+@router.get('/counter-reconcile')
+async def get_counter_reconcile_report(current_user_id: int = Depends(get_current_user_id)):
+    """获取当前进程最近一次文章计数校对的报告（需要管理员权限）"""
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    return counter_reconciler.last_report or {}
+
+@router.post('/counter-reconcile')
+async def run_counter_reconcile(current_user_id: int = Depends(get_current_user_id)):
+    """立即校对一轮文章计数并返回报告（需要管理员权限）"""
+    if current_user_id != 1:
+        raise HTTPException(status_code=403, detail="没有权限访问该资源")
+    return await counter_reconciler.run_once()
+
 # 文章审核相关API
 @router.get('/articles', response_model=list[ArticleResponse])
 async def get_admin_articles(
     skip: int = 0, 
     limit: int = 10, 
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    view: Literal["card", "full"] = Query("card"),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """获取文章列表（管理员版，可按状态筛选）"""
+    """获取文章列表（管理员版，可按状态筛选），view=full时返回正文"""
     # 检查当前用户是否为管理员（ID为1）
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以访问此功能")
     
     # 构建基础查询
-    query = db.query(models.Article).options(
-        joinedload(models.Article.tags_relationship),
-        joinedload(models.Article.author)
-    )
+    query = select(models.Article)
     
     # 如果指定了状态，进行过滤
     if status:
         query = query.filter(models.Article.status == status)
     
     # 获取总数
-    total_count = query.count()
+    total_count = await count_cache.get_or_count(db, ("articles", "admin", status), query)
+    
+    # 卡片视图不加载正文列
+    page_query = query.options(defer(models.Article.content, raiseload=True)) if view == "card" else query
     
     # 分页和排序
-    articles = query.order_by(
+    result = await db.execute(page_query.options(
+        selectinload(models.Article.tags_relationship),
+        joinedload(models.Article.author)
+    ).order_by(
         models.Article.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    ).offset(skip).limit(limit))
+    articles = result.scalars().all()
     
     # 转换查询结果
     articles_data = []
     for article in articles:
         tag_names = [tag.name for tag in article.tags_relationship] if article.tags_relationship else []
         
-        articles_data.append({
+        article_data = {
             'id': article.id,
             'title': article.title,
-            'content': article.content,
             'summary': article.summary,
             'author_id': article.author_id,
             'author_name': article.author.username if article.author else "未知",
@@ -268,7 +458,10 @@ async def get_admin_articles(
             'likes': article.likes,
             'tags': tag_names,
             'status': article.status
-        })
+        }
+        if view == "full":
+            article_data['content'] = article.content
+        articles_data.append(article_data)
     
     # 设置响应头，包含总数信息
     response = JSONResponse(content=articles_data)
@@ -280,39 +473,43 @@ async def get_admin_articles(
 async def get_to_process_articles(
     skip: int = 0, 
     limit: int = 10, 
-    db: Session = Depends(get_db),
+    view: Literal["card", "full"] = Query("card"),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """获取需要处理的文章（待审核+已拒绝）"""
+    """获取需要处理的文章（待审核+已拒绝），view=full时返回正文"""
     # 检查当前用户是否为管理员（ID为1）
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以访问此功能")
     
     # 查询待审核和已拒绝的文章
-    query = db.query(models.Article).filter(
+    query = select(models.Article).filter(
         models.Article.status.in_(["pending", "rejected"])
-    ).options(
-        joinedload(models.Article.tags_relationship),
-        joinedload(models.Article.author)
     )
     
     # 获取总数
-    total_count = query.count()
+    total_count = await count_cache.get_or_count(db, ("articles", "to-process"), query)
+    
+    # 卡片视图不加载正文列
+    page_query = query.options(defer(models.Article.content, raiseload=True)) if view == "card" else query
     
     # 获取文章并按创建时间排序
-    articles = query.order_by(
+    result = await db.execute(page_query.options(
+        selectinload(models.Article.tags_relationship),
+        joinedload(models.Article.author)
+    ).order_by(
         models.Article.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    ).offset(skip).limit(limit))
+    articles = result.scalars().all()
     
     # 转换查询结果
     articles_data = []
     for article in articles:
         tag_names = [tag.name for tag in article.tags_relationship] if article.tags_relationship else []
         
-        articles_data.append({
+        article_data = {
             'id': article.id,
             'title': article.title,
-            'content': article.content,
             'summary': article.summary,
             'author_id': article.author_id,
             'author_name': article.author.username if article.author else "未知",
@@ -322,7 +519,10 @@ async def get_to_process_articles(
             'likes': article.likes,
             'tags': tag_names,
             'status': article.status
-        })
+        }
+        if view == "full":
+            article_data['content'] = article.content
+        articles_data.append(article_data)
     
     # 设置响应头，包含总数信息
     response = JSONResponse(content=articles_data)
@@ -333,7 +533,7 @@ async def get_to_process_articles(
 @router.get('/articles/{article_id}', response_model=ArticleResponse)
 async def get_admin_article(
     article_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """管理员获取任意文章详情（无状态限制）"""
@@ -341,14 +541,14 @@ async def get_admin_article(
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以访问此功能")
     
-    article = db.query(models.Article).options(joinedload(models.Article.tags_relationship)).filter(models.Article.id == article_id).first()
+    article = await db.scalar(select(models.Article).options(selectinload(models.Article.tags_relationship)).filter(models.Article.id == article_id))
     if article is None:
         raise HTTPException(status_code=404, detail="文章不存在")
     
     tag_names = [tag.name for tag in article.tags_relationship] if article.tags_relationship else []
     
     # 获取作者信息
-    author = db.query(models.User).filter(models.User.id == article.author_id).first()
+    author = await db.get(models.User, article.author_id)
     author_name = author.username if author else "未知"
     
     article_data = {
@@ -373,7 +573,7 @@ async def get_admin_article(
 async def update_article_detail(
     article_id: int,
     article_update: ArticleCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """更新文章详情（仅管理员）"""
@@ -382,7 +582,7 @@ async def update_article_detail(
         raise HTTPException(status_code=403, detail="仅管理员可以更新文章")
 
     # 查找文章
-    article = db.query(models.Article).options(joinedload(models.Article.tags_relationship)).filter(models.Article.id == article_id).first()
+    article = await db.scalar(select(models.Article).options(selectinload(models.Article.tags_relationship)).filter(models.Article.id == article_id))
     if not article:
         raise HTTPException(status_code=404, detail="文章不存在")
 
@@ -394,7 +594,8 @@ async def update_article_detail(
 
     if article_update.tags:
         # 获取所有标签
-        tag_objects = db.query(models.Tag).filter(models.Tag.id.in_(article_update.tags)).all()
+        result = await db.execute(select(models.Tag).filter(models.Tag.id.in_(article_update.tags)))
+        tag_objects = result.scalars().all()
 
     # 更新文章字段
     article.title = article_update.title
@@ -402,15 +603,28 @@ async def update_article_detail(
     article.summary = article_update.summary
     article.is_knowledge_base = article_update.is_knowledge_base
     article.updated_at = datetime.utcnow()
+    render_article(article)
+
+    # 更新标签关联，同时调整标签的文章数
+    published = article.status == "published"
+    await adjust_tag_counts(
+        db,
+        [tag.id for tag in article.tags_relationship], published,
+        [tag.id for tag in tag_objects], published
+    )
+    article.tags_relationship = list(tag_objects)
 
-    # 更新标签关联
-    article.tags_relationship = tag_objects
-
-    db.commit()
-    db.refresh(article)
+    await db.commit()
+    await db.refresh(article, attribute_names=["tags_relationship"])
+    search_index.index_article(article)
+    facet_index.index_article(article)
+    if article.status == "published":
+        suggest_index.add("article", article.id, article.title)
+    related_engine.schedule(article.id)
+    await response_cache.invalidate("articles", f"article:{article_id}", "categories", "tags")
 
     # 获取作者信息
-    author = db.query(models.User).filter(models.User.id == article.author_id).first()
+    author = await db.get(models.User, article.author_id)
     author_name = author.username if author else "未知作者"
 
     # 转换标签为字符串列表
@@ -439,7 +653,7 @@ async def update_article_detail(
 async def update_article_status(
     article_id: int,
     status: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """更新文章状态（审核）"""
@@ -453,14 +667,29 @@ async def update_article_status(
         raise HTTPException(status_code=400, detail="无效的状态值")
 
     # 查找文章
-    article = db.query(models.Article).filter(models.Article.id == article_id).first()
+    article = await db.get(models.Article, article_id)
     if not article:
         raise HTTPException(status_code=404, detail="文章不存在")
 
     # 更新状态
     old_status = article.status
     article.status = status
-    db.commit()
+    if old_status != status:
+        # 发布或撤下文章时调整其标签的文章数
+        tag_ids = (await db.scalars(
+            select(models.article_tags.c.tag_id).where(models.article_tags.c.article_id == article_id)
+        )).all()
+        await adjust_tag_counts(db, tag_ids, old_status == "published", tag_ids, status == "published")
+    await db.commit()
+    if old_status != status:
+        await response_cache.invalidate("articles", f"article:{article_id}", "categories", "tags")
+        await search_index.reindex(db, article_id)
+        await facet_index.reindex(db, article_id)
+        if status == "published":
+            suggest_index.add("article", article.id, article.title)
+        else:
+            suggest_index.remove("article", article.id)
+        related_engine.schedule(article.id)
     
     # 如果状态发生变化，创建通知
     if old_status != status and article.author_id != current_user_id:
@@ -486,7 +715,7 @@ async def update_article_status(
                 article_id=article.id
             )
             db.add(notification)
-            db.commit()
+            await db.commit()
             log.info(f"为用户 {article.author_id} 创建文章状态变更通知: {notification_title}")
     
     # 返回成功信息
@@ -495,36 +724,46 @@ async def update_article_status(
 # 用户角色管理API
 @router.get('/users', response_model=List[UserResponse])
 async def get_users(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
     role: Optional[str] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """获取用户列表（仅管理员）"""
+    """获取用户列表（仅管理员），提供cursor时按游标翻页并忽略skip"""
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以查看用户列表")
     
-    query = db.query(models.User)
+    query = select(models.User)
     
     if role:
         query = query.filter(models.User.role == role)
     
-    users = query.order_by(models.User.created_at.desc()).offset(skip).limit(limit).all()
+    query = apply_keyset(query, models.User.created_at, models.User.id, cursor)
+    if not cursor:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    users = result.scalars().all()
+    
+    cursor_value = next_cursor(users, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
     
     return users
 
 @router.get('/users/{user_id}', response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """获取用户详情（管理员或用户本人）"""
     if current_user_id != 1 and current_user_id != user_id:
         raise HTTPException(status_code=403, detail="无权访问其他用户信息")
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -534,7 +773,7 @@ async def get_user(
 async def update_user_role(
     user_id: int,
     role_update: UserRoleUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """更新用户角色（仅管理员）"""
@@ -546,7 +785,7 @@ async def update_user_role(
     if role_update.role not in valid_roles:
         raise HTTPException(status_code=400, detail="无效的角色值")
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -555,7 +794,7 @@ async def update_user_role(
         raise HTTPException(status_code=403, detail="不能修改主管理员的角色")
     
     user.role = role_update.role
-    db.commit()
+    await db.commit()
     
     log.info(f"管理员更新用户 {user_id} 角色为 {role_update.role}")
     
@@ -2,19 +2,34 @@
 文章相关API
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
-from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload, defer, undefer
+from typing import List, Optional, Literal
+from datetime import datetime, date
 import math
 from pydantic import BaseModel
 
-from src.model.database import get_db
+from src.model.database import get_async_db, get_read_db
 from src.model import models
 from src.utils.auth import get_current_user_id, get_current_user_id_optional
 from src.utils.logger import log, api_log
-from src.utils.cache import conditional_cache
+from src.utils.cache import (
+    cached, response_cache, build_key,
+    is_not_modified, not_modified_response, set_validator_headers
+)
+from src.utils.view_counter import view_counter
+from src.utils.likes import toggle_like
+from src.utils.markdown_render import render_article
+from src.utils.search_index import search_index
+from src.utils.suggest_index import suggest_index
+from src.utils.related_articles import related_engine, RELATED_TOP_K
+from src.utils.facet_index import facet_index
+from src.utils.tag_counts import adjust_tag_counts
+from src.utils.pagination import apply_keyset, decode_cursor, next_cursor, NEXT_CURSOR_HEADER
+from src.utils.count_cache import count_cache
 
 router = APIRouter()
 
@@ -22,7 +37,7 @@ router = APIRouter()
 class ArticleResponse(BaseModel):
     id: int
     title: str
-    content: str
+    content: Optional[str] = None  # 列表card视图不返回正文
     summary: str
     author_id: int
     created_at: datetime
@@ -35,10 +50,39 @@ class ArticleResponse(BaseModel):
     is_knowledge_base: Optional[bool] = False
     knowledge_category_id: Optional[int] = None
     knowledge_category_name: Optional[str] = None
+    # 服务端渲染结果，详情接口返回
+    content_html: Optional[str] = None
+    toc: Optional[list[dict]] = None
+    excerpt: Optional[str] = None
+    word_count: Optional[int] = None
+    reading_time: Optional[int] = None
     
     class Config:
         from_attributes = True
 
+class RelatedArticleResponse(BaseModel):
+    id: int
+    title: str
+    summary: Optional[str] = None
+    created_at: datetime
+    reading_time: Optional[int] = None
+    score: float
+
+class FacetCount(BaseModel):
+    id: int
+    name: str
+    count: int
+
+class MonthCount(BaseModel):
+    month: str  # YYYY-MM
+    count: int
+
+class ArticleFacetsResponse(BaseModel):
+    total: int
+    tags: list[FacetCount]
+    categories: list[FacetCount]
+    months: list[MonthCount]
+
 class ArticleCreate(BaseModel):
     title: str
     content: str
@@ -49,24 +93,50 @@ class ArticleCreate(BaseModel):
     knowledge_category_name: Optional[str] = None  # 如果提供新分类名称，会自动创建
 
 @router.get('/articles', response_model=list[ArticleResponse])
-@conditional_cache(expire=300)  # 缓存5分钟
+# 列表中包含分类名称、标签名称和点赞数，分类或标签变化时一并失效
+@cached("articles", tags=["articles", "categories", "tags"])
 async def get_articles(
     skip: int = 0, 
     limit: int = 10, 
     knowledge_base: Optional[bool] = None, 
     category_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    tags: Optional[List[int]] = Query(None),
+    categories: Optional[List[int]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    view: Literal["card", "full"] = Query("card"),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取文章列表，仅返回已发布的文章
 
     参数:
     - skip: 分页起始位置
     - limit: 每页显示数量
+    - cursor: 上一页响应头X-Next-Cursor中的游标，提供时按游标翻页并忽略skip
+    - view: card（默认）不查询也不返回正文，full返回完整正文
     - knowledge_base: 是否只显示知识库文章，None代表不过滤
     - category_id: 知识库分类ID过滤
+    - tags: 标签ID，可重复传入，文章需包含全部标签
+    - categories: 知识库分类ID，可重复传入，满足其一即可
+    - date_from / date_to: 创建日期范围（含两端）
     """
+    if tags or categories or date_from or date_to:
+        # 按标签、多分类、日期筛选时由位图索引完成筛选、计数和分页，只按页查询文章
+        _require_facet_index()
+        category_ids = list(categories or []) + ([category_id] if category_id is not None else [])
+        total_count, page_ids = facet_index.filter(
+            tags, category_ids, knowledge_base, date_from, date_to,
+            skip, limit, decode_cursor(cursor) if cursor else None
+        )
+        query = select(models.Article).filter(
+            models.Article.id.in_(page_ids),
+            models.Article.status == "published"
+        ).order_by(models.Article.created_at.desc(), models.Article.id.desc())
+        return await _article_list_response(db, query, view, total_count, limit)
+
     # 构建基础查询
-    query = db.query(models.Article).filter(models.Article.status == "published")
+    query = select(models.Article).filter(models.Article.status == "published")
 
     # 如果指定了知识库标志，则添加过滤条件
     if knowledge_base is not None:
@@ -76,24 +146,43 @@ async def get_articles(
     if category_id is not None:
         query = query.filter(models.Article.knowledge_category_id == category_id)
     
-    # 查询文章总数
-    total_count = query.count()
+    # 查询文章总数（按筛选条件缓存，文章新增或状态变化时失效）
+    total_count = await count_cache.get_or_count(
+        db, ("articles", "published", knowledge_base, category_id), query
+    )
     
-    # 查询文章列表
-    articles = query.options(
-        joinedload(models.Article.tags_relationship),
+    # 查询文章列表，提供游标时使用键集分页
+    page_query = apply_keyset(query, models.Article.created_at, models.Article.id, cursor)
+    if not cursor:
+        page_query = page_query.offset(skip)
+    return await _article_list_response(db, page_query.limit(limit), view, total_count, limit)
+
+def _require_facet_index():
+    """分面索引首次建好前返回503，不返回（也不缓存）空索引的结果"""
+    if not facet_index.ready:
+        raise HTTPException(status_code=503, detail="文章筛选索引正在加载，请稍后重试")
+
+async def _article_list_response(
+    db: AsyncSession, page_query, view: str, total_count: int, limit: int
+) -> JSONResponse:
+    """查询一页文章，返回带分页响应头的列表"""
+    if view == "card":
+        # 卡片视图不加载正文列
+        page_query = page_query.options(defer(models.Article.content, raiseload=True))
+    result = await db.execute(page_query.options(
+        selectinload(models.Article.tags_relationship),
         joinedload(models.Article.author),
         joinedload(models.Article.knowledge_category)
-    ).order_by(models.Article.created_at.desc()).offset(skip).limit(limit).all()
+    ))
+    articles = result.scalars().all()
 
     articles_data = []
     for article in articles:
         tag_names = [tag.name for tag in article.tags_relationship] if article.tags_relationship else []
         
-        articles_data.append({
+        article_data = {
             'id': article.id,
             'title': article.title,
-            'content': article.content,
             'summary': article.summary,
             'author_id': article.author_id,
             'author_name': article.author.username if article.author else "未知作者",
@@ -105,21 +194,122 @@ async def get_articles(
             'is_knowledge_base': article.is_knowledge_base,
             'knowledge_category_id': article.knowledge_category_id,
             'knowledge_category_name': article.knowledge_category.name if article.knowledge_category else None,
-            'comments_count': article.comments_count if article.comments_count is not None else 0
-        })
+            'comments_count': article.comments_count if article.comments_count is not None else 0,
+            'reading_time': article.reading_time
+        }
+        if view == "full":
+            article_data['content'] = article.content
+        articles_data.append(article_data)
     # 在响应头中添加分页信息
     response = JSONResponse(content=articles_data)
     response.headers["X-Total-Count"] = str(total_count)
     response.headers["X-Total-Pages"] = str(math.ceil(total_count / limit))
+    cursor_value = next_cursor(articles, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
     return response
 
+@router.get('/articles/facets', response_model=ArticleFacetsResponse)
+@cached("article_facets", tags=["articles", "tags", "categories"])
+async def get_article_facets(
+    knowledge_base: Optional[bool] = None,
+    tags: Optional[List[int]] = Query(None),
+    categories: Optional[List[int]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """已发布文章的分面计数，筛选参数与文章列表相同
+
+    标签计数为在当前结果中再选择该标签后的文章数；
+    分类和月份计数不受本维度已选条件的限制，用于多选或切换。
+    """
+    _require_facet_index()
+    counts = facet_index.facets(tags, categories, knowledge_base, date_from, date_to)
+
+    tag_names = {}
+    if counts["tags"]:
+        tag_names = dict((await db.execute(
+            select(models.Tag.id, models.Tag.name).filter(models.Tag.id.in_(list(counts["tags"])))
+        )).all())
+    category_names = {}
+    if counts["categories"]:
+        category_names = dict((await db.execute(
+            select(models.KnowledgeCategory.id, models.KnowledgeCategory.name)
+            .filter(models.KnowledgeCategory.id.in_(list(counts["categories"])))
+        )).all())
+
+    def facet_list(facet_counts: dict, names: dict) -> list:
+        items = [
+            {"id": item_id, "name": names[item_id], "count": count}
+            for item_id, count in facet_counts.items() if item_id in names
+        ]
+        return sorted(items, key=lambda item: (-item["count"], item["name"]))
+
+    return {
+        "total": counts["total"],
+        "tags": facet_list(counts["tags"], tag_names),
+        "categories": facet_list(counts["categories"], category_names),
+        "months": [
+            {"month": month, "count": count}
+            for month, count in sorted(counts["months"].items(), reverse=True)
+        ]
+    }
+
 @router.get('/articles/{article_id}', response_model=ArticleResponse)
-async def get_article(article_id: int, db: Session = Depends(get_db), current_user_id: Optional[int] = Depends(get_current_user_id_optional)):
-    """获取文章详情，普通用户只能查看已发布文章，作者和管理员可查看自己的未发布文章"""
-    article = db.query(models.Article).options(
-        joinedload(models.Article.tags_relationship),
-        joinedload(models.Article.knowledge_category)
-    ).filter(models.Article.id == article_id).first()
+async def get_article(
+    article_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user_id: Optional[int] = Depends(get_current_user_id_optional)
+):
+    """获取文章详情，普通用户只能查看已发布文章，作者和管理员可查看自己的未发布文章
+
+    已发布文章返回 ETag / Last-Modified，缓存命中时条件请求在查询数据库之前返回304。
+    只有确认是已发布文章后才处理条件请求，不存在或未发布的文章不会得到304，也不计浏览量。
+    """
+    # 已发布文章的详情走缓存，浏览量不参与缓存和校验，返回时读取当前值并叠加未写回的增量
+    cache_key = build_key("article", id=article_id)
+    # 详情中包含分类名称，分类变化时一并失效
+    cache_tags = [f"article:{article_id}", "categories"]
+    versions = await response_cache.tag_versions(cache_tags)
+    validators = response_cache.validators(cache_key, cache_tags, versions)
+
+    # 缓存中只有已发布文章
+    article_data = await response_cache.get(cache_key, cache_tags, versions) if versions is not None else None
+    cache_hit = article_data is not None
+    if not cache_hit:
+        article_data = await _load_article_detail(db, article_id, current_user_id)
+        if article_data['status'] == "published" and versions is not None:
+            await response_cache.set(cache_key, cache_tags, article_data, versions=versions)
+
+    published = article_data['status'] == "published"
+    if published and validators is not None and is_not_modified(request, validators):
+        view_counter.increment(article_id)
+        return not_modified_response(validators)
+
+    if cache_hit:
+        # 缓存中的浏览量可能早于最近几次写回，按主键读取当前值
+        views = await db.scalar(select(models.Article.views).filter(models.Article.id == article_id))
+        article_data = {**article_data, 'views': views or 0}
+
+    if published and validators is not None:
+        set_validator_headers(response, validators)
+
+    # 记录访问量，由后台任务批量写回，详情读取本身不再写库
+    view_counter.increment(article_id)
+    return {**article_data, 'views': article_data['views'] + view_counter.pending(article_id)}
+
+async def _load_article_detail(db: AsyncSession, article_id: int, current_user_id: Optional[int]) -> dict:
+    """查询文章详情并检查查看权限"""
+    result = await db.execute(select(models.Article).options(
+        selectinload(models.Article.tags_relationship),
+        joinedload(models.Article.knowledge_category),
+        undefer(models.Article.content_html),
+        undefer(models.Article.toc)
+    ).filter(models.Article.id == article_id))
+    article = result.scalars().first()
     if article is None:
         raise HTTPException(status_code=404, detail="文章不存在")
     
@@ -134,14 +324,10 @@ async def get_article(article_id: int, db: Session = Depends(get_db), current_us
         if current_user_id != article.author_id and current_user_id != 1:
             raise HTTPException(status_code=403, detail="该文章尚未发布")
     
-    # 增加访问量
-    article.views += 1
-    db.commit()
-    
     tag_names = [tag.name for tag in article.tags_relationship] if article.tags_relationship else []
     
     # 获取作者信息
-    author = db.query(models.User).filter(models.User.id == article.author_id).first()
+    author = await db.get(models.User, article.author_id)
     author_name = author.username if author else "未知作者"
     
     article_data = {
@@ -153,20 +339,52 @@ async def get_article(article_id: int, db: Session = Depends(get_db), current_us
         'author_name': author_name,
         'created_at': article.created_at.isoformat(),
         'updated_at': article.updated_at.isoformat(),
-        'views': article.views,
+        'views': article.views or 0,
         'likes': article.likes,
         'tags': tag_names,  
         'status': article.status,
         'is_knowledge_base': article.is_knowledge_base,
         'knowledge_category_id': article.knowledge_category_id,
-        'knowledge_category_name': article.knowledge_category.name if article.knowledge_category else None
+        'knowledge_category_name': article.knowledge_category.name if article.knowledge_category else None,
+        'content_html': article.content_html,
+        'toc': article.toc,
+        'excerpt': article.excerpt,
+        'word_count': article.word_count,
+        'reading_time': article.reading_time
     }
     return article_data
 
+@router.get('/articles/{article_id}/related', response_model=list[RelatedArticleResponse])
+@cached("related", tags=["related"])
+async def get_related_articles(
+    article_id: int,
+    limit: int = Query(RELATED_TOP_K, ge=1, le=RELATED_TOP_K),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """获取相关文章，读取预计算的结果"""
+    result = await db.execute(
+        select(
+            models.Article.id,
+            models.Article.title,
+            models.Article.summary,
+            models.Article.created_at,
+            models.Article.reading_time,
+            models.RelatedArticle.score
+        )
+        .join(models.Article, models.Article.id == models.RelatedArticle.related_id)
+        .filter(
+            models.RelatedArticle.article_id == article_id,
+            models.Article.status == "published"
+        )
+        .order_by(models.RelatedArticle.rank)
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
 @router.post('/articles', response_model=ArticleResponse)
 async def create_article(
     article: ArticleCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """创建新文章"""
@@ -178,9 +396,9 @@ async def create_article(
     if article.is_knowledge_base:
         if article.knowledge_category_name and not article.knowledge_category_id:
             # 如果提供了新分类名称，先检查是否已存在
-            existing_category = db.query(models.KnowledgeCategory).filter(
+            existing_category = await db.scalar(select(models.KnowledgeCategory).filter(
                 models.KnowledgeCategory.name == article.knowledge_category_name
-            ).first()
+            ))
             
             if existing_category:
                 knowledge_category_id = existing_category.id
@@ -191,15 +409,13 @@ async def create_article(
                     description=f"自动创建的分类: {article.knowledge_category_name}"
                 )
                 db.add(new_category)
-                db.flush()  # 获取ID但不提交
+                await db.flush()  # 获取ID但不提交
                 knowledge_category_id = new_category.id
                 log.info(f"用户 {current_user_id} 创建了新的知识库分类: {article.knowledge_category_name}")
         
         elif article.knowledge_category_id:
             # 验证分类是否存在
-            category = db.query(models.KnowledgeCategory).filter(
-                models.KnowledgeCategory.id == article.knowledge_category_id
-            ).first()
+            category = await db.get(models.KnowledgeCategory, article.knowledge_category_id)
             if category:
                 knowledge_category_id = article.knowledge_category_id
             else:
@@ -210,7 +426,8 @@ async def create_article(
 
     if article.tags:
         # 获取所有标签
-        tag_objects = db.query(models.Tag).filter(models.Tag.id.in_(article.tags)).all()
+        result = await db.execute(select(models.Tag).filter(models.Tag.id.in_(article.tags)))
+        tag_objects = result.scalars().all()
 
     # 创建新文章，使用当前登录用户的ID
     # 所有登录用户都可以直接发布文章
@@ -226,15 +443,26 @@ async def create_article(
         knowledge_category_id=knowledge_category_id
     )
 
+    # 建立标签关联（新对象直接赋值，避免异步会话中的隐式加载）
+    db_article.tags_relationship = list(tag_objects)
+
+    # 写入时渲染Markdown，详情页直接返回HTML
+    render_article(db_article)
+
     db.add(db_article)
-    
-    # 处理标签关联
-    if tag_objects:
-        # 建立标签关联
-        db_article.tags_relationship = tag_objects
-    
-    db.commit()
-    db.refresh(db_article)
+    await adjust_tag_counts(db, [], False, [tag.id for tag in tag_objects], status == "published")
+    await db.commit()
+    await db.refresh(db_article, attribute_names=["tags_relationship", "knowledge_category"])
+    search_index.index_article(db_article)
+    facet_index.index_article(db_article)
+    suggest_index.add("article", db_article.id, db_article.title)
+    related_engine.schedule(db_article.id)
+    if db_article.knowledge_category:
+        suggest_index.add("category", db_article.knowledge_category.id, db_article.knowledge_category.name)
+    # 同时使文章列表缓存、分页总数和标签文章数缓存失效
+    await response_cache.invalidate("articles", "tags")
+    if article.is_knowledge_base:
+        await response_cache.invalidate("categories")
     
     # 转换标签为字符串列表
     tag_names = [tag.name for tag in db_article.tags_relationship] if db_article.tags_relationship else []
@@ -260,28 +488,31 @@ async def create_article(
         'tags': tag_names,
         'is_knowledge_base': db_article.is_knowledge_base,
         'knowledge_category_id': db_article.knowledge_category_id,
-        'knowledge_category_name': category_name
+        'knowledge_category_name': category_name,
+        'content_html': db_article.content_html,
+        'toc': db_article.toc,
+        'excerpt': db_article.excerpt,
+        'word_count': db_article.word_count,
+        'reading_time': db_article.reading_time
     }
 
 @router.post('/articles/{article_id}/like')
 async def like_article(
     article_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """点赞文章"""
-    article = db.query(models.Article).filter(models.Article.id == article_id).first()
+    """点赞文章（再次调用取消点赞）"""
+    article = await db.get(models.Article, article_id)
     if not article:
         raise HTTPException(status_code=404, detail="文章不存在")
     
-    # 增加点赞数
-    if article.likes is None:
-        article.likes = 0
-    article.likes += 1
-    
-    db.commit()
+    # 切换点赞状态，计数在数据库端原子更新
+    liked, likes = await toggle_like(db, current_user_id, models.LikeTargetType.ARTICLE.value, article_id)
+    # 文章列表中也包含点赞数
+    await response_cache.invalidate(f"article:{article_id}", "articles")
     
     # 记录点赞日志
-    api_log.info(f"用户 {current_user_id} 点赞了文章 {article_id}")
+    api_log.info(f"用户 {current_user_id} {'点赞' if liked else '取消点赞'}了文章 {article_id}")
     
-    return {"likes": article.likes}
\ No newline at end of file
+    return {"likes": likes, "liked": liked}
\ No newline at end of file
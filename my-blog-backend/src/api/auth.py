@@ -3,11 +3,12 @@
 """
 
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from pydantic import BaseModel
 
-from src.model.database import get_db
+from src.model.database import get_async_db
 from src.model import models
 from src.utils.auth import verify_token, create_access_token, create_refresh_token, get_current_user_id, create_tokens_from_refresh_token
 from src.utils.logger import log
@@ -43,14 +44,14 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
 @router.post('/register', response_model=dict)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # 检查用户名是否已存在
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="用户名已被注册")
     
     # 检查邮箱是否已存在
-    db_email = db.query(models.User).filter(models.User.email == user.email).first()
+    db_email = await db.scalar(select(models.User).filter(models.User.email == user.email))
     if db_email:
         raise HTTPException(status_code=400, detail="邮箱已被注册")
     
@@ -63,8 +64,8 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         role=models.UserRole.USER  # 设置默认角色为普通用户
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     # 记录注册日志
     log.info(f"用户 {db_user} 在 {datetime.now()} 注册成功")
     return {"message": "用户创建成功"}
@@ -86,10 +87,10 @@ async def refresh_token(request: RefreshTokenRequest):
         )
 
 @router.post('/login', response_model=Token)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """用户登录获取JWT令牌"""
     # 查找用户
-    user = db.query(models.User).filter(models.User.username == credentials.username).first()
+    user = await db.scalar(select(models.User).filter(models.User.username == credentials.username))
     
     # 验证密码
     if not user or not verify_password(credentials.password, user.hashed_password):
@@ -106,7 +107,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     
     # 记录登录日志
     user.last_login = datetime.utcnow()  # 更新最后登录时间
-    db.commit()
+    await db.commit()
     
     log.info(f"用户ID：{user.id} 在 {datetime.now()} 登录成功")
 
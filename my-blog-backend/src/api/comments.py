@@ -2,20 +2,28 @@
 评论相关API
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query, BackgroundTasks
+from sqlalchemy import select, update, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
-from src.model.database import get_db
+from src.model.database import get_async_db, get_read_db, AsyncSessionLocal
 from src.model import models
 from src.utils.auth import get_current_user_id, get_current_user_id_optional
 from src.utils.logger import log, api_log
-from src.utils.ip_location import get_ip_location
+from src.utils.ip_location import get_ip_location, get_ip_location_async
+from src.utils.likes import toggle_like
+from src.utils.cache import response_cache
+from src.utils.pagination import apply_keyset, next_cursor, NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
+# 被回复评论的引用片段长度
+REPLY_SNIPPET_LENGTH = 80
+
 class CommentCreate(BaseModel):
     content: str
     article_id: int
@@ -38,51 +46,186 @@ class CommentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CommentThreadResponse(CommentResponse):
+    reply_count: int = 0  # 直接回复数
+    has_more_replies: bool = False  # 是否有超出层数限制、未返回的回复，通过 /comments/{id}/replies 加载
+    replies: List["CommentThreadResponse"] = []
+
+def _snippet(content: Optional[str], length: int = REPLY_SNIPPET_LENGTH) -> str:
+    """引用被回复评论时只保留开头的片段"""
+    text = " ".join((content or "").split())
+    return text if len(text) <= length else text[:length] + "…"
+
+def _reply_to_data(parent: Optional[models.Comment], usernames: Dict[int, str]) -> Optional[dict]:
+    if parent is None:
+        return None
+    return {
+        "id": parent.id,
+        "username": usernames.get(parent.user_id, "匿名用户") if parent.user_id else "匿名用户",
+        "content": _snippet(parent.content)
+    }
+
+def _comment_data(comment: models.Comment, usernames: Dict[int, str], parent: Optional[models.Comment]) -> dict:
+    return {
+        'id': comment.id,
+        'content': comment.content,
+        'user_id': comment.user_id,
+        'article_id': comment.article_id,
+        'created_at': comment.created_at,
+        'likes': comment.likes,
+        'username': usernames.get(comment.user_id, "匿名用户") if comment.user_id else "匿名用户",
+        'reply_to_id': comment.reply_to_id,
+        'reply_to': _reply_to_data(parent, usernames),
+        'ip_address': comment.ip_address,
+        'location': comment.location
+    }
+
+async def _load_usernames(db: AsyncSession, comments) -> Dict[int, str]:
+    """一次查询涉及的所有用户名"""
+    user_ids = {comment.user_id for comment in comments if comment.user_id}
+    if not user_ids:
+        return {}
+    rows = await db.execute(select(models.User.id, models.User.username).filter(models.User.id.in_(user_ids)))
+    return dict(rows.all())
+
+async def _build_threads(db: AsyncSession, parents: List[models.Comment], depth: int) -> List[dict]:
+    """为 parents 加载 depth 层以内的回复并组装成树
+
+    使用递归CTE一次查询所有层的回复，再用一次分组查询统计最深一层评论的回复数，
+    加上用户名查询，查询次数与评论数量和层数无关。
+    """
+    parent_ids = [parent.id for parent in parents]
+    tree = select(
+        models.Comment.id, literal(1).label("depth")
+    ).filter(models.Comment.reply_to_id.in_(parent_ids)).cte("comment_tree", recursive=True)
+    tree = tree.union_all(
+        select(models.Comment.id, tree.c.depth + 1)
+        .join(tree, models.Comment.reply_to_id == tree.c.id)
+        .filter(tree.c.depth < depth)
+    )
+    rows = (await db.execute(
+        select(models.Comment, tree.c.depth).join(tree, models.Comment.id == tree.c.id)
+    )).all() if parent_ids else []
+
+    comments = {parent.id: parent for parent in parents}
+    children: Dict[int, List[models.Comment]] = {}
+    deepest = []
+    for comment, comment_depth in rows:
+        comments[comment.id] = comment
+        children.setdefault(comment.reply_to_id, []).append(comment)
+        if comment_depth >= depth:
+            deepest.append(comment.id)
+
+    # 最深一层评论的回复不返回，只统计数量
+    hidden_counts = {}
+    if deepest:
+        hidden_counts = dict((await db.execute(
+            select(models.Comment.reply_to_id, func.count())
+            .filter(models.Comment.reply_to_id.in_(deepest))
+            .group_by(models.Comment.reply_to_id)
+        )).all())
+
+    usernames = await _load_usernames(db, comments.values())
+
+    def build(comment: models.Comment) -> dict:
+        replies = sorted(children.get(comment.id, []), key=lambda reply: (reply.created_at, reply.id))
+        hidden = hidden_counts.get(comment.id, 0)
+        return {
+            **_comment_data(comment, usernames, comments.get(comment.reply_to_id)),
+            'reply_count': len(replies) + hidden,
+            'has_more_replies': hidden > 0,
+            'replies': [build(reply) for reply in replies]
+        }
+
+    return [build(parent) for parent in parents]
+
+async def _fill_comment_location(comment_id: int, ip_address: str):
+    """后台查询评论者IP的地理位置并写回评论，在响应返回后执行"""
+    location_info = await get_ip_location_async(ip_address)
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(models.Comment)
+                .where(models.Comment.id == comment_id, models.Comment.location.is_(None))
+                .values(location=location_info.get("province", "未知"))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+    except Exception as e:
+        log.error(f"写回评论位置失败: {str(e)}")
+
 @router.get('/articles/{article_id}/comments', response_model=list[CommentResponse])
-async def get_comments(article_id: int, skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    """获取文章评论"""
-    comments = db.query(models.Comment).filter(
+async def get_comments(
+    article_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """获取文章评论，提供cursor时按游标翻页并忽略skip"""
+    query = apply_keyset(select(models.Comment).filter(
         models.Comment.article_id == article_id
-    ).options(
-        joinedload(models.Comment.user),
-        joinedload(models.Comment.parent)
-    ).order_by(models.Comment.created_at.desc()).offset(skip).limit(limit).all()
+    ), models.Comment.created_at, models.Comment.id, cursor)
+    if not cursor:
+        query = query.offset(skip)
+    # 被回复的评论随评论一起加载，用户名一次查询，不再逐条查询
+    result = await db.execute(query.options(joinedload(models.Comment.parent)).limit(limit))
+    comments = result.scalars().all()
     
-    comments_data = []
-    for comment in comments:
-        # 获取回复的评论信息
-        reply_to = None
-        if comment.reply_to_id:
-            parent_comment = comment.parent
-            if parent_comment:
-                parent_user = db.query(models.User).filter(models.User.id == parent_comment.user_id).first()
-                reply_to = {
-                    "id": parent_comment.id,
-                    "username": parent_user.username if parent_user else "未知用户",
-                    "content": parent_comment.content
-                }
-        
-        comments_data.append({
-            'id': comment.id,
-            'content': comment.content,
-            'user_id': comment.user_id,
-            'article_id': comment.article_id,
-            'created_at': comment.created_at,
-            'likes': comment.likes,
-            'username': comment.user.username if comment.user else "匿名用户",
-            'reply_to_id': comment.reply_to_id if comment.reply_to_id else None,
-            'reply_to': reply_to if reply_to else None,
-            'ip_address': comment.ip_address,
-            'location': comment.location
-        })
+    cursor_value = next_cursor(comments, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
     
-    return comments_data
+    usernames = await _load_usernames(db, [*comments, *(comment.parent for comment in comments if comment.parent)])
+    return [_comment_data(comment, usernames, comment.parent) for comment in comments]
+
+@router.get('/articles/{article_id}/comment-threads', response_model=list[CommentThreadResponse])
+async def get_comment_threads(
+    article_id: int,
+    response: Response,
+    limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = None,
+    depth: int = Query(3, ge=1, le=10),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """按楼层获取文章评论树
+
+    按顶层评论分页（最新的在前，cursor取自响应头X-Next-Cursor），每个顶层评论附带
+    depth 层以内的回复（按时间正序）；更深的回复用 has_more_replies 标记，
+    通过 /comments/{comment_id}/replies 按需加载。
+    """
+    query = apply_keyset(select(models.Comment).filter(
+        models.Comment.article_id == article_id,
+        models.Comment.reply_to_id.is_(None)
+    ), models.Comment.created_at, models.Comment.id, cursor)
+    roots = (await db.execute(query.limit(limit))).scalars().all()
+
+    cursor_value = next_cursor(roots, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+
+    return await _build_threads(db, list(roots), depth)
+
+@router.get('/comments/{comment_id}/replies', response_model=list[CommentThreadResponse])
+async def get_comment_replies(
+    comment_id: int,
+    depth: int = Query(3, ge=1, le=10),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """加载评论下 depth 层以内的回复，用于展开评论树中未返回的深层回复"""
+    comment = await db.get(models.Comment, comment_id)
+    if not comment:
+        raise HTTPException(status_code=404, detail="评论不存在")
+    threads = await _build_threads(db, [comment], depth)
+    return threads[0]['replies']
 
 @router.post('/comments', response_model=CommentResponse)
 async def create_comment(
     comment: CommentCreate, 
     request: Request,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: Optional[int] = Depends(get_current_user_id_optional)
 ):
     """创建评论"""
@@ -91,13 +234,13 @@ async def create_comment(
         raise HTTPException(status_code=401, detail="需要登录才能发表评论")
     
     # 检查文章是否存在
-    article = db.query(models.Article).filter(models.Article.id == comment.article_id).first()
+    article = await db.get(models.Article, comment.article_id)
     if not article:
         raise HTTPException(status_code=404, detail="文章不存在")
     
     # 如果是回复，检查回复的评论是否存在
     if comment.reply_to_id:
-        reply_to = db.query(models.Comment).filter(models.Comment.id == comment.reply_to_id).first()
+        reply_to = await db.get(models.Comment, comment.reply_to_id)
         if not reply_to:
             raise HTTPException(status_code=404, detail="回复的评论不存在")
     
@@ -110,13 +253,11 @@ async def create_comment(
         # 取第一个IP地址，即最原始的客户端IP
         ip_address = forwarded_for.split(",")[0].strip()
     
-    # 查询IP地址的地理位置
-    try:
-        location_info = get_ip_location(ip_address)
-        location = location_info.get("province", "未知")
-    except Exception as e:
-        log.error(f"获取IP位置信息失败: {str(e)}")
-        location = "未知"
+    # 先查询缓存和本地数据库，查不到时评论照常写入，位置由后台任务查询在线API后补上
+    location_info = get_ip_location(ip_address)
+    location = location_info.get("province", "未知")
+    if location == "未知":
+        location = None
     
     # 创建评论
     db_comment = models.Comment(
@@ -129,9 +270,9 @@ async def create_comment(
     )
     
     db.add(db_comment)
+    await db.flush()  # 获取评论ID，供通知关联使用
     
     # 计算并更新文章的评论数
-    article = db.query(models.Article).filter(models.Article.id == comment.article_id).first()
     if article:
         if article.comments_count is None:
             article.comments_count = 1
@@ -153,7 +294,7 @@ async def create_comment(
     
     # 如果是回复评论，为被回复的用户创建通知
     if comment.reply_to_id:
-        parent_comment = db.query(models.Comment).filter(models.Comment.id == comment.reply_to_id).first()
+        parent_comment = await db.get(models.Comment, comment.reply_to_id)
         if parent_comment and parent_comment.user_id and parent_comment.user_id != current_user_id:
             notification = models.Notification(
                 user_id=parent_comment.user_id,
@@ -165,15 +306,18 @@ async def create_comment(
             )
             db.add(notification)
             log.info(f"为被回复用户 {parent_comment.user_id} 创建回复通知")
-        
-        db.commit()
     
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
+    if location is None:
+        background_tasks.add_task(_fill_comment_location, db_comment.id, ip_address)
+    # 文章列表中包含评论数
+    await response_cache.invalidate("articles")
     
     # 获取用户名
     username = None
     if db_comment.user_id:
-        user = db.query(models.User).filter(models.User.id == db_comment.user_id).first()
+        user = await db.get(models.User, db_comment.user_id)
         username = user.username if user else "未知用户"
     else:
         username = "匿名用户"
@@ -181,18 +325,18 @@ async def create_comment(
     # 获取回复的评论信息
     reply_to = None
     if db_comment.reply_to_id:
-        parent_comment = db.query(models.Comment).filter(models.Comment.id == db_comment.reply_to_id).first()
+        parent_comment = await db.get(models.Comment, db_comment.reply_to_id)
         if parent_comment:
             parent_username = "匿名用户"
             if parent_comment.user_id:
-                parent_user = db.query(models.User).filter(models.User.id == parent_comment.user_id).first()
+                parent_user = await db.get(models.User, parent_comment.user_id)
                 if parent_user:
                     parent_username = parent_user.username
             
             reply_to = {
                 "id": parent_comment.id,
                 "username": parent_username,
-                "content": parent_comment.content
+                "content": _snippet(parent_comment.content)
             }
     
     # 记录评论日志
@@ -215,11 +359,11 @@ async def create_comment(
 @router.delete('/comments/{comment_id}')
 async def delete_comment(
     comment_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """删除评论"""
-    comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+    comment = await db.get(models.Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="评论不存在")
     
@@ -228,7 +372,7 @@ async def delete_comment(
         raise HTTPException(status_code=403, detail="无权删除此评论")
     
     # 更新文章评论计数
-    article = db.query(models.Article).filter(models.Article.id == comment.article_id).first()
+    article = await db.get(models.Article, comment.article_id)
     if article:
         if article.comments_count is None:
             article.comments_count = 0
@@ -238,13 +382,14 @@ async def delete_comment(
     # 获取用户名用于日志记录
     username = "未知用户"
     if comment.user_id:
-        user = db.query(models.User).filter(models.User.id == comment.user_id).first()
+        user = await db.get(models.User, comment.user_id)
         if user:
             username = user.username
     
     # 删除评论
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await db.commit()
+    await response_cache.invalidate("articles")
     
     # 记录删除日志
     log.info(f"用户 {username}(ID:{current_user_id}) 删除了评论 {comment_id}")
@@ -254,22 +399,18 @@ async def delete_comment(
 @router.post('/comments/{comment_id}/like')
 async def like_comment(
     comment_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """点赞评论"""
-    comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+    """点赞评论（再次调用取消点赞）"""
+    comment = await db.get(models.Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="评论不存在")
     
-    # 增加点赞数
-    if comment.likes is None:
-        comment.likes = 0
-    comment.likes += 1
-    
-    db.commit()
+    # 切换点赞状态，计数在数据库端原子更新
+    liked, likes = await toggle_like(db, current_user_id, models.LikeTargetType.COMMENT.value, comment_id)
     
     # 记录点赞日志
-    api_log.info(f"用户 {current_user_id} 点赞了评论 {comment_id}")
+    api_log.info(f"用户 {current_user_id} {'点赞' if liked else '取消点赞'}了评论 {comment_id}")
     
-    return {"likes": comment.likes}
\ No newline at end of file
+    return {"likes": likes, "liked": liked}
\ No newline at end of file
@@ -3,12 +3,13 @@
 """
 
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
-from src.model.database import get_db
+from src.model.database import get_async_db
 from src.model import models
 from src.utils.auth import get_current_user_id
 from src.utils.logger import log
@@ -49,23 +50,24 @@ class EmailLogResponse(BaseModel):
 async def get_email_templates(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """获取邮件模板列表（仅管理员）"""
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以查看邮件模板")
     
-    templates = db.query(models.EmailTemplate).filter(
+    result = await db.execute(select(models.EmailTemplate).filter(
         models.EmailTemplate.is_active == True
-    ).order_by(models.EmailTemplate.created_at.desc()).offset(skip).limit(limit).all()
+    ).order_by(models.EmailTemplate.created_at.desc()).offset(skip).limit(limit))
+    templates = result.scalars().all()
     
     return templates
 
 @router.post('/email-templates', response_model=EmailTemplateResponse)
 async def create_email_template(
     template: EmailTemplateCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """创建邮件模板（仅管理员）"""
@@ -73,7 +75,7 @@ async def create_email_template(
         raise HTTPException(status_code=403, detail="仅管理员可以创建邮件模板")
     
     # 检查模板名是否已存在
-    existing = db.query(models.EmailTemplate).filter(models.EmailTemplate.name == template.name).first()
+    existing = await db.scalar(select(models.EmailTemplate).filter(models.EmailTemplate.name == template.name))
     if existing:
         raise HTTPException(status_code=400, detail="模板名称已存在")
     
@@ -84,8 +86,8 @@ async def create_email_template(
     )
     
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     
     log.info(f"管理员创建邮件模板: {template.name}")
     
@@ -95,23 +97,23 @@ async def create_email_template(
 async def update_email_template(
     template_id: int,
     template_update: EmailTemplateCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """更新邮件模板（仅管理员）"""
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以更新邮件模板")
     
-    template = db.query(models.EmailTemplate).filter(models.EmailTemplate.id == template_id).first()
+    template = await db.get(models.EmailTemplate, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="模板不存在")
     
     # 检查新名称是否与其他模板冲突
     if template_update.name != template.name:
-        existing = db.query(models.EmailTemplate).filter(
+        existing = await db.scalar(select(models.EmailTemplate).filter(
             models.EmailTemplate.name == template_update.name,
             models.EmailTemplate.id != template_id
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="模板名称已存在")
     
@@ -120,27 +122,27 @@ async def update_email_template(
     template.content = template_update.content
     template.updated_at = datetime.utcnow()
     
-    db.commit()
+    await db.commit()
     
     return {"message": "模板已更新"}
 
 @router.delete('/email-templates/{template_id}')
 async def delete_email_template(
     template_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """删除邮件模板（仅管理员）"""
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以删除邮件模板")
     
-    template = db.query(models.EmailTemplate).filter(models.EmailTemplate.id == template_id).first()
+    template = await db.get(models.EmailTemplate, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="模板不存在")
     
     # 软删除：标记为非活跃状态
     template.is_active = False
-    db.commit()
+    await db.commit()
     
     return {"message": "模板已删除"}
 
@@ -149,18 +151,19 @@ async def get_email_logs(
     skip: int = 0,
     limit: int = 50,
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """获取邮件发送日志（仅管理员）"""
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以查看邮件日志")
     
-    query = db.query(models.EmailLog)
+    query = select(models.EmailLog)
     
     if status:
         query = query.filter(models.EmailLog.status == status)
     
-    logs = query.order_by(models.EmailLog.created_at.desc()).offset(skip).limit(limit).all()
+    result = await db.execute(query.order_by(models.EmailLog.created_at.desc()).offset(skip).limit(limit))
+    logs = result.scalars().all()
     
     return logs
\ No newline at end of file
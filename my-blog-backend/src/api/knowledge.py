@@ -3,15 +3,18 @@
 """
 
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
-from src.model.database import get_db
+from src.model.database import get_async_db, get_read_db
 from src.model import models
 from src.utils.auth import get_current_user_id
 from src.utils.logger import log
+from src.utils.cache import cached, response_cache
+from src.utils.suggest_index import suggest_index
 
 router = APIRouter()
 
@@ -42,21 +45,23 @@ class KnowledgeCategoryUpdate(BaseModel):
     sort_order: Optional[int] = None
 
 @router.get('/knowledge-categories', response_model=List[KnowledgeCategoryResponse])
+@cached("knowledge-categories", tags=["categories"])
 async def get_knowledge_categories(
     parent_id: Optional[int] = None,
     include_children: bool = True,
     include_count: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取知识库分类列表"""
-    query = db.query(models.KnowledgeCategory).filter(models.KnowledgeCategory.is_active == True)
+    query = select(models.KnowledgeCategory).filter(models.KnowledgeCategory.is_active == True)
     
     if parent_id is not None:
         query = query.filter(models.KnowledgeCategory.parent_id == parent_id)
     else:
         query = query.filter(models.KnowledgeCategory.parent_id.is_(None))
     
-    categories = query.order_by(models.KnowledgeCategory.sort_order).all()
+    result = await db.execute(query.order_by(models.KnowledgeCategory.sort_order))
+    categories = result.scalars().all()
     
     # 构建响应数据
     result = []
@@ -75,18 +80,19 @@ async def get_knowledge_categories(
         
         # 获取文章数量
         if include_count:
-            article_count = db.query(models.Article).filter(
+            article_count = await db.scalar(select(func.count(models.Article.id)).filter(
                 models.Article.knowledge_category_id == category.id,
                 models.Article.status == "published"
-            ).count()
+            ))
             category_data["article_count"] = article_count
         
         # 获取子分类
         if include_children:
-            children = db.query(models.KnowledgeCategory).filter(
+            children_result = await db.execute(select(models.KnowledgeCategory).filter(
                 models.KnowledgeCategory.parent_id == category.id,
                 models.KnowledgeCategory.is_active == True
-            ).order_by(models.KnowledgeCategory.sort_order).all()
+            ).order_by(models.KnowledgeCategory.sort_order))
+            children = children_result.scalars().all()
             
             for child in children:
                 child_data = {
@@ -102,10 +108,10 @@ async def get_knowledge_categories(
                 }
                 
                 if include_count:
-                    child_article_count = db.query(models.Article).filter(
+                    child_article_count = await db.scalar(select(func.count(models.Article.id)).filter(
                         models.Article.knowledge_category_id == child.id,
                         models.Article.status == "published"
-                    ).count()
+                    ))
                     child_data["article_count"] = child_article_count
                 
                 category_data["children"].append(child_data)
@@ -115,14 +121,16 @@ async def get_knowledge_categories(
     return result
 
 @router.get('/knowledge-categories/all', response_model=List[KnowledgeCategoryResponse])
+@cached("knowledge-categories-all", tags=["categories"])
 async def get_all_knowledge_categories(
     include_count: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取所有知识库分类（扁平列表，用于下拉选择）"""
-    categories = db.query(models.KnowledgeCategory).filter(
+    result = await db.execute(select(models.KnowledgeCategory).filter(
         models.KnowledgeCategory.is_active == True
-    ).order_by(models.KnowledgeCategory.sort_order).all()
+    ).order_by(models.KnowledgeCategory.sort_order))
+    categories = result.scalars().all()
     
     result = []
     for category in categories:
@@ -140,10 +148,10 @@ async def get_all_knowledge_categories(
         
         # 获取文章数量
         if include_count:
-            article_count = db.query(models.Article).filter(
+            article_count = await db.scalar(select(func.count(models.Article.id)).filter(
                 models.Article.knowledge_category_id == category.id,
                 models.Article.status == "published"
-            ).count()
+            ))
             category_data["article_count"] = article_count
         
         result.append(category_data)
@@ -153,15 +161,15 @@ async def get_all_knowledge_categories(
 @router.post('/knowledge-categories', response_model=KnowledgeCategoryResponse)
 async def create_knowledge_category(
     category: KnowledgeCategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """创建知识库分类（登录用户可创建）"""
     # 检查分类名是否已存在
-    existing = db.query(models.KnowledgeCategory).filter(
+    existing = await db.scalar(select(models.KnowledgeCategory).filter(
         models.KnowledgeCategory.name == category.name,
         models.KnowledgeCategory.is_active == True
-    ).first()
+    ))
     if existing:
         # 如果已存在，直接返回现有分类
         return {
@@ -178,10 +186,10 @@ async def create_knowledge_category(
     
     # 如果指定了父分类，验证其是否存在
     if category.parent_id:
-        parent = db.query(models.KnowledgeCategory).filter(
+        parent = await db.scalar(select(models.KnowledgeCategory).filter(
             models.KnowledgeCategory.id == category.parent_id,
             models.KnowledgeCategory.is_active == True
-        ).first()
+        ))
         if not parent:
             raise HTTPException(status_code=404, detail="父分类不存在")
     
@@ -193,8 +201,10 @@ async def create_knowledge_category(
     )
     
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    await db.refresh(db_category)
+    await response_cache.invalidate("categories")
+    suggest_index.add("category", db_category.id, db_category.name)
     
     log.info(f"用户 {current_user_id} 创建知识库分类: {category.name}")
     
@@ -214,25 +224,25 @@ async def create_knowledge_category(
 async def update_knowledge_category(
     category_id: int,
     category_update: KnowledgeCategoryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """更新知识库分类（仅管理员和编辑者）"""
-    user = db.query(models.User).filter(models.User.id == current_user_id).first()
+    user = await db.get(models.User, current_user_id)
     if not user or user.role not in ["admin", "editor"]:
         raise HTTPException(status_code=403, detail="仅管理员和编辑者可以更新分类")
     
-    category = db.query(models.KnowledgeCategory).filter(models.KnowledgeCategory.id == category_id).first()
+    category = await db.get(models.KnowledgeCategory, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="分类不存在")
     
     # 检查新名称是否与其他分类冲突
     if category_update.name and category_update.name != category.name:
-        existing = db.query(models.KnowledgeCategory).filter(
+        existing = await db.scalar(select(models.KnowledgeCategory).filter(
             models.KnowledgeCategory.name == category_update.name,
             models.KnowledgeCategory.id != category_id,
             models.KnowledgeCategory.is_active == True
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="分类名称已存在")
     
@@ -246,8 +256,10 @@ async def update_knowledge_category(
     if category_update.sort_order is not None:
         category.sort_order = category_update.sort_order
     
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
+    await response_cache.invalidate("categories")
+    suggest_index.add("category", category.id, category.name)
     
     return {
         "id": category.id,
@@ -264,32 +276,34 @@ async def update_knowledge_category(
 @router.delete('/knowledge-categories/{category_id}')
 async def delete_knowledge_category(
     category_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """删除知识库分类（仅管理员）"""
     if current_user_id != 1:
         raise HTTPException(status_code=403, detail="仅管理员可以删除分类")
     
-    category = db.query(models.KnowledgeCategory).filter(models.KnowledgeCategory.id == category_id).first()
+    category = await db.get(models.KnowledgeCategory, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="分类不存在")
     
     # 检查是否有子分类
-    children = db.query(models.KnowledgeCategory).filter(
+    children = await db.scalar(select(func.count(models.KnowledgeCategory.id)).filter(
         models.KnowledgeCategory.parent_id == category_id,
         models.KnowledgeCategory.is_active == True
-    ).count()
+    ))
     if children > 0:
         raise HTTPException(status_code=400, detail="不能删除包含子分类的分类")
     
     # 检查是否有关联的文章
-    articles = db.query(models.Article).filter(models.Article.knowledge_category_id == category_id).count()
+    articles = await db.scalar(select(func.count(models.Article.id)).filter(models.Article.knowledge_category_id == category_id))
     if articles > 0:
         raise HTTPException(status_code=400, detail="不能删除包含文章的分类")
     
     # 软删除：标记为非活跃状态
     category.is_active = False
-    db.commit()
+    await db.commit()
+    await response_cache.invalidate("categories")
+    suggest_index.remove("category", category_id)
     
     return {"message": "分类已删除"}
\ No newline at end of file
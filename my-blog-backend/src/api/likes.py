@@ -0,0 +1,44 @@
+"""
+点赞状态相关API
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from pydantic import BaseModel
+
+from src.model.database import get_read_db
+from src.utils.auth import get_current_user_id
+from src.utils.likes import LIKE_TARGET_MODELS, get_liked_ids
+
+router = APIRouter()
+
+# 单次批量查询的最大ID数量
+MAX_LIKE_LOOKUP_IDS = 200
+
+class LikedResponse(BaseModel):
+    target_type: str
+    liked_ids: list[int]
+
+@router.get('/likes', response_model=LikedResponse)
+async def get_liked(
+    target_type: str,
+    ids: List[int] = Query(default=[]),
+    db: AsyncSession = Depends(get_read_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """批量查询当前用户点赞过哪些对象
+
+    参数:
+    - target_type: article 或 comment
+    - ids: 要查询的对象ID，可重复传递，例如 ?ids=1&ids=2
+    """
+    if target_type not in LIKE_TARGET_MODELS:
+        raise HTTPException(status_code=400, detail="无效的点赞对象类型")
+    
+    if len(ids) > MAX_LIKE_LOOKUP_IDS:
+        raise HTTPException(status_code=400, detail=f"单次最多查询{MAX_LIKE_LOOKUP_IDS}个对象")
+    
+    liked = await get_liked_ids(db, current_user_id, target_type, ids)
+    
+    return {"target_type": target_type, "liked_ids": sorted(liked)}
@@ -2,16 +2,18 @@
 通知系统相关API
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Response
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
-from src.model.database import get_db
+from src.model.database import get_async_db
 from src.model import models
 from src.utils.auth import get_current_user_id
 from src.utils.logger import log
+from src.utils.pagination import apply_keyset, next_cursor, NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
@@ -39,26 +41,36 @@ class NotificationResponse(BaseModel):
 
 @router.get('/notifications', response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
     unread_only: bool = False,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """获取当前用户的通知列表"""
-    query = db.query(models.Notification).filter(models.Notification.user_id == current_user_id)
+    """获取当前用户的通知列表，提供cursor时按游标翻页并忽略skip"""
+    query = select(models.Notification).filter(models.Notification.user_id == current_user_id)
     
     if unread_only:
         query = query.filter(models.Notification.is_read == False)
     
-    notifications = query.order_by(models.Notification.created_at.desc()).offset(skip).limit(limit).all()
+    query = apply_keyset(query, models.Notification.created_at, models.Notification.id, cursor)
+    if not cursor:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    notifications = result.scalars().all()
+    
+    cursor_value = next_cursor(notifications, limit)
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
     
     return notifications
 
 @router.post('/notifications', response_model=NotificationResponse)
 async def create_notification(
     notification: NotificationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """创建新通知（仅管理员）"""
@@ -71,7 +83,7 @@ async def create_notification(
         raise HTTPException(status_code=400, detail="无效的通知类型")
     
     # 验证用户是否存在
-    user = db.query(models.User).filter(models.User.id == notification.user_id).first()
+    user = await db.get(models.User, notification.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -85,8 +97,8 @@ async def create_notification(
     )
     
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    await db.commit()
+    await db.refresh(db_notification)
     
     log.info(f"管理员创建通知: {notification.title} for user {notification.user_id}")
     
@@ -95,67 +107,67 @@ async def create_notification(
 @router.put('/notifications/{notification_id}/read')
 async def mark_notification_read(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """标记通知为已读"""
-    notification = db.query(models.Notification).filter(
+    notification = await db.scalar(select(models.Notification).filter(
         models.Notification.id == notification_id,
         models.Notification.user_id == current_user_id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
     
     notification.is_read = True
-    db.commit()
+    await db.commit()
     
     return {"message": "通知已标记为已读"}
 
 @router.put('/notifications/mark-all-read')
 async def mark_all_notifications_read(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """标记所有通知为已读"""
-    db.query(models.Notification).filter(
+    await db.execute(update(models.Notification).filter(
         models.Notification.user_id == current_user_id,
         models.Notification.is_read == False
-    ).update({"is_read": True})
+    ).values(is_read=True))
     
-    db.commit()
+    await db.commit()
     
     return {"message": "所有通知已标记为已读"}
 
 @router.delete('/notifications/{notification_id}')
 async def delete_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """删除通知"""
-    notification = db.query(models.Notification).filter(
+    notification = await db.scalar(select(models.Notification).filter(
         models.Notification.id == notification_id,
         models.Notification.user_id == current_user_id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
     
-    db.delete(notification)
-    db.commit()
+    await db.delete(notification)
+    await db.commit()
     
     return {"message": "通知已删除"}
 
 @router.get('/notifications/unread-count')
 async def get_unread_notifications_count(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """获取未读通知数量"""
-    count = db.query(models.Notification).filter(
+    count = await db.scalar(select(func.count(models.Notification.id)).filter(
         models.Notification.user_id == current_user_id,
         models.Notification.is_read == False
-    ).count()
+    ))
     
     return {"unread_count": count}
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+文章搜索API
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+from src.model.database import get_read_db
+from src.model import models
+from src.utils.search_index import search_index, highlight_pattern, highlight, make_snippet
+from src.utils.suggest_index import suggest_index, SUGGEST_TYPES
+from src.utils.tokenizer import markdown_to_text
+
+router = APIRouter()
+
+class SearchResult(BaseModel):
+    id: int
+    title: str
+    title_highlight: str  # 已转义的HTML，命中词用<mark>标记
+    snippet: str  # 已转义的HTML，命中词用<mark>标记
+    score: float
+    author_name: Optional[str] = None
+    created_at: datetime
+    tags: list[str]
+    is_knowledge_base: Optional[bool] = False
+    knowledge_category_id: Optional[int] = None
+    knowledge_category_name: Optional[str] = None
+
+class SuggestItem(BaseModel):
+    type: str  # article / tag / category
+    id: int
+    text: str
+
+@router.get('/search', response_model=List[SearchResult])
+async def search_articles(
+    q: str = Query(..., min_length=1, max_length=100),
+    knowledge_base: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """全文搜索已发布文章，按相关度排序
+
+    参数:
+    - q: 搜索关键词，多个关键词需同时命中
+    - knowledge_base / category_id: 按知识库和知识库分类筛选
+    """
+    total, ranked = search_index.search(q, knowledge_base, category_id, skip, limit)
+
+    articles = {}
+    if ranked:
+        result = await db.execute(select(models.Article).options(
+            selectinload(models.Article.tags_relationship),
+            joinedload(models.Article.author),
+            joinedload(models.Article.knowledge_category)
+        ).filter(
+            models.Article.id.in_([doc_id for doc_id, _ in ranked]),
+            models.Article.status == "published"
+        ))
+        articles = {article.id: article for article in result.scalars().all()}
+
+    pattern = highlight_pattern(q)
+    results = []
+    for doc_id, score in ranked:
+        article = articles.get(doc_id)
+        if article is None:
+            continue
+        # 正文没有命中时（如只命中标题或标签）用摘要作为片段
+        text = markdown_to_text(article.content)
+        if pattern is None or not pattern.search(text):
+            text = article.summary or text
+        results.append({
+            'id': article.id,
+            'title': article.title,
+            'title_highlight': highlight(article.title, pattern),
+            'snippet': make_snippet(text, pattern),
+            'score': round(score, 4),
+            'author_name': article.author.username if article.author else "未知作者",
+            'created_at': article.created_at.isoformat(),
+            'tags': [tag.name for tag in article.tags_relationship],
+            'is_knowledge_base': article.is_knowledge_base,
+            'knowledge_category_id': article.knowledge_category_id,
+            'knowledge_category_name': article.knowledge_category.name if article.knowledge_category else None
+        })
+
+    response = JSONResponse(content=results)
+    response.headers["X-Total-Count"] = str(total)
+    return response
+
+@router.get('/suggest', response_model=List[SuggestItem])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=20),
+    types: Optional[str] = Query(None, description="逗号分隔的类型：article,tag,category")
+):
+    """输入联想：按前缀（含拼音、拼音首字母）匹配文章标题、标签和知识库分类，查询不访问数据库"""
+    type_list = None
+    if types:
+        type_list = [item.strip() for item in types.split(",") if item.strip()]
+        if any(item not in SUGGEST_TYPES for item in type_list):
+            raise HTTPException(status_code=400, detail="不支持的联想类型")
+    return suggest_index.suggest(q, limit, type_list)
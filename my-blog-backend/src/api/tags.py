@@ -2,14 +2,17 @@
 标签相关API
 """
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+from typing import Literal, Optional
 
-from src.model.database import get_db
+from src.model.database import get_async_db, get_read_db
 from src.model import models
 from src.utils.auth import get_current_user_id
-from src.utils.cache import conditional_cache
+from src.utils.cache import cached, response_cache
+from src.utils.suggest_index import suggest_index
 
 router = APIRouter()
 
@@ -19,33 +22,59 @@ class TagCreate(BaseModel):
 class TagResponse(BaseModel):
     id: int
     name: str
+    article_count: Optional[int] = None  # with_counts=true 时返回
     
     class Config:
         from_attributes = True
 
-@router.get('/tags', response_model=list[TagResponse])
-@conditional_cache(expire=300)  # 缓存5分钟
-async def get_tags(db: Session = Depends(get_db)):
-    """获取所有标签"""
-    tags = db.query(models.Tag).all()
-    return [{"id": tag.id, "name": tag.name} for tag in tags]
+@router.get('/tags', response_model=list[TagResponse], response_model_exclude_none=True)
+@cached("tags", tags=["tags"])
+async def get_tags(
+    with_counts: bool = False,
+    sort: Literal["id", "name", "popular"] = Query("id"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """获取所有标签
+
+    参数:
+    - with_counts: 是否返回每个标签的已发布文章数（读取物化的 article_count，不做统计查询）
+    - sort: id（默认）、name，或 popular 按文章数从多到少排列
+    - limit: 最多返回的标签数，配合 sort=popular 获取热门标签
+    """
+    query = select(models.Tag.id, models.Tag.name, models.Tag.article_count)
+    if sort == "popular":
+        query = query.order_by(models.Tag.article_count.desc(), models.Tag.id)
+    elif sort == "name":
+        query = query.order_by(models.Tag.name, models.Tag.id)
+    else:
+        query = query.order_by(models.Tag.id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    rows = (await db.execute(query)).all()
+    if with_counts:
+        return [{"id": tag_id, "name": name, "article_count": count} for tag_id, name, count in rows]
+    return [{"id": tag_id, "name": name} for tag_id, name, _ in rows]
 
 @router.post('/tags', response_model=TagResponse)
 async def create_tag(
     tag: TagCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     """创建新标签（需要登录）"""
     # 检查标签是否已存在
-    db_tag = db.query(models.Tag).filter(models.Tag.name == tag.name).first()
+    db_tag = await db.scalar(select(models.Tag).filter(models.Tag.name == tag.name))
     if db_tag:
         return db_tag
     
     # 创建新标签
     new_tag = models.Tag(name=tag.name)
     db.add(new_tag)
-    db.commit()
-    db.refresh(new_tag)
+    await db.commit()
+    await db.refresh(new_tag)
+    await response_cache.invalidate("tags")
+    suggest_index.add("tag", new_tag.id, new_tag.name)
 
     return new_tag
\ No newline at end of file
@@ -3,17 +3,28 @@ from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-from fastapi_cache import FastAPICache
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request as StarletteRequest
 
 from src.model import models
-from src.model.database import engine, SessionLocal
-from src.utils.cache import cache_enabled
+from src.model.database import (
+    engine, async_engine, replica_async_engine, AsyncSessionLocal,
+    begin_request_db_state, PRIMARY_STICKY_COOKIE, DB_REPLICA_STICKY_SECONDS
+)
+from src.utils.cache import init_cache_backend, close_cache_backend
 from src.utils.logger import log
 from src.utils.fastapi_logging import LoggingMiddleware
+from src.utils.view_counter import view_counter
+from src.utils.search_index import search_index
+from src.utils.suggest_index import suggest_index
+from src.utils.facet_index import facet_index
+from src.utils.related_articles import related_engine
+from src.utils.counter_reconciler import counter_reconciler
+from src.utils.ip_location import ip_location_service
+from src.utils.visitor_geo import visitor_geo_locator
+from src.utils.visitor_log_writer import visitor_log_writer
 
 # 导入API路由
 from src.api.upload import router as upload_router
@@ -25,6 +36,8 @@ from src.api.admin import router as admin_router
 from src.api.notifications import router as notifications_router
 from src.api.knowledge import router as knowledge_router
 from src.api.email import router as email_router
+from src.api.likes import router as likes_router
+from src.api.search import router as search_router
 
 load_dotenv(dotenv_path='./.env')
 
@@ -46,7 +59,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(LoggingMiddleware, db_session_maker=SessionLocal)
+# 读写分离：写入后的短时间内让同一客户端的读请求回到主库（read-your-writes）
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: StarletteRequest, call_next):
+        state = begin_request_db_state(prefer_primary=PRIMARY_STICKY_COOKIE in request.cookies)
+        response = await call_next(request)
+        if state["wrote"]:
+            response.set_cookie(
+                PRIMARY_STICKY_COOKIE, "1",
+                max_age=DB_REPLICA_STICKY_SECONDS, httponly=True, samesite="lax"
+            )
+        return response
+
+# 必须位于LoggingMiddleware内层，访问记录的写入不应触发主库粘滞
+if replica_async_engine is not None:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+app.add_middleware(LoggingMiddleware, db_session_maker=AsyncSessionLocal)
 
 # 注册API路由
 app.include_router(upload_router, prefix="/api", tags=["upload"])
@@ -58,6 +87,8 @@ app.include_router(admin_router, prefix="/api/admin", tags=["admin"])
 app.include_router(notifications_router, prefix="/api", tags=["notifications"])
 app.include_router(knowledge_router, prefix="/api", tags=["knowledge"])
 app.include_router(email_router, prefix="/api", tags=["email"])
+app.include_router(likes_router, prefix="/api", tags=["likes"])
+app.include_router(search_router, prefix="/api", tags=["search"])
 
 # 添加速率限制中间件
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -122,16 +153,64 @@ def health_check():
 
 @app.on_event("startup")
 async def startup():
-    global cache_enabled
     try:
-        # 使用内存缓存
-        from fastapi_cache.backends.inmemory import InMemoryBackend
-        FastAPICache.init(InMemoryBackend(), prefix="myblog-cache:")
-        cache_enabled = True
-        log.info("内存缓存初始化成功")
+        # 按配置初始化缓存后端，未初始化时接口直接查询数据库
+        backend_name = await init_cache_backend()
+        log.info(f"缓存初始化成功，后端: {backend_name}")
     except Exception as e:
-        cache_enabled = False
-        log.error(f"内存缓存初始化失败: {str(e)}")
+        log.error(f"缓存初始化失败: {str(e)}")
+
+    # 启动浏览量批量写回任务
+    view_counter.start()
+
+    # 启动访问记录批量写入任务
+    visitor_log_writer.start()
+
+    # 加载搜索索引并启动增量同步
+    await search_index.start()
+
+    # 启动输入联想索引的定期重建
+    suggest_index.start()
+
+    # 启动分面筛选位图索引的定期重建
+    await facet_index.start()
+
+    # 启动相关文章的增量更新任务
+    related_engine.start()
+
+    # 启动文章计数的定期校对
+    counter_reconciler.start()
+
+    # 加载IP地理位置缓存并启动后台写入
+    await ip_location_service.start()
+
+    # 启动访客IP地理位置的定期解析
+    visitor_geo_locator.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # 写回缓冲中的浏览量和访问记录
+    await view_counter.stop()
+    await visitor_log_writer.stop()
+
+    # 保存搜索索引
+    await search_index.stop()
+    await suggest_index.stop()
+    await facet_index.stop()
+    await related_engine.stop()
+    await counter_reconciler.stop()
+    await visitor_geo_locator.stop()
+
+    # 关闭IP在线查询的连接池
+    await ip_location_service.aclose()
+
+    # 关闭异步引擎的连接池
+    await async_engine.dispose()
+    if replica_async_engine is not None:
+        await replica_async_engine.dispose()
+
+    await close_cache_backend()
 
 
 # 启动服务器
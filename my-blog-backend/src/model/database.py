@@ -1,21 +1,136 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 import os
+from contextvars import ContextVar
+from typing import Optional
 from dotenv import load_dotenv
 
+from src.utils.pool_stats import PoolStats, instrumented_pool_class
+
 # 加载环境变量
 load_dotenv()
 
 # 数据库配置
 DATABASE_URL = f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
-# 创建引擎
-engine = create_engine(DATABASE_URL)
+# 异步驱动连接地址（API请求使用，避免阻塞事件循环）
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+
+# 只读副本配置（未设置DB_REPLICA_HOST时所有读请求仍走主库）
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+REPLICA_DATABASE_URL = None
+if DB_REPLICA_HOST:
+    REPLICA_DATABASE_URL = (
+        f"mysql+aiomysql://{os.getenv('DB_REPLICA_USER', os.getenv('DB_USER'))}:"
+        f"{os.getenv('DB_REPLICA_PASSWORD', os.getenv('DB_PASSWORD'))}@{DB_REPLICA_HOST}:"
+        f"{os.getenv('DB_REPLICA_PORT', os.getenv('DB_PORT'))}/{os.getenv('DB_NAME')}"
+    )
+
+# 写入后在该时间内（秒）同一客户端的读请求仍走主库，规避复制延迟
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+PRIMARY_STICKY_COOKIE = "db_primary_sticky"
+
+# 连接池配置（按worker数量调整，两个引擎各自持有一个连接池）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # 获取连接的最长等待秒数
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # 小于MySQL的wait_timeout，避免使用已被服务端断开的连接
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+# 连接池统计，供管理接口查看
+pool_stats = {
+    "primary": PoolStats("primary"),
+    "primary_async": PoolStats("primary_async"),
+}
+if REPLICA_DATABASE_URL:
+    pool_stats["replica_async"] = PoolStats("replica_async")
+
+# 创建引擎（同步，供Alembic、迁移脚本和建表使用）
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=instrumented_pool_class(QueuePool, pool_stats["primary"]),
+    **POOL_OPTIONS
+)
+
+# 创建异步引擎
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, pool_stats["primary_async"]),
+    **POOL_OPTIONS
+)
+
+# 创建只读副本异步引擎
+replica_async_engine = None
+if REPLICA_DATABASE_URL:
+    replica_async_engine = create_async_engine(
+        REPLICA_DATABASE_URL,
+        poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, pool_stats["replica_async"]),
+        **POOL_OPTIONS
+    )
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+class PrimarySession(Session):
+    """主库会话，写入时标记当前请求，供读写分离判断"""
+
+# 创建异步会话工厂，提交后不过期对象，避免在异步上下文中触发隐式加载
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=PrimarySession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# 只读副本会话工厂
+ReplicaSessionLocal = None
+if replica_async_engine is not None:
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+# 当前请求的读写状态，由ReadYourWritesMiddleware在请求开始时创建
+_request_db_state: ContextVar[Optional[dict]] = ContextVar("request_db_state", default=None)
+
+def begin_request_db_state(prefer_primary: bool = False) -> dict:
+    """为当前请求初始化读写状态
+
+    返回的字典在请求处理过程中被原地修改，中间件在响应阶段据此判断本次请求是否写过主库。
+    """
+    state = {"wrote": False, "prefer_primary": prefer_primary}
+    _request_db_state.set(state)
+    return state
+
+def _mark_request_wrote():
+    state = _request_db_state.get()
+    if state is not None:
+        state["wrote"] = True
+
+@event.listens_for(PrimarySession, "after_flush")
+def _mark_primary_write(session, flush_context):
+    _mark_request_wrote()
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _mark_primary_statement(orm_execute_state):
+    # db.execute(update/delete/insert) 不经过flush，按语句类型标记
+    if not orm_execute_state.is_select:
+        _mark_request_wrote()
+
 # 声明基类
 Base = declarative_base()
 
@@ -25,4 +140,30 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# 获取异步数据库连接
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# 获取只读数据库连接，用于只读接口
+async def get_read_db():
+    """优先使用只读副本；未配置副本、本请求已写入或客户端刚写入过时回退到主库"""
+    state = _request_db_state.get()
+    use_primary = ReplicaSessionLocal is None or (
+        state is not None and (state["wrote"] or state["prefer_primary"])
+    )
+    session_maker = AsyncSessionLocal if use_primary else ReplicaSessionLocal
+    async with session_maker() as db:
+        yield db
+
+def get_pool_status():
+    """获取所有引擎的连接池状态和统计"""
+    pools = [
+        pool_stats["primary"].snapshot(engine.pool),
+        pool_stats["primary_async"].snapshot(async_engine.pool),
+    ]
+    if replica_async_engine is not None:
+        pools.append(pool_stats["replica_async"].snapshot(replica_async_engine.pool))
+    return {"config": POOL_OPTIONS, "pools": pools}
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, ForeignKey, Table, Float, Enum as SQLEnum
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, ForeignKey, Table, Float, UniqueConstraint, Index, JSON, Enum as SQLEnum
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
+from sqlalchemy.orm import relationship, backref, deferred
 from datetime import datetime
 from enum import Enum
 
@@ -37,6 +38,11 @@ class User(Base):
     articles = relationship("Article", back_populates="author")
     comments = relationship("Comment", back_populates="user")
     notifications = relationship("Notification", back_populates="user")
+    
+    # 游标分页索引
+    __table_args__ = (
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
 
 class Article(Base):
     __tablename__ = 'articles'
@@ -62,6 +68,13 @@ class Article(Base):
     seo_description = Column(String(160), nullable=True)
     slug = Column(String(200), unique=True, nullable=True)
     
+    # 写入时渲染的Markdown结果，HTML和目录只在详情接口中加载
+    content_html = deferred(Column(Text().with_variant(MEDIUMTEXT(), "mysql"), nullable=True), raiseload=True)
+    toc = deferred(Column(JSON, nullable=True), raiseload=True)
+    excerpt = Column(String(300), nullable=True)
+    word_count = Column(Integer, nullable=True)
+    reading_time = Column(Integer, nullable=True)  # 预计阅读时间（分钟）
+    
     author = relationship("User", back_populates="articles")
     comments = relationship("Comment", back_populates="article")
     tags_relationship = relationship('Tag', secondary='article_tags', back_populates='articles')
@@ -69,6 +82,9 @@ class Article(Base):
     
     # 添加索引
     __table_args__ = (
+        Index('ix_articles_status_created_at_id', 'status', 'created_at', 'id'),
+        # 搜索索引等按修改时间增量同步
+        Index('ix_articles_updated_at', 'updated_at'),
         {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'},
     )
 
@@ -88,12 +104,19 @@ class Comment(Base):
     article = relationship("Article", back_populates="comments")
     user = relationship("User", back_populates="comments")
     parent = relationship("Comment", remote_side=[id], backref="replies")
+    
+    # 游标分页索引
+    __table_args__ = (
+        Index('ix_comments_article_created_at_id', 'article_id', 'created_at', 'id'),
+    )
 
 class Tag(Base):
     __tablename__ = 'tags'
     
     id = Column(Integer, primary_key=True)
     name = Column(String(50), nullable=False)
+    # 已发布文章数，随文章标签和状态变化增量维护，见 src/utils/tag_counts.py
+    article_count = Column(Integer, nullable=False, default=0, server_default="0", index=True)
     
     articles = relationship('Article', secondary='article_tags', back_populates='tags_relationship')
 
@@ -105,6 +128,39 @@ article_tags = Table(
     Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True)
 )
 
+# 点赞记录：同一用户对同一对象只能点赞一次，用于去重和"我是否点赞过"查询
+class LikeTargetType(str, Enum):
+    ARTICLE = "article"
+    COMMENT = "comment"
+
+class Like(Base):
+    __tablename__ = 'likes'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    target_type = Column(String(20), nullable=False)  # article, comment
+    target_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'target_type', 'target_id', name='uq_likes_user_target'),
+        Index('ix_likes_target', 'target_type', 'target_id'),
+        {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'},
+    )
+
+class RelatedArticle(Base):
+    """预计算的相关文章，每篇文章保存按得分排序的前k篇"""
+    __tablename__ = 'related_articles'
+    
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    rank = Column(Integer, primary_key=True, autoincrement=False)
+    related_id = Column(Integer, ForeignKey('articles.id'), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'},
+    )
+
 # 添加访问记录模型
 class VisitorLog(Base):
     __tablename__ = 'visitor_logs'
@@ -122,6 +178,25 @@ class VisitorLog(Base):
     
     # 与用户表的关联关系
     user = relationship("User", backref="access_logs")
+    
+    # 游标分页索引
+    __table_args__ = (
+        Index('ix_visitor_logs_request_time_id', 'request_time', 'id'),
+    )
+
+class IPGeolocation(Base):
+    """访客IP的地理位置，每个IP只解析一次，用于按地区聚合访问记录"""
+    __tablename__ = 'ip_geolocations'
+
+    ip_address = Column(String(50), primary_key=True)
+    province = Column(String(50), nullable=False, index=True)
+    city = Column(String(50), nullable=False)
+    isp = Column(String(50), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'},
+    )
 
 # 通知系统模型
 class NotificationType(str, Enum):
@@ -151,6 +226,11 @@ class Notification(Base):
     user = relationship("User", back_populates="notifications")
     article = relationship("Article", backref="notifications")
     comment = relationship("Comment", backref="notifications")
+    
+    # 游标分页索引
+    __table_args__ = (
+        Index('ix_notifications_user_created_at_id', 'user_id', 'created_at', 'id'),
+    )
 
 # 知识库分类模型
 class KnowledgeCategory(Base):
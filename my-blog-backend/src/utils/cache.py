@@ -1,29 +1,393 @@
 """
 缓存工具模块
+
+基于标签的响应缓存：
+- 缓存键由接口的显式参数构造，不包含数据库会话、请求对象等；
+- 每个缓存项声明依赖的标签（如 "articles"、"article:42"、"tags"、"categories"），
+  写操作通过 invalidate 使相关标签失效，缓存可以放心使用较长的过期时间。
+
+标签失效采用版本号方式：每个标签在缓存后端保存一个版本号，缓存键中包含其依赖标签的
+当前版本，失效即更换版本号，旧缓存项不再被命中并随过期时间自然淘汰。
+这种方式只依赖后端的 get/set，可用于内存和共享缓存后端。
+标签版本同时用于生成 ETag / Last-Modified，条件请求在查询数据库之前即可返回304。
+
+缓存后端由 CACHE_BACKEND 选择：
+- memory：进程内缓存（默认），每个worker各自独立，适合单worker部署；
+- redis：通过 REDIS_URL 连接的Redis，多个worker共享缓存和失效标签；
+- fakeredis：进程内的Redis替身，用于在测试和本地开发中走Redis代码路径。
 """
 
+import hashlib
+import inspect
+import json
+import os
+import time
+import uuid
+from datetime import date
+from email.utils import formatdate, parsedate_to_datetime
 from functools import wraps
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Union
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+
 from src.utils.logger import log
 
-# 全局变量用于跟踪缓存状态
-cache_enabled = False
+# 缓存后端配置
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "myblog-cache:")
+
+# 响应缓存默认过期时间（秒），依赖标签失效保证数据及时更新
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+# 标签版本号的保存时间（秒），过期后会生成新版本号，相当于一次失效
+TAG_VERSION_TTL = 30 * 24 * 3600
+
+# 可作为缓存键组成部分的参数类型
+_KEY_PARAM_TYPES = (str, int, float, bool, date, list, type(None))
+
+
+def _get_backend():
+    """获取缓存后端，未初始化时返回None（此时不使用缓存）"""
+    try:
+        return FastAPICache.get_backend()
+    except AssertionError:
+        return None
+
+
+class LocalBackend(InMemoryBackend):
+    """进程内缓存后端
+
+    InMemoryBackend 只在读取时删除过期项，标签失效后旧版本的缓存项不会再被读取，
+    这里每写入一定次数清理一次过期项，避免内存持续增长。
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self):
+        self._store = {}
+        self._writes = 0
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        await super().set(key, value, expire)
+        self._writes += 1
+        if self._writes >= self.PURGE_EVERY:
+            self._writes = 0
+            async with self._lock:
+                now = self._now
+                for expired in [k for k, v in self._store.items() if v.ttl_ts < now]:
+                    del self._store[expired]
+
+
+_redis_client = None
+
+
+async def init_cache_backend() -> str:
+    """按 CACHE_BACKEND 初始化缓存后端，返回实际使用的后端名称
+
+    Redis不可用时记录错误并退回进程内缓存，不影响应用启动。
+    """
+    global _redis_client
+
+    backend_name = CACHE_BACKEND
+    backend = None
+    if backend_name == "redis":
+        try:
+            from redis import asyncio as aioredis
+            client = aioredis.from_url(REDIS_URL)
+            await client.ping()
+            _redis_client = client
+            backend = RedisBackend(client)
+        except Exception as e:
+            log.error(f"Redis缓存连接失败，退回进程内缓存: {str(e)}")
+    elif backend_name == "fakeredis":
+        try:
+            from fakeredis import FakeAsyncRedis
+            _redis_client = FakeAsyncRedis()
+            backend = RedisBackend(_redis_client)
+        except ImportError:
+            log.error("未安装fakeredis，退回进程内缓存")
+    elif backend_name != "memory":
+        log.warning(f"未知的缓存后端 {backend_name}，使用进程内缓存")
+
+    if backend is None:
+        backend_name = "memory"
+        backend = LocalBackend()
+
+    FastAPICache.init(backend, prefix=CACHE_PREFIX)
+    return backend_name
+
+
+async def close_cache_backend():
+    """关闭缓存后端的连接"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
+
+
+def _key_value(value) -> str:
+    if isinstance(value, list):
+        return ",".join(str(item) for item in value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def build_key(namespace: str, **params) -> str:
+    """根据命名空间和参数构造缓存键，参数按名称排序"""
+    parts = [f"{name}={_key_value(params[name])}" for name in sorted(params)]
+    return f"{namespace}?{'&'.join(parts)}" if parts else namespace
+
+
+class CacheValidators(NamedTuple):
+    """条件请求的校验信息"""
+    etag: str
+    last_modified: float
+
+
+def _new_tag_version() -> str:
+    """生成标签版本号：毫秒时间戳（十六进制）加随机后缀，时间戳用于 Last-Modified"""
+    return f"{int(time.time() * 1000):x}.{uuid.uuid4().hex[:12]}"
 
-def conditional_cache(expire: int = 300):
-    """条件缓存装饰器"""
+
+def _version_time(version: str) -> float:
+    try:
+        return int(version.split(".", 1)[0], 16) / 1000
+    except ValueError:
+        return time.time()
+
+
+class ResponseCache:
+    """带标签失效的响应缓存"""
+
+    def _prefixed(self, key: str) -> str:
+        return f"{FastAPICache.get_prefix()}{key}"
+
+    async def tag_versions(self, tags: Iterable[str]) -> Optional[List[str]]:
+        """读取标签的当前版本号，缓存不可用时返回None
+
+        先读版本号再查询数据库，查询期间发生的失效不会让旧数据写入新版本的缓存项。
+        """
+        backend = _get_backend()
+        if backend is None:
+            return None
+        versions = []
+        try:
+            for tag in tags:
+                tag_key = self._prefixed(f"tag:{tag}")
+                version = await backend.get(tag_key)
+                if version is None:
+                    version = _new_tag_version()
+                    await backend.set(tag_key, version, expire=TAG_VERSION_TTL)
+                versions.append(version.decode() if isinstance(version, bytes) else version)
+        except Exception as e:
+            log.warning(f"读取缓存标签版本失败: {str(e)}")
+            return None
+        return versions
+
+    def _versioned_key(self, key: str, tags: Iterable[str], versions: List[str]) -> str:
+        suffix = ",".join(f"{tag}@{version}" for tag, version in zip(tags, versions))
+        return f"{key}|{suffix}"
+
+    def validators(self, key: str, tags: Iterable[str], versions: Optional[List[str]]) -> Optional[CacheValidators]:
+        """根据缓存键和标签版本生成 ETag / Last-Modified
+
+        响应内容只在依赖标签失效时变化，因此标签版本可以代替内容摘要，
+        计算校验信息无需查询数据库或序列化响应。浏览量等高频计数不参与校验。
+        """
+        if versions is None:
+            return None
+        tags = list(tags)
+        digest = hashlib.sha1(self._versioned_key(key, tags, versions).encode("utf-8")).hexdigest()
+        last_modified = max((_version_time(version) for version in versions), default=time.time())
+        return CacheValidators(etag=f'"{digest[:32]}"', last_modified=last_modified)
+
+    async def get(self, key: str, tags: Iterable[str], versions: Optional[List[str]] = None) -> Optional[Any]:
+        """读取缓存，未命中或缓存不可用时返回None"""
+        backend = _get_backend()
+        if backend is None:
+            return None
+        tags = list(tags)
+        if versions is None:
+            versions = await self.tag_versions(tags)
+            if versions is None:
+                return None
+        try:
+            raw = await backend.get(self._prefixed(f"resp:{self._versioned_key(key, tags, versions)}"))
+        except Exception as e:
+            log.warning(f"读取缓存失败: {str(e)}")
+            return None
+        if raw is None:
+            return None
+        return self._decode(raw)
+
+    async def set(
+        self,
+        key: str,
+        tags: Iterable[str],
+        value: Any,
+        expire: int = RESPONSE_CACHE_TTL,
+        versions: Optional[List[str]] = None
+    ):
+        """写入缓存"""
+        backend = _get_backend()
+        if backend is None:
+            return
+        tags = list(tags)
+        if versions is None:
+            versions = await self.tag_versions(tags)
+            if versions is None:
+                return
+        try:
+            await backend.set(
+                self._prefixed(f"resp:{self._versioned_key(key, tags, versions)}"),
+                self._encode(value),
+                expire=expire
+            )
+        except Exception as e:
+            log.warning(f"写入缓存失败: {str(e)}")
+
+    async def invalidate(self, *tags: str):
+        """使依赖这些标签的缓存全部失效"""
+        backend = _get_backend()
+        if backend is None:
+            return
+        for tag in tags:
+            try:
+                await backend.set(self._prefixed(f"tag:{tag}"), _new_tag_version(), expire=TAG_VERSION_TTL)
+            except Exception as e:
+                log.warning(f"缓存标签 {tag} 失效失败: {str(e)}")
+
+    @staticmethod
+    def _encode(value: Any) -> str:
+        if isinstance(value, Response):
+            headers = {
+                name: header for name, header in value.headers.items()
+                if name.lower() != "content-length"
+            }
+            payload = {
+                "__response__": True,
+                "status_code": value.status_code,
+                "headers": headers,
+                "body": value.body.decode("utf-8"),
+            }
+        else:
+            payload = {"__response__": False, "value": jsonable_encoder(value)}
+        return json.dumps(payload, ensure_ascii=False)
+
+    @staticmethod
+    def _decode(raw: Union[str, bytes]) -> Any:
+        payload = json.loads(raw)
+        if payload["__response__"]:
+            return Response(
+                content=payload["body"],
+                status_code=payload["status_code"],
+                headers=payload["headers"]
+            )
+        return payload["value"]
+
+
+response_cache = ResponseCache()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match 使用弱比较，经nginx gzip压缩后ETag会带上 W/ 前缀；
+    # 校验信息只由缓存键和标签版本得出，不能说明资源存在，因此不接受 *
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, validators: CacheValidators) -> bool:
+    """判断条件请求是否可以返回304，If-None-Match 优先于 If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return _etag_matches(if_none_match, validators.etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(validators.last_modified) <= since
+    return False
+
+
+def set_validator_headers(response: Response, validators: CacheValidators):
+    """在响应中写入 ETag / Last-Modified，并要求客户端每次使用前重新校验"""
+    response.headers["ETag"] = validators.etag
+    response.headers["Last-Modified"] = formatdate(validators.last_modified, usegmt=True)
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified_response(validators: CacheValidators) -> Response:
+    """构造304响应"""
+    response = Response(status_code=304)
+    set_validator_headers(response, validators)
+    return response
+
+
+def cached(
+    namespace: str,
+    tags: Union[List[str], Callable[..., List[str]]],
+    key_builder: Optional[Callable[..., str]] = None,
+    expire: int = RESPONSE_CACHE_TTL
+):
+    """接口响应缓存装饰器，同时处理 ETag / Last-Modified 条件请求
+
+    校验信息由缓存键和标签版本得出。缓存命中时条件请求直接返回304，不执行接口函数；
+    未命中时先执行接口函数，接口出错（如404、503）时不会因校验信息得到304。
+
+    Args:
+        namespace: 缓存键命名空间
+        tags: 依赖标签列表，或根据接口参数返回标签列表的函数
+        key_builder: 根据接口参数构造缓存键的函数，默认使用所有简单类型参数
+        expire: 过期时间（秒）
+    """
     def decorator(func):
         @wraps(func)
-        async def wrapper(*args, **kwargs):
-            if cache_enabled:
-                # 如果缓存启用，使用缓存装饰器
-                try:
-                    from fastapi_cache.decorator import cache
-                    cached_func = cache(expire=expire)(func)
-                    return await cached_func(*args, **kwargs)
-                except Exception as e:
-                    log.warning(f"缓存操作失败，直接执行函数: {str(e)}")
-                    return await func(*args, **kwargs)
+        async def wrapper(*args, cache_request: Request, cache_response: Response, **kwargs):
+            if key_builder is not None:
+                key = key_builder(**kwargs)
             else:
-                # 如果缓存未启用，直接执行函数
-                return await func(*args, **kwargs)
+                key = build_key(namespace, **{
+                    name: value for name, value in kwargs.items()
+                    if isinstance(value, _KEY_PARAM_TYPES)
+                })
+            tag_list = tags(**kwargs) if callable(tags) else tags
+
+            versions = await response_cache.tag_versions(tag_list)
+            validators = response_cache.validators(key, tag_list, versions)
+
+            result = await response_cache.get(key, tag_list, versions) if versions is not None else None
+            if result is None:
+                result = await func(*args, **kwargs)
+                if versions is not None:
+                    await response_cache.set(key, tag_list, result, expire=expire, versions=versions)
+
+            # 只对缓存命中或接口正常返回的结果处理条件请求
+            if validators is not None and is_not_modified(cache_request, validators):
+                return not_modified_response(validators)
+
+            if validators is not None:
+                set_validator_headers(result if isinstance(result, Response) else cache_response, validators)
+            return result
+
+        # 在接口签名中追加Request和Response参数，由FastAPI注入
+        signature = inspect.signature(func)
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter("cache_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ])
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,72 @@
+"""
+分页总数缓存模块
+
+列表接口填充 X-Total-Count 时不再每次执行 COUNT(*)：
+- 精确总数按筛选条件组合缓存，文章新增或状态变化时按命名空间失效；
+- 超大表（如 visitor_logs）可选近似模式，无筛选条件时直接读取表统计信息中的估算行数。
+"""
+
+import os
+from typing import Hashable, Optional, Tuple
+
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.utils.cache import response_cache
+from src.utils.logger import log
+
+# 精确总数缓存时间（秒），文章相关的命名空间会在写入时主动失效
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "300"))
+
+
+class CountCache:
+    """按 (命名空间, 筛选条件...) 缓存查询总数
+
+    总数保存在响应缓存的后端中（多个worker共享），命名空间同时作为失效标签，
+    因此 response_cache.invalidate("articles") 也会使文章列表的总数失效。
+    """
+
+    def __init__(self, ttl: int = COUNT_CACHE_TTL):
+        self.ttl = ttl
+
+    async def get_or_count(self, db: AsyncSession, key: Tuple[Hashable, ...], query, ttl: Optional[int] = None) -> int:
+        """返回缓存的总数，未命中时执行 COUNT 查询并缓存
+
+        Args:
+            key: 第一个元素为命名空间，其余为筛选条件取值
+            query: 未分页的select查询
+            ttl: 覆盖默认缓存时间
+        """
+        namespace = key[0]
+        cache_key = "count:" + "|".join(str(part) for part in key)
+        total = await response_cache.get(cache_key, [namespace])
+        if total is not None:
+            return total
+
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery())) or 0
+        await response_cache.set(cache_key, [namespace], total, expire=self.ttl if ttl is None else ttl)
+        return total
+
+    async def invalidate(self, namespace: str):
+        """使某个命名空间下的所有总数失效"""
+        await response_cache.invalidate(namespace)
+
+
+async def approximate_table_rows(db: AsyncSession, table_name: str) -> Optional[int]:
+    """读取MySQL表统计信息中的估算行数，非MySQL或读取失败时返回None"""
+    if db.bind.dialect.name != "mysql":
+        return None
+    try:
+        return await db.scalar(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+            ),
+            {"table_name": table_name}
+        )
+    except Exception as e:
+        log.warning(f"读取表 {table_name} 的估算行数失败: {str(e)}")
+        return None
+
+
+count_cache = CountCache()
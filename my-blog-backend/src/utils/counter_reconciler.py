@@ -0,0 +1,181 @@
+"""
+文章计数校对模块
+
+文章上的 comments_count 是冗余计数，由评论接口增量维护，
+级联删除、事务失败等情况会使其与实际数据产生偏差。后台任务定期按ID分段校对：
+- 每段在一个短事务内用 GROUP BY 统计 comments 表中的实际数量，与计数列比较；
+- 只更新有偏差的行，更新时以读到的旧值为条件（比较后交换），期间被并发修改的行留到下一轮，
+  不会覆盖新的增量；
+- 每段之间让出事件循环并暂停，不长时间占用连接或锁住 articles 表；
+- 注意：likes 的偏差不会被修正。likes 表创建前的点赞没有明细记录（无法回填，见 src/utils/likes.py），
+  按 likes 表统计会把原有点赞数清零，因此 likes 和 views（增量见 view_counter）一样
+  只修正空值和负数，报告的 unverified 中列出这些没有按明细重算的计数列。
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, update, func
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.cache import response_cache
+from src.utils.logger import log
+
+# 两轮校对之间的间隔（秒），0表示不启动后台任务
+COUNTER_RECONCILE_INTERVAL = float(os.getenv("COUNTER_RECONCILE_INTERVAL", "3600"))
+
+# 每段校对的文章数
+COUNTER_RECONCILE_CHUNK_SIZE = int(os.getenv("COUNTER_RECONCILE_CHUNK_SIZE", "500"))
+
+# 每段之间的暂停时间（秒）
+COUNTER_RECONCILE_PAUSE = float(os.getenv("COUNTER_RECONCILE_PAUSE", "0.2"))
+
+# 报告中保留的偏差明细条数
+MAX_REPORT_DRIFT = 100
+
+# 校对的计数列
+COUNTER_COLUMNS = ("comments_count", "likes", "views")
+
+# 没有明细数据可以重算、只修正空值和负数的计数列及原因
+UNVERIFIED_COLUMNS = {
+    "likes": "likes 表未包含该表创建前的点赞，点赞数的偏差不会被修正",
+    "views": "浏览量没有明细记录，偏差不会被修正",
+}
+
+
+class CounterReconciler:
+    """分段校对文章计数并修正偏差"""
+
+    def __init__(
+        self,
+        interval: float = COUNTER_RECONCILE_INTERVAL,
+        chunk_size: int = COUNTER_RECONCILE_CHUNK_SIZE,
+        pause: float = COUNTER_RECONCILE_PAUSE
+    ):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.last_report: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def _reconcile_chunk(self, db, after_id: int, report: dict) -> Optional[int]:
+        """校对ID大于 after_id 的一段文章，返回该段最后的文章ID，没有更多文章时返回None"""
+        rows = (await db.execute(
+            select(
+                models.Article.id,
+                models.Article.comments_count,
+                models.Article.likes,
+                models.Article.views
+            )
+            .filter(models.Article.id > after_id)
+            .order_by(models.Article.id)
+            .limit(self.chunk_size)
+        )).all()
+        if not rows:
+            return None
+        first_id, last_id = rows[0].id, rows[-1].id
+
+        comment_counts = dict((await db.execute(
+            select(models.Comment.article_id, func.count())
+            .filter(models.Comment.article_id.between(first_id, last_id))
+            .group_by(models.Comment.article_id)
+        )).all())
+
+        fixed_ids: List[int] = []
+        for row in rows:
+            stored = {"comments_count": row.comments_count, "likes": row.likes, "views": row.views}
+            expected = {
+                "comments_count": comment_counts.get(row.id, 0),
+                "likes": row.likes if row.likes is not None and row.likes >= 0 else 0,
+                "views": row.views if row.views is not None and row.views >= 0 else 0,
+            }
+            drift = {name: value for name, value in expected.items() if stored[name] != value}
+            if not drift:
+                continue
+
+            # 以读到的旧值为条件更新，期间被并发修改的行不覆盖
+            conditions = [
+                getattr(models.Article, name).is_(None) if stored[name] is None
+                else getattr(models.Article, name) == stored[name]
+                for name in drift
+            ]
+            result = await db.execute(
+                update(models.Article)
+                .where(models.Article.id == row.id, *conditions)
+                .values(**drift, updated_at=models.Article.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                fixed_ids.append(row.id)
+                for name, value in drift.items():
+                    report["fixed"][name] += 1
+                    if len(report["drift"]) < MAX_REPORT_DRIFT:
+                        report["drift"].append({"article_id": row.id, "column": name, "stored": stored[name], "actual": value})
+            else:
+                report["skipped"] += 1
+
+        await db.commit()
+        report["checked"] += len(rows)
+        if fixed_ids:
+            await response_cache.invalidate("articles", *(f"article:{article_id}" for article_id in fixed_ids))
+        return last_id
+
+    async def run_once(self) -> dict:
+        """完整校对一轮，返回校对报告"""
+        async with self._lock:
+            report = {
+                "started_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+                "checked": 0,
+                "fixed": {name: 0 for name in COUNTER_COLUMNS},
+                "skipped": 0,
+                "drift": [],
+                "unverified": UNVERIFIED_COLUMNS,
+            }
+            after_id = 0
+            while True:
+                # 每段使用独立的会话和短事务
+                async with AsyncSessionLocal() as db:
+                    last_id = await self._reconcile_chunk(db, after_id, report)
+                if last_id is None:
+                    break
+                after_id = last_id
+                await asyncio.sleep(self.pause)
+
+            report["finished_at"] = datetime.utcnow().isoformat()
+            self.last_report = report
+            fixed_total = sum(report["fixed"].values())
+            if fixed_total:
+                log.warning(f"文章计数校对修正了 {fixed_total} 处偏差: {report['fixed']}")
+            else:
+                log.info(f"文章计数校对完成，检查 {report['checked']} 篇文章，无偏差")
+            return report
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                log.error(f"文章计数校对失败: {str(e)}")
+
+    def start(self):
+        """启动后台校对任务"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+counter_reconciler = CounterReconciler()
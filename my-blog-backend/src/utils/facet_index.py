@@ -0,0 +1,336 @@
+"""
+文章分面筛选位图索引模块
+
+按标签、知识库分类、状态、发布月份和是否知识库文章，为每个取值维护一个文章ID位图：
+- 位图用Python整数表示，第i位为1表示ID为i的文章属于该取值；文章ID自增且连续，
+  位图紧凑，交并集和计数由整数的按位运算和 bit_count 在C层完成，不引入额外依赖；
+- 多条件筛选即位图求交，分面计数即结果位图与各取值位图求交后计数，都不访问数据库；
+- 另外按 (created_at, id) 维护有序数组，在内存中完成排序和分页，只按页查询文章详情；
+- 写操作在当前进程内增量更新，后台任务定期从数据库重建，同步其他worker的修改；
+- 启动时先完成第一次重建再开始服务，首次建好前 ready 为False，接口不应使用（也不能缓存）空索引的结果。
+"""
+
+import asyncio
+import os
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.cache import response_cache
+from src.utils.logger import log
+
+# 后台重建间隔（秒）
+FACET_REFRESH_INTERVAL = float(os.getenv("FACET_REFRESH_INTERVAL", "60"))
+
+# 文章ID -> (状态, 是否知识库文章, 知识库分类ID, 创建时间, 标签ID列表)
+ArticleFacets = Tuple[str, bool, Optional[int], Optional[datetime], List[int]]
+
+
+def month_key(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+
+def iter_bits(bitmap: int) -> Iterable[int]:
+    """按从小到大的顺序返回位图中的文章ID"""
+    while bitmap:
+        low = bitmap & -bitmap
+        yield low.bit_length() - 1
+        bitmap ^= low
+
+
+def _bitmap_add(bitmaps: Dict, key, doc_id: int):
+    bitmaps[key] = bitmaps.get(key, 0) | (1 << doc_id)
+
+
+def _bitmap_remove(bitmaps: Dict, key, doc_id: int):
+    bitmap = bitmaps.get(key, 0) & ~(1 << doc_id)
+    if bitmap:
+        bitmaps[key] = bitmap
+    else:
+        bitmaps.pop(key, None)
+
+
+class FacetIndex:
+    """文章属性位图索引"""
+
+    def __init__(self, interval: float = FACET_REFRESH_INTERVAL):
+        self.interval = interval
+        self._docs: Dict[int, ArticleFacets] = {}
+        self._status: Dict[str, int] = {}
+        self._knowledge: Dict[bool, int] = {}
+        self._categories: Dict[int, int] = {}
+        self._tags: Dict[int, int] = {}
+        self._months: Dict[str, int] = {}
+        # 已发布文章按 (created_at, id) 升序排列，分页时倒序遍历
+        self._order: List[Tuple[datetime, int]] = []
+        self.ready = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        doc_id: int,
+        status: str,
+        is_knowledge_base: bool,
+        category_id: Optional[int],
+        created_at: Optional[datetime],
+        tag_ids: Iterable[int]
+    ):
+        """加入或更新一篇文章"""
+        self.remove(doc_id)
+        is_knowledge_base = bool(is_knowledge_base)
+        tag_ids = sorted(set(tag_ids))
+        self._docs[doc_id] = (status, is_knowledge_base, category_id, created_at, tag_ids)
+        _bitmap_add(self._status, status, doc_id)
+        _bitmap_add(self._knowledge, is_knowledge_base, doc_id)
+        if category_id is not None:
+            _bitmap_add(self._categories, category_id, doc_id)
+        for tag_id in tag_ids:
+            _bitmap_add(self._tags, tag_id, doc_id)
+        if created_at is not None:
+            _bitmap_add(self._months, month_key(created_at), doc_id)
+            if status == "published":
+                insort(self._order, (created_at, doc_id))
+
+    def remove(self, doc_id: int):
+        """移除一篇文章"""
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        status, is_knowledge_base, category_id, created_at, tag_ids = doc
+        _bitmap_remove(self._status, status, doc_id)
+        _bitmap_remove(self._knowledge, is_knowledge_base, doc_id)
+        if category_id is not None:
+            _bitmap_remove(self._categories, category_id, doc_id)
+        for tag_id in tag_ids:
+            _bitmap_remove(self._tags, tag_id, doc_id)
+        if created_at is not None:
+            _bitmap_remove(self._months, month_key(created_at), doc_id)
+            entry = (created_at, doc_id)
+            index = bisect_left(self._order, entry)
+            if index < len(self._order) and self._order[index] == entry:
+                del self._order[index]
+
+    def index_article(self, article: models.Article):
+        """根据文章对象更新索引，文章需已加载 tags_relationship"""
+        self.add(
+            article.id,
+            article.status,
+            article.is_knowledge_base,
+            article.knowledge_category_id,
+            article.created_at,
+            [tag.id for tag in article.tags_relationship]
+        )
+
+    async def reindex(self, db, article_id: int):
+        """重新读取文章的属性和标签并更新索引，在文章写入提交后调用"""
+        row = (await db.execute(
+            select(
+                models.Article.status,
+                models.Article.is_knowledge_base,
+                models.Article.knowledge_category_id,
+                models.Article.created_at
+            ).filter(models.Article.id == article_id)
+        )).first()
+        if row is None:
+            self.remove(article_id)
+            return
+        tag_ids = (await db.scalars(
+            select(models.article_tags.c.tag_id).where(models.article_tags.c.article_id == article_id)
+        )).all()
+        self.add(article_id, *row, tag_ids)
+
+    def _date_bitmap(self, date_from: Optional[date], date_to: Optional[date]) -> int:
+        """创建日期在 [date_from, date_to] 内的文章，整月直接取月份位图，边界月份逐篇比较"""
+        start = datetime.combine(date_from, datetime.min.time()) if date_from else None
+        end = datetime.combine(date_to, datetime.min.time()) + timedelta(days=1) if date_to else None
+        start_month = month_key(start) if start else None
+        end_month = month_key(end - timedelta(microseconds=1)) if end else None
+
+        bitmap = 0
+        for month, month_bitmap in self._months.items():
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            if month != start_month and month != end_month:
+                bitmap |= month_bitmap
+                continue
+            for doc_id in iter_bits(month_bitmap):
+                created_at = self._docs[doc_id][3]
+                if (start is None or created_at >= start) and (end is None or created_at < end):
+                    bitmap |= 1 << doc_id
+        return bitmap
+
+    def _filters(
+        self,
+        tag_ids: Optional[List[int]],
+        category_ids: Optional[List[int]],
+        knowledge_base: Optional[bool],
+        date_from: Optional[date],
+        date_to: Optional[date],
+        status: str
+    ) -> Dict[str, int]:
+        """各筛选条件对应的位图，未指定的条件不出现在结果中"""
+        filters = {"status": self._status.get(status, 0)}
+        if knowledge_base is not None:
+            filters["knowledge_base"] = self._knowledge.get(knowledge_base, 0)
+        if tag_ids:
+            # 多个标签需同时包含
+            bitmap = filters["status"]
+            for tag_id in set(tag_ids):
+                bitmap &= self._tags.get(tag_id, 0)
+            filters["tags"] = bitmap
+        if category_ids:
+            # 多个分类满足其一即可
+            bitmap = 0
+            for category_id in set(category_ids):
+                bitmap |= self._categories.get(category_id, 0)
+            filters["categories"] = bitmap
+        if date_from is not None or date_to is not None:
+            filters["dates"] = self._date_bitmap(date_from, date_to)
+        return filters
+
+    @staticmethod
+    def _intersect(filters: Dict[str, int], exclude: Optional[str] = None) -> int:
+        bitmap = -1
+        for name, value in filters.items():
+            if name != exclude:
+                bitmap &= value
+        return bitmap
+
+    def filter(
+        self,
+        tag_ids: Optional[List[int]] = None,
+        category_ids: Optional[List[int]] = None,
+        knowledge_base: Optional[bool] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[Tuple[datetime, int]] = None
+    ) -> Tuple[int, List[int]]:
+        """筛选已发布文章，按创建时间倒序分页
+
+        Args:
+            cursor: 上一页最后一篇文章的 (created_at, id)，提供时忽略skip
+
+        Returns:
+            (total, ids): 符合条件的文章总数，以及当前页的文章ID
+        """
+        bitmap = self._intersect(self._filters(tag_ids, category_ids, knowledge_base, date_from, date_to, "published"))
+        total = bitmap.bit_count()
+        if total == 0 or limit <= 0:
+            return total, []
+
+        end = bisect_left(self._order, cursor) if cursor else len(self._order)
+        ids = []
+        for index in range(end - 1, -1, -1):
+            doc_id = self._order[index][1]
+            if not (bitmap >> doc_id) & 1:
+                continue
+            if cursor is None and skip > 0:
+                skip -= 1
+                continue
+            ids.append(doc_id)
+            if len(ids) >= limit:
+                break
+        return total, ids
+
+    def facets(
+        self,
+        tag_ids: Optional[List[int]] = None,
+        category_ids: Optional[List[int]] = None,
+        knowledge_base: Optional[bool] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> dict:
+        """分面计数
+
+        标签计数基于完整的筛选结果（继续选择标签会进一步缩小结果）；
+        分类和月份计数不计入本维度自身的筛选条件，便于在同一维度内切换或多选。
+        """
+        filters = self._filters(tag_ids, category_ids, knowledge_base, date_from, date_to, "published")
+        bitmap = self._intersect(filters)
+
+        def count(bitmaps: Dict, base: int) -> Dict:
+            counts = {}
+            for key, value in bitmaps.items():
+                matched = (value & base).bit_count()
+                if matched:
+                    counts[key] = matched
+            return counts
+
+        return {
+            "total": bitmap.bit_count(),
+            "tags": count(self._tags, bitmap),
+            "categories": count(self._categories, self._intersect(filters, "categories")),
+            "months": count(self._months, self._intersect(filters, "dates")),
+        }
+
+    async def rebuild(self):
+        """从数据库重新建立索引，建好后整体替换
+
+        首次建好，或与当前索引不一致时（其他worker修改了文章），使文章列表缓存失效，
+        避免缓存按旧索引或空索引得出的结果。
+        """
+        async with AsyncSessionLocal() as db:
+            articles = (await db.execute(select(
+                models.Article.id,
+                models.Article.status,
+                models.Article.is_knowledge_base,
+                models.Article.knowledge_category_id,
+                models.Article.created_at
+            ))).all()
+            links = (await db.execute(
+                select(models.article_tags.c.article_id, models.article_tags.c.tag_id)
+            )).all()
+
+        article_tags = defaultdict(list)
+        for article_id, tag_id in links:
+            article_tags[article_id].append(tag_id)
+
+        index = FacetIndex(self.interval)
+        for article_id, status, is_knowledge_base, category_id, created_at in articles:
+            index.add(article_id, status, is_knowledge_base, category_id, created_at, article_tags[article_id])
+        changed = not self.ready or index._docs != self._docs
+        (self._docs, self._status, self._knowledge, self._categories, self._tags, self._months, self._order) = (
+            index._docs, index._status, index._knowledge, index._categories, index._tags, index._months, index._order
+        )
+        self.ready = True
+        if changed:
+            await response_cache.invalidate("articles")
+
+    async def _rebuild_logged(self):
+        try:
+            await self.rebuild()
+        except Exception as e:
+            log.error(f"分面索引重建失败: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._rebuild_logged()
+
+    async def start(self):
+        """完成第一次重建并启动后台重建任务"""
+        if self._task is None:
+            await self._rebuild_logged()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+facet_index = FacetIndex()
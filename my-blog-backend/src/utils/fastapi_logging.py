@@ -5,9 +5,8 @@ from typing import Callable
 
 from fastapi import FastAPI, Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.orm import Session
-from src.model.models import VisitorLog
 from src.utils.auth import get_current_user_id_optional
+from src.utils.visitor_log_writer import visitor_log_writer
 from .logger import log_manager, log, api_log
 
 
@@ -16,6 +15,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
     
     def __init__(self, app, db_session_maker=None):
         super().__init__(app)
+        # 提供数据库会话工厂时记录访问，记录由 visitor_log_writer 在后台批量写入
         self.db_session_maker = db_session_maker
     
     def is_loopback_address(self, ip):
@@ -99,31 +99,18 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             # 添加请求ID到响应头
             response.headers["X-Request-ID"] = request_id
             
-            # 如果提供了数据库会话，且不是环回地址，则保存访问记录
+            # 如果提供了数据库会话，且不是环回地址，则提交访问记录（排除、采样和队列满时不记录）
             if self.db_session_maker and not is_loopback:
-                db = None
-                try:
-                    db = self.db_session_maker()
-                    visitor_log = VisitorLog(
-                        ip_address=client_ip,
-                        user_agent=user_agent,
-                        path=path,
-                        method=method,
-                        status_code=response.status_code,
-                        user_id=user_id if isinstance(user_id, int) else None,
-                        process_time=process_time,
-                        referer=referer
-                    )
-                    db.add(visitor_log)
-                    db.commit()
-                    log.debug(f"已保存访问记录: {path}, IP: {client_ip}")
-                except Exception as e:
-                    log.error(f"保存访问记录失败: {str(e)}")
-                    if db:
-                        db.rollback()
-                finally:
-                    if db:
-                        db.close()
+                visitor_log_writer.submit(
+                    ip_address=client_ip,
+                    user_agent=user_agent,
+                    path=path,
+                    method=method,
+                    status_code=response.status_code,
+                    user_id=user_id if isinstance(user_id, int) else None,
+                    process_time=process_time,
+                    referer=referer
+                )
             elif is_loopback:
                 log.debug(f"跳过环回地址访问记录: {path}, IP: {client_ip}")
             
@@ -0,0 +1,191 @@
+"""
+IP地理位置缓存模块
+
+在线查询结果的有界缓存：
+- 内存中为带过期时间的LRU，超过容量时淘汰最久未使用的条目，不会随访问的IP无限增长；
+- 查不到位置（“未知”）的结果也会缓存（较短的过期时间），避免同一IP反复请求上游；
+- 新条目先记入待写集合，后台任务定期用一条批量 INSERT OR REPLACE 写入SQLite文件，
+  写入在线程中进行，不在请求路径上，也不会整体重写文件；
+- 启动时从SQLite加载未过期的条目，多个worker共享同一个文件。
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.logger import log
+
+# 缓存文件路径
+IP_CACHE_PATH = os.getenv(
+    "IP_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "../../data/ip_cache.sqlite3")
+)
+
+# 内存中最多保存的条目数
+IP_CACHE_MAX_ENTRIES = int(os.getenv("IP_CACHE_MAX_ENTRIES", "50000"))
+
+# 查到位置的结果的保存时间（秒）
+IP_CACHE_TTL = float(os.getenv("IP_CACHE_TTL", str(7 * 24 * 3600)))
+
+# 查不到位置的结果的保存时间（秒）
+IP_CACHE_NEGATIVE_TTL = float(os.getenv("IP_CACHE_NEGATIVE_TTL", "600"))
+
+# 写入SQLite的间隔（秒）
+IP_CACHE_FLUSH_INTERVAL = float(os.getenv("IP_CACHE_FLUSH_INTERVAL", "5"))
+
+# (位置信息, 过期时间)
+CacheEntry = Tuple[Dict, float]
+
+
+class IPLocationCache:
+    """带过期时间的LRU缓存，增量持久化到SQLite"""
+
+    def __init__(
+        self,
+        path: str = IP_CACHE_PATH,
+        max_entries: int = IP_CACHE_MAX_ENTRIES,
+        ttl: float = IP_CACHE_TTL,
+        negative_ttl: float = IP_CACHE_NEGATIVE_TTL,
+        interval: float = IP_CACHE_FLUSH_INTERVAL
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.interval = interval
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._dirty: Dict[str, CacheEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, ip: str) -> Optional[Dict]:
+        """返回缓存的位置信息（可能是“未知”），未缓存或已过期时返回None"""
+        entry = self._entries.get(ip)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[ip]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(ip)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, ip: str, location: Dict):
+        """缓存查询结果，查不到位置的结果使用较短的过期时间"""
+        negative = location.get("province", "未知") == "未知"
+        entry = (location, time.time() + (self.negative_ttl if negative else self.ttl))
+        self._put(ip, entry)
+        self._dirty[ip] = entry
+
+    def _put(self, ip: str, entry: CacheEntry):
+        self._entries[ip] = entry
+        self._entries.move_to_end(ip)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "pending_writes": len(self._dirty),
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ip_cache ("
+            "ip TEXT PRIMARY KEY, location TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        return conn
+
+    def _read(self) -> List[Tuple[str, str, float]]:
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute("DELETE FROM ip_cache WHERE expires_at <= ?", (now,))
+            conn.commit()
+            # 读取过期时间最晚的条目，按过期时间升序放入LRU，最晚过期的视为最近使用
+            rows = conn.execute(
+                "SELECT ip, location, expires_at FROM ip_cache ORDER BY expires_at DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+            return rows[::-1]
+        finally:
+            conn.close()
+
+    def _write(self, batch: Dict[str, CacheEntry]):
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ip_cache (ip, location, expires_at) VALUES (?, ?, ?)",
+                [(ip, json.dumps(location, ensure_ascii=False), expires_at) for ip, (location, expires_at) in batch.items()]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def load(self) -> int:
+        """从SQLite加载未过期的条目，返回加载的条目数"""
+        try:
+            rows = await asyncio.to_thread(self._read)
+        except Exception as e:
+            log.error(f"加载IP缓存失败: {str(e)}")
+            return 0
+        for ip, location, expires_at in rows:
+            if ip not in self._entries:
+                self._put(ip, (json.loads(location), expires_at))
+        return len(rows)
+
+    async def flush(self) -> int:
+        """把新条目写入SQLite，返回写入的条目数"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                # 写入失败时放回待写集合，下次重试（较新的条目优先，最多保留max_entries条）
+                merged = {**batch, **self._dirty}
+                self._dirty = dict(list(merged.items())[-self.max_entries:])
+                log.error(f"IP缓存写入失败: {str(e)}")
+                return 0
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def start(self):
+        """加载缓存并启动后台写入任务"""
+        if self._task is None:
+            count = await self.load()
+            log.info(f"IP缓存已加载 {count} 条")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写入剩余条目"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
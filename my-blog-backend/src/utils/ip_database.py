@@ -0,0 +1,219 @@
+"""
+IP地址库二进制格式模块
+
+把 IPRangeIndex 整理好的有序地址段写成紧凑的二进制文件，运行时用 mmap 映射后直接查询：
+- 文件内容即查询用的数组，打开时不解析、不为每个地址段创建Python对象，启动几乎不耗时；
+- 多个worker映射同一个文件，共享操作系统的页缓存，不各自占用一份内存；
+- 地址段为定长整数，IPv4 起止地址和位置序号各为一个 uint32 数组，直接在映射上二分查找；
+  IPv6 起止地址为16字节大端序，字节序与数值大小一致，可以按字节比较；
+- 省/市/运营商字符串去重后存入字符串表，位置记录只保存字符串序号。
+
+文件布局（整数均为小端序）：
+    头部      magic(8) ipv4段数 ipv6段数 位置数 字符串数 字符串表字节数 保留(4)
+    IPv4      起始地址 uint32[n4]、结束地址 uint32[n4]、位置序号 uint32[n4]
+    IPv6      起始地址 16字节[n6]、结束地址 16字节[n6]、位置序号 uint32[n6]
+    位置      (省, 市, 运营商) 的字符串序号 uint32[3 * 位置数]
+    字符串    偏移 uint32[字符串数 + 1]，随后为UTF-8字符串表
+
+由 build_ip_database.py 从 JSON 或 CSV 格式的IP库生成。
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Union
+
+from src.utils.ip_range_index import IPAddress, IPRangeIndex, parse_ip
+
+# 后端目录，相对路径的 IP_DATABASE_PATH 相对于该目录解析，与启动时的工作目录无关
+BACKEND_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "../.."))
+
+# 二进制IP库文件，存在时 IPLocationService 映射该文件，不再加载 ip_data.json
+IP_DATABASE_PATH = os.path.join(BACKEND_DIR, os.getenv("IP_DATABASE_PATH", "data/ip_data.bin"))
+
+MAGIC = b"MBIPDB01"
+HEADER = struct.Struct("<8s6I")
+IPV6_SIZE = 16
+
+# 4字节无符号整数的 array/memoryview 类型码
+_U32 = "I" if array("I").itemsize == 4 else "L"
+
+
+class _IPv6Keys:
+    """把映射中的16字节地址数组包装为可二分查找的序列"""
+
+    def __init__(self, buffer: memoryview, count: int):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> bytes:
+        offset = index * IPV6_SIZE
+        return bytes(self._buffer[offset:offset + IPV6_SIZE])
+
+
+def _u32_array(values: List[int]) -> bytes:
+    data = array(_U32, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+def write_ip_database(index: IPRangeIndex, path: str) -> int:
+    """把地址段索引写入二进制文件，先写临时文件再替换，已映射旧文件的进程不受影响
+
+    Returns:
+        写入的字节数
+    """
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def string_id(value) -> int:
+        value = str(value)
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    location_refs = []
+    for location in index.locations:
+        location_refs += [string_id(location["province"]), string_id(location["city"]), string_id(location["isp"])]
+
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    blob = b"".join(encoded)
+
+    v4_starts, v4_ends, v4_values = index.ranges(4)
+    v6_starts, v6_ends, v6_values = index.ranges(6)
+
+    sections = [
+        HEADER.pack(MAGIC, len(v4_starts), len(v6_starts), len(index.locations), len(strings), len(blob), 0),
+        _u32_array(v4_starts),
+        _u32_array(v4_ends),
+        _u32_array(v4_values),
+        b"".join(value.to_bytes(IPV6_SIZE, "big") for value in v6_starts),
+        b"".join(value.to_bytes(IPV6_SIZE, "big") for value in v6_ends),
+        _u32_array(v6_values),
+        _u32_array(location_refs),
+        _u32_array(offsets),
+        blob,
+    ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        for section in sections:
+            f.write(section)
+    os.replace(temp_path, path)
+    return sum(len(section) for section in sections)
+
+
+class MappedIPDatabase:
+    """映射二进制IP库文件进行查询，接口与 IPRangeIndex 相同"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._map_sections()
+        except Exception:
+            self._mmap.close()
+            raise
+        # 已解码的位置信息，按位置序号缓存
+        self._locations: Dict[int, Dict] = {}
+
+    def _map_sections(self):
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"IP库文件不完整: {self.path}")
+        magic, self.v4_count, self.v6_count, self.location_count, string_count, blob_size, _ = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"不是有效的IP库文件: {self.path}")
+
+        expected_size = (
+            HEADER.size + 12 * self.v4_count + (2 * IPV6_SIZE + 4) * self.v6_count
+            + 12 * self.location_count + 4 * (string_count + 1) + blob_size
+        )
+        if len(self._mmap) != expected_size:
+            raise ValueError(f"IP库文件不完整: {self.path}")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def take(size: int) -> memoryview:
+            nonlocal offset
+            section = view[offset:offset + size]
+            offset += size
+            return section
+
+        self._v4_starts = self._u32(take(4 * self.v4_count))
+        self._v4_ends = self._u32(take(4 * self.v4_count))
+        self._v4_values = self._u32(take(4 * self.v4_count))
+        self._v6_starts = _IPv6Keys(take(IPV6_SIZE * self.v6_count), self.v6_count)
+        self._v6_ends = _IPv6Keys(take(IPV6_SIZE * self.v6_count), self.v6_count)
+        self._v6_values = self._u32(take(4 * self.v6_count))
+        self._location_refs = self._u32(take(12 * self.location_count))
+        self._string_offsets = self._u32(take(4 * (string_count + 1)))
+        self._strings = take(blob_size)
+
+    @staticmethod
+    def _u32(section: memoryview):
+        """小端序主机上直接把映射转换为uint32视图（不复制），大端序主机上复制一份并转换字节序"""
+        if sys.byteorder == "little":
+            return section.cast(_U32)
+        data = array(_U32, section.tobytes())
+        data.byteswap()
+        return data
+
+    def __len__(self) -> int:
+        return self.v4_count + self.v6_count
+
+    def _string(self, string_id: int) -> str:
+        start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+        return bytes(self._strings[start:end]).decode("utf-8")
+
+    def _location(self, location_id: int) -> Dict:
+        location = self._locations.get(location_id)
+        if location is None:
+            base = location_id * 3
+            location = {
+                "province": self._string(self._location_refs[base]),
+                "city": self._string(self._location_refs[base + 1]),
+                "isp": self._string(self._location_refs[base + 2]),
+            }
+            self._locations[location_id] = location
+        return location
+
+    def lookup(self, ip: Union[str, IPAddress]) -> Optional[Dict]:
+        """查询IP地址所在地址段的位置信息，不在任何地址段内时返回None"""
+        address = parse_ip(ip) if isinstance(ip, str) else ip
+        if address is None:
+            return None
+        if address.version == 4:
+            key, starts, ends, values = int(address), self._v4_starts, self._v4_ends, self._v4_values
+        else:
+            key, starts, ends, values = address.packed, self._v6_starts, self._v6_ends, self._v6_values
+        index = bisect_right(starts, key) - 1
+        if index >= 0 and key <= ends[index]:
+            return self._location(values[index])
+        return None
+
+    def close(self):
+        """释放映射，之后不能再查询"""
+        for name in ("_v4_starts", "_v4_ends", "_v4_values", "_v6_values", "_location_refs", "_string_offsets", "_strings"):
+            section = getattr(self, name, None)
+            if isinstance(section, memoryview):
+                section.release()
+        for name in ("_v6_starts", "_v6_ends"):
+            keys = getattr(self, name, None)
+            if keys is not None:
+                keys._buffer.release()
+        self._mmap.close()
@@ -1,48 +1,106 @@
-import requests
+import asyncio
 import json
 from typing import Dict, Optional, List, Tuple
 import time
 import os
-import re
 import ipaddress
-from functools import lru_cache
+
+import httpx
+
+from src.utils.logger import log
+from src.utils.ip_cache import IPLocationCache
+from src.utils.ip_database import IP_DATABASE_PATH, MappedIPDatabase
+from src.utils.ip_range_index import IPRangeIndex, parse_ip
+
+UNKNOWN_LOCATION = {"province": "未知", "city": "未知", "isp": "未知"}
+
+# 在线查询接口
+IP_LOOKUP_URL = os.getenv("IP_LOOKUP_URL", "https://ip.011102.xyz/")
+
+# 单次在线查询的总耗时上限（秒）
+IP_LOOKUP_TIMEOUT = float(os.getenv("IP_LOOKUP_TIMEOUT", "2"))
+
+# 同时进行的在线查询数
+IP_LOOKUP_MAX_CONCURRENCY = int(os.getenv("IP_LOOKUP_MAX_CONCURRENCY", "10"))
+
+# 熔断器：连续失败次数达到阈值后打开，冷却时间（秒）后放行一次试探请求
+IP_LOOKUP_FAILURE_THRESHOLD = int(os.getenv("IP_LOOKUP_FAILURE_THRESHOLD", "5"))
+IP_LOOKUP_RESET_TIMEOUT = float(os.getenv("IP_LOOKUP_RESET_TIMEOUT", "60"))
+
+
+class CircuitBreaker:
+    """简单的熔断器
+
+    closed：正常请求；连续失败 failure_threshold 次后进入 open，直接拒绝请求；
+    open 持续 reset_timeout 秒后进入 half_open，只放行一个试探请求，成功则恢复 closed，失败则重新 open。
+    """
+
+    def __init__(self, failure_threshold: int = IP_LOOKUP_FAILURE_THRESHOLD, reset_timeout: float = IP_LOOKUP_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """是否允许发起请求"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                log.warning(f"IP在线查询连续失败 {self.failures} 次，熔断 {self.reset_timeout} 秒")
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def end_probe(self):
+        """试探请求结束但没有结果（如被取消）时调用，下一个请求可以重新试探"""
+        self._probing = False
+
 
 class IPLocationService:
     """IP地址地理位置查询服务"""
     
     def __init__(self):
-        # 缓存文件路径
+        # 数据文件路径
         self.cache_dir = os.path.join(os.path.dirname(__file__), '../../data')
-        self.cache_file = os.path.join(self.cache_dir, 'ip_cache.json')
         self.ip_db_file = os.path.join(self.cache_dir, 'ip_data.json')
         
         # 确保缓存目录存在
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
             
-        # 加载缓存
-        self.ip_cache = self._load_cache()
+        # 在线查询结果的缓存，启动时加载
+        self.cache = IPLocationCache()
         
         # 加载IP数据库
-        self.ip_data = self._load_ip_database()
-        
-        # 初始化内部IP数据
         self._init_internal_ips()
-    
-    def _load_cache(self) -> Dict[str, Dict]:
-        """加载IP地址缓存"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-    
-    def _save_cache(self):
-        """保存IP地址缓存"""
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(self.ip_cache, f, ensure_ascii=False)
+
+        # 在线查询
+        self.circuit_breaker = CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(IP_LOOKUP_MAX_CONCURRENCY)
+        self._inflight: Dict[str, asyncio.Future] = {}
     
     def _load_ip_database(self) -> List[Dict]:
         """加载IP地址数据库"""
@@ -97,172 +155,176 @@ class IPLocationService:
         return basic_data
     
     def _init_internal_ips(self):
-        """初始化内部IP映射，用于快速查询"""
-        self.ip_ranges = []
-        
-        for item in self.ip_data:
+        """加载IP数据库的有序区间索引，优先映射二进制IP库，没有时解析JSON"""
+        if os.path.exists(IP_DATABASE_PATH):
             try:
-                start_ip = int(ipaddress.IPv4Address(item["start_ip"]))
-                end_ip = int(ipaddress.IPv4Address(item["end_ip"]))
-                self.ip_ranges.append((
-                    start_ip, 
-                    end_ip, 
-                    {
-                        "province": item["province"], 
-                        "city": item["city"], 
-                        "isp": item["isp"]
-                    }
-                ))
-            except Exception as e:
-                print(f"初始化IP范围错误: {e}")
-    
-    @lru_cache(maxsize=1000)
-    def get_location_cached(self, ip: str) -> Dict:
-        """获取IP地址的地理位置信息（内存缓存）"""
-        return self.get_location(ip)
+                self.ip_index = MappedIPDatabase(IP_DATABASE_PATH)
+                if os.path.exists(self.ip_db_file) and os.path.getmtime(self.ip_db_file) > os.path.getmtime(IP_DATABASE_PATH):
+                    log.warning("ip_data.json 比二进制IP库新，请运行 build_ip_database.py 重新生成")
+                return
+            except (OSError, ValueError) as e:
+                log.error(f"映射二进制IP库失败，改用JSON: {str(e)}")
+        self.ip_index = IPRangeIndex(self._load_ip_database())
     
+    def _local_location(self, ip: str) -> Optional[Dict]:
+        """本地数据库、内网和保留地址的查询结果，查不到时返回None"""
+        location_info = self._query_local_database(ip)
+        if location_info["province"] != "未知":
+            return location_info
+        return self._special_address(ip)
+
     def get_location(self, ip: str) -> Dict:
-        """获取IP地址的地理位置信息"""
+        """获取IP地址的地理位置信息，只查询本地数据库和在线查询结果的缓存，不访问网络"""
         # 检查是否是合法IP地址
         if not self._is_valid_ip(ip):
-            return {"province": "未知", "city": "未知", "isp": "未知"}
+            return dict(UNKNOWN_LOCATION)
         
-        # 检查缓存
-        if ip in self.ip_cache:
-            return self.ip_cache[ip]
-        
-        # 先尝试使用本地数据库查询
-        location_info = self._query_local_database(ip)
-        
-        # 如果本地数据库没有找到，则尝试在线API
-        if location_info["province"] == "未知":
-            location_info = self._query_ip_location(ip)
-        
-        # 更新缓存
-        if location_info and location_info["province"] != "未知":
-            self.ip_cache[ip] = location_info
-            # 定期保存缓存
-            if len(self.ip_cache) % 10 == 0:
-                self._save_cache()
-        
-        return location_info
+        # 本地数据库查询很快，不占用缓存
+        return self._local_location(ip) or self.cache.get(ip) or dict(UNKNOWN_LOCATION)
+
+    async def get_location_async(self, ip: str) -> Dict:
+        """获取IP地址的地理位置信息，本地查不到时查询在线API
+
+        同一IP的并发查询合并为一次，在线查询受熔断器和总耗时限制，失败时返回“未知”。
+        查询结果（包括“未知”）会缓存，缓存未过期时不再查询上游。
+        """
+        if not self._is_valid_ip(ip):
+            return dict(UNKNOWN_LOCATION)
+        location_info = self._local_location(ip) or self.cache.get(ip)
+        if location_info is not None:
+            return location_info
+
+        task = self._inflight.get(ip)
+        if task is None:
+            task = asyncio.ensure_future(self._query_ip_location(ip))
+            self._inflight[ip] = task
+            task.add_done_callback(lambda _: self._inflight.pop(ip, None))
+        return await asyncio.shield(task)
+
+    async def start(self):
+        """加载在线查询结果的缓存并启动后台写入"""
+        await self.cache.start()
+
+    async def aclose(self):
+        """关闭在线查询的HTTP连接池并写入剩余的缓存条目"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await self.cache.stop()
     
     def _query_local_database(self, ip: str) -> Dict:
-        """使用本地数据库查询IP地址"""
-        try:
-            # 将IP转换为整数进行比较
-            ip_int = int(ipaddress.IPv4Address(ip))
-            
-            # 遍历IP范围查找匹配项
-            for start_ip, end_ip, location in self.ip_ranges:
-                if start_ip <= ip_int <= end_ip:
-                    return location
-        except:
-            pass
-        
-        return {"province": "未知", "city": "未知", "isp": "未知"}
+        """使用本地数据库查询IP地址（IPv4、IPv6）"""
+        location = self.ip_index.lookup(ip)
+        return dict(location) if location else dict(UNKNOWN_LOCATION)
     
     def _is_valid_ip(self, ip: str) -> bool:
-        """检查是否是有效的IP地址"""
-        # 简单的IP地址格式验证
-        if not ip:
-            return False
-        
-        # IPv4格式验证
-        ipv4_pattern = r"^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})$"
-        if re.match(ipv4_pattern, ip):
-            return True
-        
-        # IPv6格式验证（简化）
-        if ":" in ip:
-            return True
-        
-        return False
+        """检查是否是有效的IPv4或IPv6地址"""
+        return bool(ip) and parse_ip(ip) is not None
     
-    def _query_ip_location(self, ip: str) -> Dict:
-        """从在线API查询IP地址的地理位置信息"""
-        default_result = {"province": "未知", "city": "未知", "isp": "未知", "country": "未知"}
-        
+    def _special_address(self, ip: str) -> Optional[Dict]:
+        """内网、环回和保留地址直接返回，不查询在线API"""
         try:
             ip_obj = ipaddress.ip_address(ip)
-            if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved:
-                return {
-                    "province": "内网IP" if ip_obj.is_private else "保留地址",
-                    "city": "局域网" if ip_obj.is_private else "保留地址",
-                    "isp": "本地网络",
-                    "country": "中国"  # 添加国家信息
+        except ValueError:
+            return None
+        if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved:
+            return {
+                "province": "内网IP" if ip_obj.is_private else "保留地址",
+                "city": "局域网" if ip_obj.is_private else "保留地址",
+                "isp": "本地网络",
+                "country": "中国"  # 添加国家信息
+            }
+        return None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """复用连接池的HTTP客户端"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(IP_LOOKUP_TIMEOUT, connect=min(1.0, IP_LOOKUP_TIMEOUT)),
+                limits=httpx.Limits(max_connections=IP_LOOKUP_MAX_CONCURRENCY, max_keepalive_connections=IP_LOOKUP_MAX_CONCURRENCY),
+                headers={
+                    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+                    "Accept": "application/json",
                 }
-        except:
+            )
+        return self._client
+
+    async def _fetch(self, ip: str) -> httpx.Response:
+        """在并发名额内请求上游"""
+        async with self._semaphore:
+            return await self._get_client().get(
+                IP_LOOKUP_URL,
+                # 通过请求头指定要查询的IP
+                headers={"X-Real-IP": ip, "X-Forwarded-For": ip}
+            )
+
+    async def _query_ip_location(self, ip: str) -> Dict:
+        """从在线API查询IP地址的地理位置信息
+
+        只请求一次、不重试，整个查询（包括等待并发名额）不超过 IP_LOOKUP_TIMEOUT 秒；
+        连续失败后熔断器打开，冷却期内直接返回“未知”，不再请求上游。
+        """
+        default_result = {**UNKNOWN_LOCATION, "country": "未知"}
+        probing = self.circuit_breaker.state == "half_open"
+        if not self.circuit_breaker.allow():
+            # 熔断期间的结果不缓存，恢复后可以重新查询
             return default_result
-            
-        # 添加重试和超时机制
-        retry_count = 3
-        api_url = "https://ip.011102.xyz/"  # 不带IP参数的请求URL
-        
-        # 创建安全的请求会话
-        session = requests.Session()
-        session.headers.update({
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "application/json",
-            "X-Real-IP": ip,  # 添加X-Real-IP头以指定要查询的IP
-            "X-Forwarded-For": ip  # 添加X-Forwarded-For头作为备用
-        })
-        
-        for attempt in range(retry_count):
-            try:
-                response = session.get(api_url, timeout=(3, 5))  # 连接超时3秒，读取超时5秒
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        # 检查返回的数据格式
-                        if "IP" in data and isinstance(data["IP"], dict):
-                            ip_info = data["IP"]
-                            result = {
-                                "province": ip_info.get("Region", "未知"),
-                                "city": ip_info.get("City", "未知"),
-                                "isp": ip_info.get("ASOrganization", "未知"),
-                                "country": ip_info.get("Country", "未知"),
-                                "country_code": ip_info.get("Country", "")
-                            }
-                            
-                            # 如果是中国IP，确保显示中文国家名称
-                            if result.get("country_code") == "CN" or result.get("country") == "CN":
-                                result["country"] = "中国"
-                            
-                            # 验证结果有效性
-                            if result["province"] != "未知" or result["city"] != "未知":
-                                self.ip_cache[ip] = result  # 缓存结果
-                                return result
-                    except (ValueError, KeyError) as e:
-                        print(f"解析IP数据错误: {str(e)}, 数据: {response.text[:200]}")
-                
-                        if response.status_code == 429:
-                            time.sleep(1)
-                        continue
-                    
-            except (requests.RequestException, ValueError, KeyError) as e:
-                if attempt == retry_count - 1:
-                    print(f"IP查询失败(尝试{attempt+1}/{retry_count}): {str(e)}")
-        
-        # 如果在线API查询失败，尝试使用本地数据库
-        local_result = self._query_local_database(ip)
-        if local_result["province"] != "未知":
-            # 添加国家信息
-            local_result["country"] = "中国"
-            return local_result
-        return default_result
+
+        try:
+            response = await asyncio.wait_for(self._fetch(ip), IP_LOOKUP_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, asyncio.TimeoutError, ValueError) as e:
+            self.circuit_breaker.record_failure()
+            log.warning(f"IP在线查询失败: {ip}, {type(e).__name__}: {str(e)}")
+            self.cache.set(ip, default_result)
+            return default_result
+        finally:
+            # 试探请求被取消时熔断器不会记录结果，需要放开试探，否则无法恢复
+            if probing:
+                self.circuit_breaker.end_probe()
+
+        self.circuit_breaker.record_success()
+        ip_info = data.get("IP") if isinstance(data, dict) else None
+        if not isinstance(ip_info, dict):
+            log.warning(f"IP在线查询返回格式错误: {str(data)[:200]}")
+            self.cache.set(ip, default_result)
+            return default_result
+
+        result = {
+            "province": ip_info.get("Region", "未知") or "未知",
+            "city": ip_info.get("City", "未知") or "未知",
+            "isp": ip_info.get("ASOrganization", "未知") or "未知",
+            "country": ip_info.get("Country", "未知") or "未知",
+            "country_code": ip_info.get("Country", "")
+        }
+        # 如果是中国IP，确保显示中文国家名称
+        if result.get("country_code") == "CN" or result.get("country") == "CN":
+            result["country"] = "中国"
+        self.cache.set(ip, result)
+        return result
 
 # 单例模式
 ip_location_service = IPLocationService()
 
 def get_ip_location(ip: str) -> Dict:
-    """获取IP地址的地理位置信息"""
+    """获取IP地址的地理位置信息，只查询缓存和本地数据库，可在请求中直接调用"""
     try:
         # 检查IP是否为None或空字符串
         if not ip:
             return {"province": "未知", "city": "未知", "isp": "未知"}
             
-        return ip_location_service.get_location_cached(ip)
+        return ip_location_service.get_location(ip)
+    except Exception as e:
+        log.error(f"获取IP位置失败: {str(e)}")
+        return {"province": "未知", "city": "未知", "isp": "未知"} 
+
+async def get_ip_location_async(ip: str) -> Dict:
+    """获取IP地址的地理位置信息，本地查不到时查询在线API，适合在后台任务中调用"""
+    if not ip:
+        return dict(UNKNOWN_LOCATION)
+    try:
+        return await ip_location_service.get_location_async(ip)
     except Exception as e:
-        print(f"获取IP位置失败: {str(e)}")
-        return {"province": "未知", "city": "未知", "isp": "未知"} 
\ No newline at end of file
+        log.error(f"获取IP位置失败: {str(e)}")
+        return dict(UNKNOWN_LOCATION)
@@ -0,0 +1,117 @@
+"""
+IP地址段区间索引模块
+
+把IP地址段按起始地址排序后存入数组，查询时用 bisect 找到最后一个起始地址不大于目标IP的段，
+再比较结束地址，单次查询 O(log n)：
+- IPv4 的起止地址存放在 array('I') 中（每个4字节），数十万条地址段也只占几MB；
+- IPv6 地址为128位整数，存放在有序列表中；
+- IPv4 映射的IPv6地址（::ffff:a.b.c.d）按IPv4查询；
+- 位置信息去重后按序号引用，相同的省/市/运营商只保存一份。
+"""
+
+import ipaddress
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from src.utils.logger import log
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+def parse_ip(ip: str) -> Optional[IPAddress]:
+    """解析IP地址，IPv4映射的IPv6地址转换为IPv4，格式错误时返回None"""
+    try:
+        address = ipaddress.ip_address(ip.strip())
+    except (ValueError, AttributeError):
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+class _RangeTable:
+    """同一IP版本的有序地址段"""
+
+    def __init__(self, starts, ends, values: List[int]):
+        self.starts = starts
+        self.ends = ends
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def find(self, ip_int: int) -> Optional[int]:
+        """返回包含该地址的段的位置序号"""
+        index = bisect_right(self.starts, ip_int) - 1
+        if index >= 0 and ip_int <= self.ends[index]:
+            return self.values[index]
+        return None
+
+
+def _build_table(ranges: List[Tuple[int, int, int]], typecode: Optional[str]) -> Tuple[_RangeTable, int]:
+    """排序并去除重叠部分（起始地址更小的段优先），返回地址段表和被截断或丢弃的段数"""
+    ranges.sort()
+    starts, ends, values = [], [], []
+    overlaps = 0
+    for start, end, value in ranges:
+        if ends and start <= ends[-1]:
+            overlaps += 1
+            if end <= ends[-1]:
+                continue
+            start = ends[-1] + 1
+        starts.append(start)
+        ends.append(end)
+        values.append(value)
+    if typecode is not None:
+        starts, ends = array(typecode, starts), array(typecode, ends)
+    return _RangeTable(starts, ends, values), overlaps
+
+
+class IPRangeIndex:
+    """IPv4 / IPv6 地址段索引"""
+
+    def __init__(self, entries: Iterable[Dict]):
+        """
+        Args:
+            entries: 含 start_ip、end_ip、province、city、isp 的地址段记录
+        """
+        self.locations: List[Dict] = []
+        location_ids: Dict[Tuple, int] = {}
+        ranges = {4: [], 6: []}
+        invalid = 0
+
+        for item in entries:
+            start, end = parse_ip(str(item.get("start_ip", ""))), parse_ip(str(item.get("end_ip", "")))
+            if start is None or end is None or start.version != end.version or int(start) > int(end):
+                invalid += 1
+                continue
+            location = (item.get("province", "未知"), item.get("city", "未知"), item.get("isp", "未知"))
+            if location not in location_ids:
+                location_ids[location] = len(self.locations)
+                self.locations.append({"province": location[0], "city": location[1], "isp": location[2]})
+            ranges[start.version].append((int(start), int(end), location_ids[location]))
+
+        self._v4, overlaps_v4 = _build_table(ranges[4], "I")
+        self._v6, overlaps_v6 = _build_table(ranges[6], None)
+        if invalid:
+            log.warning(f"IP数据库中有 {invalid} 条无效地址段已跳过")
+        if overlaps_v4 or overlaps_v6:
+            log.warning(f"IP数据库中有 {overlaps_v4 + overlaps_v6} 条重叠地址段已截断")
+
+    def __len__(self) -> int:
+        return len(self._v4) + len(self._v6)
+
+    def ranges(self, version: int) -> Tuple[List[int], List[int], List[int]]:
+        """按起始地址排序、互不重叠的地址段：(起始地址列表, 结束地址列表, 位置序号列表)"""
+        table = self._v4 if version == 4 else self._v6
+        return list(table.starts), list(table.ends), list(table.values)
+
+    def lookup(self, ip: Union[str, IPAddress]) -> Optional[Dict]:
+        """查询IP地址所在地址段的位置信息，不在任何地址段内时返回None"""
+        address = parse_ip(ip) if isinstance(ip, str) else ip
+        if address is None:
+            return None
+        table = self._v4 if address.version == 4 else self._v6
+        location_id = table.find(int(address))
+        return self.locations[location_id] if location_id is not None else None
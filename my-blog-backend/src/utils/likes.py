@@ -0,0 +1,96 @@
+"""
+点赞工具模块
+
+点赞关系保存在 likes 表中，(user_id, target_type, target_id) 唯一，
+对象上的 likes 计数通过 SQL 端的原子自增/自减维护，不做读-改-写。
+
+likes 表是后来加入的，之前的点赞只累加了计数，没有记录点赞用户，无法回填。
+因此计数可能大于 likes 表中的记录数，之前点过赞的用户还可以再点赞一次，
+counter_reconciler 也不按 likes 表重算点赞数。
+"""
+
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy import select, update, delete, case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.model import models
+
+# 点赞对象类型与对应模型
+LIKE_TARGET_MODELS = {
+    models.LikeTargetType.ARTICLE.value: models.Article,
+    models.LikeTargetType.COMMENT.value: models.Comment,
+}
+
+
+def _counter_values(model, delta: int) -> dict:
+    """构造likes计数的原子更新，减到0为止"""
+    if delta > 0:
+        values = {"likes": func.coalesce(model.likes, 0) + delta}
+    else:
+        values = {"likes": case((model.likes > 0, model.likes + delta), else_=0)}
+    # 点赞不算文章内容更新，保持updated_at不变
+    if hasattr(model, "updated_at"):
+        values["updated_at"] = model.updated_at
+    return values
+
+
+async def toggle_like(db: AsyncSession, user_id: int, target_type: str, target_id: int) -> Tuple[bool, int]:
+    """切换用户对某个对象的点赞状态
+
+    Returns:
+        (liked, likes): 切换后是否处于点赞状态，以及对象当前的点赞数
+    """
+    model = LIKE_TARGET_MODELS[target_type]
+
+    # 已点赞则取消点赞
+    result = await db.execute(delete(models.Like).where(
+        models.Like.user_id == user_id,
+        models.Like.target_type == target_type,
+        models.Like.target_id == target_id
+    ))
+
+    if result.rowcount:
+        liked = False
+        await db.execute(
+            update(model).where(model.id == target_id)
+            .values(**_counter_values(model, -1))
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        liked = True
+        db.add(models.Like(user_id=user_id, target_type=target_type, target_id=target_id))
+        try:
+            await db.flush()
+        except IntegrityError:
+            # 并发的重复点赞已由唯一约束拦截，计数无需再变
+            await db.rollback()
+            return True, await _current_likes(db, model, target_id)
+        await db.execute(
+            update(model).where(model.id == target_id)
+            .values(**_counter_values(model, 1))
+            .execution_options(synchronize_session=False)
+        )
+
+    await db.commit()
+    return liked, await _current_likes(db, model, target_id)
+
+
+async def _current_likes(db: AsyncSession, model, target_id: int) -> int:
+    likes = await db.scalar(select(model.likes).where(model.id == target_id))
+    return likes or 0
+
+
+async def get_liked_ids(db: AsyncSession, user_id: int, target_type: str, target_ids: Iterable[int]) -> Set[int]:
+    """批量查询用户点赞过的对象ID"""
+    target_ids = list(set(target_ids))
+    if not target_ids:
+        return set()
+
+    result = await db.execute(select(models.Like.target_id).where(
+        models.Like.user_id == user_id,
+        models.Like.target_type == target_type,
+        models.Like.target_id.in_(target_ids)
+    ))
+    return set(result.scalars().all())
@@ -0,0 +1,159 @@
+"""
+Markdown渲染模块
+
+文章在创建和更新时渲染一次，结果与 Markdown 原文一起保存：
+- content_html：经过清洗的HTML，标题带锚点，代码块保留 language-xxx 类名供前端高亮；
+- toc：标题目录 [{level, text, id}]，id 与HTML中的标题锚点一致；
+- excerpt：纯文本摘要；
+- word_count / reading_time：字数（中文按字、英文按词计）和预计阅读分钟数。
+
+渲染选项与前端 utils/markdown.js 保持一致（允许HTML、换行转<br>、自动链接、排版替换），
+原文中的HTML在清洗时只保留白名单内的标签和属性，表格单元格的 style 只保留 text-align；
+摘要和字数只统计文字，不包含原文HTML中 script/style 的内容。
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import nh3
+from markdown_it import MarkdownIt
+from mdit_py_plugins.anchors import anchors_plugin
+
+# 纯文本摘要长度
+EXCERPT_LENGTH = 200
+
+# 阅读速度：中文每分钟字数、英文每分钟词数
+CJK_CHARS_PER_MINUTE = 300
+WORDS_PER_MINUTE = 200
+
+_CJK_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+(?:['’\-][A-Za-z0-9]+)*")
+
+# 清洗白名单：在nh3默认白名单基础上保留锚点、代码高亮和图片懒加载需要的属性
+_ALLOWED_TAGS = set(nh3.ALLOWED_TAGS)
+_ALLOWED_ATTRIBUTES = {tag: set(attrs) for tag, attrs in nh3.ALLOWED_ATTRIBUTES.items()}
+for _heading in ("h1", "h2", "h3", "h4", "h5", "h6"):
+    _ALLOWED_ATTRIBUTES.setdefault(_heading, set()).add("id")
+_ALLOWED_ATTRIBUTES.setdefault("a", set()).update({"href", "title", "class", "aria-hidden"})
+_ALLOWED_ATTRIBUTES.setdefault("code", set()).add("class")
+_ALLOWED_ATTRIBUTES.setdefault("pre", set()).add("class")
+_ALLOWED_ATTRIBUTES.setdefault("img", set()).update({"src", "alt", "title", "loading"})
+# 表格对齐以 style="text-align:..." 输出，清洗时 style 中只保留该属性
+_ALLOWED_ATTRIBUTES.setdefault("th", set()).add("style")
+_ALLOWED_ATTRIBUTES.setdefault("td", set()).add("style")
+_ALLOWED_STYLE_PROPERTIES = {"text-align"}
+
+# 原文HTML中内容不是文字的标签，其中的内容不计入摘要和字数
+_RAW_TEXT_TAGS = {"script", "style"}
+_HTML_TAG_PATTERN = re.compile(r"<(/?)([A-Za-z][A-Za-z0-9-]*)[^>]*?(/?)>")
+
+
+def _render_image(self, tokens, idx, options, env):
+    tokens[idx].attrSet("loading", "lazy")
+    return self.image(tokens, idx, options, env)
+
+
+_md = (
+    MarkdownIt("commonmark", {"html": True, "breaks": True, "linkify": True, "typographer": True})
+    .enable(["table", "strikethrough", "linkify", "replacements", "smartquotes"])
+    .use(anchors_plugin, min_level=1, max_level=6, permalink=True, permalinkBefore=True, permalinkSymbol="#")
+)
+_md.add_render_rule("image", _render_image)
+
+
+@dataclass
+class RenderedMarkdown:
+    """Markdown渲染结果"""
+    html: str
+    toc: List[Dict[str, Any]] = field(default_factory=list)
+    excerpt: str = ""
+    word_count: int = 0
+    reading_time: int = 0
+
+
+def _inline_text(token) -> str:
+    parts = []
+    # 当前所在的 script/style 标签层数
+    raw_depth = 0
+    for child in token.children or []:
+        if child.type == "html_inline":
+            match = _HTML_TAG_PATTERN.match(child.content)
+            if match and match.group(2).lower() in _RAW_TEXT_TAGS and not match.group(3):
+                raw_depth = max(raw_depth - 1, 0) if match.group(1) else raw_depth + 1
+        elif raw_depth:
+            continue
+        elif child.type in ("text", "code_inline"):
+            parts.append(child.content)
+        elif child.type in ("softbreak", "hardbreak"):
+            parts.append(" ")
+    return "".join(parts)
+
+
+def _count_words(text: str):
+    cjk = len(_CJK_PATTERN.findall(text))
+    words = len(_WORD_PATTERN.findall(_CJK_PATTERN.sub(" ", text)))
+    return cjk, words
+
+
+def render_markdown(content: str) -> RenderedMarkdown:
+    """渲染文章Markdown，生成HTML、目录、摘要和阅读时间"""
+    if not content:
+        return RenderedMarkdown(html="")
+
+    env: Dict[str, Any] = {}
+    tokens = _md.parse(content, env)
+
+    toc = []
+    texts = []
+    paragraphs = []
+    for idx, token in enumerate(tokens):
+        if token.type != "inline":
+            continue
+        text = _inline_text(token)
+        texts.append(text)
+        opener = tokens[idx - 1] if idx > 0 else None
+        if opener is not None and opener.type == "heading_open":
+            # 锚点插件生成的permalink不属于标题文字
+            toc.append({
+                "level": int(opener.tag[1]),
+                "text": text.strip(),
+                "id": opener.attrGet("id")
+            })
+        elif opener is not None and opener.type == "paragraph_open":
+            paragraphs.append(text)
+
+    html = nh3.clean(
+        _md.renderer.render(tokens, _md.options, env),
+        tags=_ALLOWED_TAGS,
+        attributes=_ALLOWED_ATTRIBUTES,
+        filter_style_properties=_ALLOWED_STYLE_PROPERTIES
+    )
+
+    excerpt = re.sub(r"\s+", " ", " ".join(paragraphs)).strip()
+    if len(excerpt) > EXCERPT_LENGTH:
+        excerpt = excerpt[:EXCERPT_LENGTH].rstrip() + "…"
+
+    cjk, words = _count_words(" ".join(texts))
+    word_count = cjk + words
+    reading_time = max(1, math.ceil(cjk / CJK_CHARS_PER_MINUTE + words / WORDS_PER_MINUTE)) if word_count else 0
+
+    return RenderedMarkdown(
+        html=html,
+        toc=toc,
+        excerpt=excerpt,
+        word_count=word_count,
+        reading_time=reading_time
+    )
+
+
+def render_article(article) -> RenderedMarkdown:
+    """渲染文章正文并写入文章的渲染结果字段"""
+    rendered = render_markdown(article.content)
+    article.content_html = rendered.html
+    article.toc = rendered.toc
+    article.excerpt = rendered.excerpt
+    article.word_count = rendered.word_count
+    article.reading_time = rendered.reading_time
+    return rendered
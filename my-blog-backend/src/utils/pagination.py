@@ -0,0 +1,56 @@
+"""
+游标分页工具模块
+
+基于 (排序时间, id) 的键集分页：游标对客户端不透明，记录上一页最后一行的位置，
+下一页通过 WHERE (t, id) < (游标t, 游标id) 定位，配合对应的复合索引，
+翻页深度不影响查询耗时，新插入的数据也不会导致翻页结果重复或遗漏。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# 分页游标响应头
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """根据一行的排序时间和ID生成游标"""
+    payload = json.dumps({"t": sort_value.isoformat(), "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标，格式不正确时返回400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def apply_keyset(query, sort_column, id_column, cursor: Optional[str]):
+    """按 (sort_column, id_column) 倒序排列，并在提供游标时定位到游标之后"""
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id)
+        ))
+    return query.order_by(sort_column.desc(), id_column.desc())
+
+
+def next_cursor(rows, limit: int, sort_attr: str = "created_at") -> Optional[str]:
+    """当前页已满时，根据最后一行生成下一页游标"""
+    if limit <= 0 or len(rows) < limit:
+        return None
+    last = rows[-1]
+    sort_value = getattr(last, sort_attr)
+    if sort_value is None:
+        return None
+    return encode_cursor(sort_value, last.id)
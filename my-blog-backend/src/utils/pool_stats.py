@@ -0,0 +1,102 @@
+"""
+数据库连接池统计模块
+
+通过包装连接池的取连接过程，记录取连接次数、等待耗时分布和超时次数，
+用于根据真实负载调整连接池大小。
+"""
+
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# 取连接等待耗时直方图的桶上界（毫秒）
+CHECKOUT_BUCKETS_MS: List[float] = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class PoolStats:
+    """单个连接池的取连接统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        # 最后一个桶记录超过最大上界的次数
+        self.buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+        self.since = time.time()
+
+    def reset(self):
+        """清空累计统计"""
+        with self._lock:
+            self._clear()
+
+    def record_checkout(self, wait_ms: float, timed_out: bool = False):
+        """记录一次取连接"""
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            for index, upper in enumerate(CHECKOUT_BUCKETS_MS):
+                if wait_ms <= upper:
+                    self.buckets[index] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def snapshot(self, pool) -> Dict:
+        """返回连接池当前状态和累计统计"""
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            histogram = {f"le_{upper:g}ms": count for upper, count in zip(CHECKOUT_BUCKETS_MS, self.buckets)}
+            histogram["gt_{:g}ms".format(CHECKOUT_BUCKETS_MS[-1])] = self.buckets[-1]
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / attempts, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "wait_histogram": histogram,
+                "since": self.since,
+            }
+
+        # 连接池实时状态（不同连接池实现提供的方法不同）
+        for key in ("size", "checkedin", "checkedout", "overflow", "timeout"):
+            method = getattr(pool, key, None)
+            if callable(method):
+                stats[key] = method()
+        stats["pool_class"] = type(pool).__name__
+        stats["name"] = self.name
+        return stats
+
+
+def instrumented_pool_class(base_class, stats: PoolStats):
+    """创建记录取连接耗时的连接池子类
+
+    统计对象挂在类属性上，引擎 dispose() 重建连接池后依然有效。
+    """
+
+    class InstrumentedPool(base_class):
+        pool_stats = stats
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                self.pool_stats.record_checkout((time.perf_counter() - start) * 1000, timed_out=True)
+                raise
+            self.pool_stats.record_checkout((time.perf_counter() - start) * 1000)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base_class.__name__}"
+    InstrumentedPool.__qualname__ = InstrumentedPool.__name__
+    return InstrumentedPool
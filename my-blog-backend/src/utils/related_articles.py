@@ -0,0 +1,296 @@
+"""
+相关文章计算模块
+
+离线计算每篇已发布文章最相关的前k篇，结果保存在 related_articles 表中，
+文章页读取相关文章只需按主键读取一次：
+- 文本相似度：标题、摘要、正文和标签名的TF-IDF向量（对数词频、平滑IDF、L2归一化）的余弦相似度，
+  每篇文章只保留权重最高的若干词，并通过词的倒排表只比较有共同词的文章；
+- 标签相似度：标签集合的Jaccard系数，与文本相似度按权重相加。
+
+文章创建、编辑或状态变化后加入待更新队列，后台任务合并处理，只重算受影响的文章：
+变化的文章本身、原来把它列为相关文章的文章，以及它的得分能进入前k名的文章。
+全量重建见 rebuild_related_articles.py。
+"""
+
+import asyncio
+import heapq
+import math
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import selectinload
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.cache import response_cache
+from src.utils.logger import log
+from src.utils.tokenizer import tokenize, markdown_to_text
+
+# 每篇文章保存的相关文章数
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "6"))
+
+# 标签相似度在总得分中的权重
+TAG_WEIGHT = 0.3
+
+# 每篇文章向量保留的词数
+MAX_TERMS_PER_DOC = 64
+
+# 标题词频加权
+TITLE_WEIGHT = 3
+
+# 待更新队列的处理间隔（秒）
+RELATED_UPDATE_INTERVAL = float(os.getenv("RELATED_UPDATE_INTERVAL", "10"))
+
+LOAD_BATCH_SIZE = 200
+
+# 文章ID -> (词频, 标签ID集合)
+Corpus = Dict[int, Tuple[Counter, Set[int]]]
+
+
+def article_terms(title: str, summary: Optional[str], content: Optional[str], tag_names: Iterable[str]) -> Counter:
+    """文章的词频统计"""
+    terms = Counter(tokenize(summary or ""))
+    terms.update(tokenize(markdown_to_text(content)))
+    terms.update(tokenize(" ".join(tag_names)))
+    for token in tokenize(title or ""):
+        terms[token] += TITLE_WEIGHT
+    return terms
+
+
+class RelatedModel:
+    """语料的TF-IDF向量和倒排表"""
+
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        doc_count = len(corpus)
+        df = Counter()
+        for terms, _ in corpus.values():
+            df.update(terms.keys())
+
+        self.vectors: Dict[int, Dict[str, float]] = {}
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self.tag_docs: Dict[int, Set[int]] = defaultdict(set)
+        for doc_id, (terms, tag_ids) in corpus.items():
+            weights = {
+                term: (1 + math.log(tf)) * (math.log((1 + doc_count) / (1 + df[term])) + 1)
+                for term, tf in terms.items()
+            }
+            top = heapq.nlargest(MAX_TERMS_PER_DOC, weights.items(), key=lambda item: item[1])
+            norm = math.sqrt(sum(weight * weight for _, weight in top)) or 1.0
+            vector = {term: weight / norm for term, weight in top}
+            self.vectors[doc_id] = vector
+            for term, weight in vector.items():
+                self.postings[term].append((doc_id, weight))
+            for tag_id in tag_ids:
+                self.tag_docs[tag_id].add(doc_id)
+
+    def similarities(self, doc_id: int) -> Dict[int, float]:
+        """与其他文章的相似度，只包含有共同词或共同标签的文章"""
+        dots: Dict[int, float] = defaultdict(float)
+        for term, weight in self.vectors.get(doc_id, {}).items():
+            for other, other_weight in self.postings[term]:
+                if other != doc_id:
+                    dots[other] += weight * other_weight
+
+        own_tags = self.corpus[doc_id][1]
+        candidates = set(dots)
+        for tag_id in own_tags:
+            candidates.update(self.tag_docs[tag_id])
+        candidates.discard(doc_id)
+
+        scores = {}
+        for other in candidates:
+            other_tags = self.corpus[other][1]
+            union = len(own_tags | other_tags)
+            jaccard = len(own_tags & other_tags) / union if union else 0.0
+            scores[other] = (1 - TAG_WEIGHT) * dots.get(other, 0.0) + TAG_WEIGHT * jaccard
+        return scores
+
+    def top_related(self, doc_id: int, k: int = RELATED_TOP_K) -> List[Tuple[int, float]]:
+        scores = self.similarities(doc_id)
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def plan_update(
+    model: RelatedModel,
+    changed_ids: Set[int],
+    referencing_ids: Set[int],
+    stored: Dict[int, Tuple[float, int]],
+    k: int = RELATED_TOP_K
+) -> Dict[int, List[Tuple[int, float]]]:
+    """计算需要重写的文章及其新的相关文章列表
+
+    Args:
+        changed_ids: 内容或状态变化的文章
+        referencing_ids: 当前把变化文章列为相关文章的文章
+        stored: 文章ID -> (已保存的最低得分, 已保存的条数)
+    """
+    affected = set(changed_ids) | set(referencing_ids)
+    for doc_id in changed_ids:
+        if doc_id not in model.vectors:
+            continue
+        for other, score in model.similarities(doc_id).items():
+            min_score, count = stored.get(other, (0.0, 0))
+            if count < k or score > min_score:
+                affected.add(other)
+    return {
+        doc_id: model.top_related(doc_id, k) if doc_id in model.vectors else []
+        for doc_id in affected
+    }
+
+
+class RelatedArticleEngine:
+    """相关文章的加载、计算和写回"""
+
+    def __init__(self, interval: float = RELATED_UPDATE_INTERVAL):
+        self.interval = interval
+        # 文章ID -> (updated_at, 词频, 标签ID集合)，文章未修改时不再重新分词
+        self._terms_cache: Dict[int, Tuple[Optional[datetime], Counter, Set[int]]] = {}
+        self._pending: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def schedule(self, article_id: int):
+        """文章变化后加入待更新队列"""
+        self._pending.add(article_id)
+
+    async def _load_corpus(self, db) -> Corpus:
+        rows = (await db.execute(
+            select(models.Article.id, models.Article.updated_at)
+            .filter(models.Article.status == "published")
+        )).all()
+        published = {article_id: updated_at for article_id, updated_at in rows}
+
+        for article_id in [article_id for article_id in self._terms_cache if article_id not in published]:
+            del self._terms_cache[article_id]
+        stale = [
+            article_id for article_id, updated_at in published.items()
+            if article_id not in self._terms_cache or self._terms_cache[article_id][0] != updated_at
+        ]
+
+        for start in range(0, len(stale), LOAD_BATCH_SIZE):
+            articles = (await db.execute(
+                select(models.Article)
+                .options(selectinload(models.Article.tags_relationship))
+                .filter(models.Article.id.in_(stale[start:start + LOAD_BATCH_SIZE]))
+            )).scalars().all()
+            documents = [
+                (
+                    article.id,
+                    article.updated_at,
+                    article.title,
+                    article.summary,
+                    article.content,
+                    [tag.name for tag in article.tags_relationship],
+                    {tag.id for tag in article.tags_relationship}
+                )
+                for article in articles
+            ]
+            db.expunge_all()
+            # 分词在线程中进行，避免阻塞事件循环
+            terms = await asyncio.to_thread(
+                lambda: [article_terms(title, summary, content, tag_names) for _, _, title, summary, content, tag_names, _ in documents]
+            )
+            for (article_id, updated_at, _, _, _, _, tag_ids), counter in zip(documents, terms):
+                self._terms_cache[article_id] = (updated_at, counter, tag_ids)
+
+        return {
+            article_id: (counter, tag_ids)
+            for article_id, (_, counter, tag_ids) in self._terms_cache.items()
+        }
+
+    async def _write(self, db, results: Dict[int, List[Tuple[int, float]]]):
+        """替换这些文章的相关文章并提交"""
+        if results:
+            await db.execute(delete(models.RelatedArticle).where(models.RelatedArticle.article_id.in_(list(results))))
+        rows = [
+            {"article_id": article_id, "rank": rank, "related_id": related_id, "score": round(score, 6)}
+            for article_id, related in results.items()
+            for rank, (related_id, score) in enumerate(related)
+        ]
+        if rows:
+            await db.execute(insert(models.RelatedArticle), rows)
+        await db.commit()
+        await response_cache.invalidate("related")
+
+    async def update(self, changed_ids: Iterable[int]) -> int:
+        """增量更新：只重算受变化文章影响的文章，返回重写的文章数"""
+        changed_ids = set(changed_ids)
+        if not changed_ids:
+            return 0
+        async with self._lock:
+            async with AsyncSessionLocal() as db:
+                corpus = await self._load_corpus(db)
+                referencing = set((await db.scalars(
+                    select(models.RelatedArticle.article_id)
+                    .where(models.RelatedArticle.related_id.in_(changed_ids))
+                )).all())
+                stored = {
+                    article_id: (min_score, count)
+                    for article_id, min_score, count in (await db.execute(
+                        select(
+                            models.RelatedArticle.article_id,
+                            func.min(models.RelatedArticle.score),
+                            func.count()
+                        ).group_by(models.RelatedArticle.article_id)
+                    )).all()
+                }
+                results = await asyncio.to_thread(
+                    lambda: plan_update(RelatedModel(corpus), changed_ids, referencing, stored)
+                )
+                await self._write(db, results)
+                return len(results)
+
+    async def rebuild_all(self) -> int:
+        """全量重建所有文章的相关文章，返回处理的文章数"""
+        async with self._lock:
+            async with AsyncSessionLocal() as db:
+                corpus = await self._load_corpus(db)
+
+                def compute():
+                    model = RelatedModel(corpus)
+                    return {doc_id: model.top_related(doc_id) for doc_id in corpus}
+
+                results = await asyncio.to_thread(compute)
+                await db.execute(delete(models.RelatedArticle))
+                await self._write(db, results)
+                return len(results)
+
+    async def flush(self) -> int:
+        """处理待更新队列"""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, set()
+        try:
+            return await self.update(batch)
+        except Exception as e:
+            self._pending.update(batch)
+            log.error(f"相关文章更新失败: {str(e)}")
+            return 0
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        """启动后台更新任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并处理剩余的待更新文章"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+related_engine = RelatedArticleEngine()
@@ -0,0 +1,382 @@
+"""
+文章全文检索模块
+
+内存倒排索引覆盖已发布文章的标题、摘要、正文和标签名：
+- 分词见 tokenizer 模块，中文使用二元组，拉丁文字使用单词；
+- 各字段按权重累加词频，使用BM25打分，多个查询词之间为“与”关系；
+- 文章创建、编辑、状态变化时在当前进程内立即更新索引；
+- 后台任务定期按 updated_at 同步其他worker或其他途径产生的修改，并把索引保存到磁盘，
+  重启时加载索引文件后只需同步增量，不必重建。
+"""
+
+import asyncio
+import heapq
+import html
+import json
+import math
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.logger import log
+from src.utils.tokenizer import tokenize, query_tokens, split_words, is_cjk, markdown_to_text
+
+# 索引文件路径
+SEARCH_INDEX_PATH = os.getenv(
+    "SEARCH_INDEX_PATH",
+    os.path.join(os.path.dirname(__file__), "../../data/search_index.json")
+)
+
+# 后台同步和保存索引的间隔（秒）
+SEARCH_INDEX_SYNC_INTERVAL = float(os.getenv("SEARCH_INDEX_SYNC_INTERVAL", "30"))
+
+# 同步时回看的时间窗口，覆盖其他worker中稍晚提交的修改
+SYNC_OVERLAP = timedelta(seconds=60)
+SYNC_BATCH_SIZE = 200
+
+INDEX_FORMAT_VERSION = 1
+
+# 字段权重
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "summary": 1.5, "content": 1.0}
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 摘要片段长度
+SNIPPET_LENGTH = 160
+
+
+class SearchIndex:
+    """已发布文章的倒排索引"""
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH, interval: float = SEARCH_INDEX_SYNC_INTERVAL):
+        self.path = path
+        self.interval = interval
+        # 词 -> {文章ID: 加权词频}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        # 文章ID -> 包含的词，用于删除
+        self._doc_terms: Dict[int, List[str]] = {}
+        # 文章ID -> 加权文档长度
+        self._doc_len: Dict[int, float] = {}
+        # 文章ID -> (是否知识库文章, 知识库分类ID)
+        self._doc_meta: Dict[int, Tuple[bool, Optional[int]]] = {}
+        self._total_len = 0.0
+        self._watermark: Optional[datetime] = None
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self._sync_lock = asyncio.Lock()
+
+    @property
+    def document_count(self) -> int:
+        return len(self._doc_len)
+
+    def add_document(
+        self,
+        doc_id: int,
+        title: str,
+        summary: Optional[str],
+        content: Optional[str],
+        tags: Iterable[str],
+        is_knowledge_base: bool = False,
+        category_id: Optional[int] = None
+    ):
+        """加入或替换一篇文章"""
+        self.remove_document(doc_id)
+
+        fields = {
+            "title": title or "",
+            "summary": summary or "",
+            "content": markdown_to_text(content),
+            "tags": " ".join(tags),
+        }
+        weighted: Dict[str, float] = {}
+        length = 0.0
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                weighted[token] = weighted.get(token, 0.0) + weight
+                length += weight
+
+        for token, tf in weighted.items():
+            self._postings.setdefault(token, {})[doc_id] = tf
+        self._doc_terms[doc_id] = list(weighted)
+        self._doc_len[doc_id] = length
+        self._doc_meta[doc_id] = (bool(is_knowledge_base), category_id)
+        self._total_len += length
+        self._dirty = True
+
+    def remove_document(self, doc_id: int):
+        """从索引中移除一篇文章"""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for token in terms:
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[token]
+        self._total_len -= self._doc_len.pop(doc_id, 0.0)
+        self._doc_meta.pop(doc_id, None)
+        self._dirty = True
+
+    def index_article(self, article: models.Article):
+        """根据文章对象更新索引，未发布的文章从索引中移除
+
+        文章需已加载 tags_relationship。
+        """
+        if article.status != "published":
+            self.remove_document(article.id)
+            return
+        self.add_document(
+            article.id,
+            article.title,
+            article.summary,
+            article.content,
+            [tag.name for tag in article.tags_relationship],
+            article.is_knowledge_base,
+            article.knowledge_category_id
+        )
+
+    async def reindex(self, db, article_id: int):
+        """重新读取文章并更新索引，在文章写入提交后调用"""
+        article = await db.scalar(
+            select(models.Article)
+            .options(selectinload(models.Article.tags_relationship))
+            .filter(models.Article.id == article_id)
+        )
+        if article is None:
+            self.remove_document(article_id)
+        else:
+            self.index_article(article)
+
+    def search(
+        self,
+        query: str,
+        knowledge_base: Optional[bool] = None,
+        category_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 10
+    ) -> Tuple[int, List[Tuple[int, float]]]:
+        """检索文章
+
+        Returns:
+            (total, results): 匹配的文章总数，以及当前页的 (文章ID, 得分) 列表
+        """
+        tokens = query_tokens(query)
+        if not tokens or not self._doc_len:
+            return 0, []
+
+        postings = []
+        for token in tokens:
+            posting = self._postings.get(token)
+            if not posting:
+                return 0, []
+            postings.append(posting)
+
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting.keys())
+            if not candidates:
+                return 0, []
+
+        if knowledge_base is not None or category_id is not None:
+            candidates = {
+                doc_id for doc_id in candidates
+                if (knowledge_base is None or self._doc_meta[doc_id][0] == knowledge_base)
+                and (category_id is None or self._doc_meta[doc_id][1] == category_id)
+            }
+
+        doc_count = len(self._doc_len)
+        avg_len = self._total_len / doc_count or 1.0
+        weights = [
+            (posting, math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5)))
+            for posting in postings
+        ]
+        scores = {}
+        for doc_id in candidates:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[doc_id] / avg_len)
+            score = 0.0
+            for posting, idf in weights:
+                tf = posting[doc_id]
+                score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            scores[doc_id] = score
+
+        ranked = heapq.nlargest(skip + limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return len(scores), ranked[skip:]
+
+    async def sync(self) -> int:
+        """同步自上次同步以来修改过的文章，首次同步时建立完整索引，返回处理的文章数"""
+        async with self._sync_lock:
+            since = self._watermark - SYNC_OVERLAP if self._watermark else None
+            newest = self._watermark
+            last_id = 0
+            count = 0
+            async with AsyncSessionLocal() as db:
+                while True:
+                    query = (
+                        select(models.Article)
+                        .options(selectinload(models.Article.tags_relationship))
+                        .filter(models.Article.id > last_id)
+                    )
+                    if since is not None:
+                        query = query.filter(models.Article.updated_at >= since)
+                    articles = (await db.scalars(query.order_by(models.Article.id).limit(SYNC_BATCH_SIZE))).all()
+                    if not articles:
+                        break
+
+                    for article in articles:
+                        self.index_article(article)
+                        if article.updated_at and (newest is None or article.updated_at > newest):
+                            newest = article.updated_at
+                    count += len(articles)
+                    last_id = articles[-1].id
+                    db.expunge_all()
+
+            self._watermark = newest
+            return count
+
+    def _snapshot(self) -> dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "docs": {
+                str(doc_id): [self._doc_len[doc_id], meta[0], meta[1]]
+                for doc_id, meta in self._doc_meta.items()
+            },
+            "postings": {
+                token: {str(doc_id): tf for doc_id, tf in posting.items()}
+                for token, posting in self._postings.items()
+            },
+        }
+
+    def _write(self, payload: dict):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        """有修改时把索引保存到磁盘"""
+        if not self._dirty:
+            return
+        payload = self._snapshot()
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, payload)
+        except Exception as e:
+            self._dirty = True
+            log.error(f"保存搜索索引失败: {str(e)}")
+
+    def load(self) -> bool:
+        """从磁盘加载索引，文件不存在或格式不匹配时返回False"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") != INDEX_FORMAT_VERSION:
+                return False
+
+            postings: Dict[str, Dict[int, float]] = {}
+            doc_terms: Dict[int, List[str]] = {}
+            for token, posting in payload["postings"].items():
+                postings[token] = {int(doc_id): tf for doc_id, tf in posting.items()}
+                for doc_id in postings[token]:
+                    doc_terms.setdefault(doc_id, []).append(token)
+            docs = {int(doc_id): value for doc_id, value in payload["docs"].items()}
+        except Exception as e:
+            log.error(f"加载搜索索引失败，将重新建立: {str(e)}")
+            return False
+
+        self._postings = postings
+        self._doc_terms = doc_terms
+        self._doc_len = {doc_id: value[0] for doc_id, value in docs.items()}
+        self._doc_meta = {doc_id: (value[1], value[2]) for doc_id, value in docs.items()}
+        self._total_len = sum(self._doc_len.values())
+        self._watermark = datetime.fromisoformat(payload["watermark"]) if payload["watermark"] else None
+        self._dirty = False
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                count = await self.sync()
+                if count:
+                    log.debug(f"搜索索引已同步 {count} 篇文章")
+                await self.save()
+            except Exception as e:
+                log.error(f"搜索索引同步失败: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """加载索引文件并启动后台同步任务（首次同步在后台进行，不阻塞启动）"""
+        if self._task is not None:
+            return
+        if await asyncio.to_thread(self.load):
+            log.info(f"已加载搜索索引，共 {self.document_count} 篇文章")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并保存索引"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+
+def highlight_pattern(query: str) -> Optional[re.Pattern]:
+    """根据查询构造高亮用的正则，优先匹配完整的词"""
+    terms = set()
+    for word in split_words(query):
+        terms.add(word)
+        if is_cjk(word) and len(word) > 2:
+            terms.update(word[i:i + 2] for i in range(len(word) - 1))
+    if not terms:
+        return None
+    alternatives = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(alternatives, re.IGNORECASE)
+
+
+def highlight(text: str, pattern: Optional[re.Pattern]) -> str:
+    """转义HTML并用<mark>标记命中的词"""
+    if not text:
+        return ""
+    if pattern is None:
+        return html.escape(text)
+    parts = []
+    last = 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        last = match.end()
+    parts.append(html.escape(text[last:]))
+    return "".join(parts)
+
+
+def make_snippet(text: str, pattern: Optional[re.Pattern], length: int = SNIPPET_LENGTH) -> str:
+    """截取首个命中位置附近的片段并高亮"""
+    if not text:
+        return ""
+    match = pattern.search(text) if pattern is not None else None
+    start = max(0, match.start() - length // 4) if match else 0
+    end = min(len(text), start + length)
+    snippet = highlight(text[start:end], pattern)
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+
+search_index = SearchIndex()
@@ -0,0 +1,192 @@
+"""
+输入联想前缀索引模块
+
+对文章标题、标签名和知识库分类名建立内存中的有序键数组，查询时用 bisect 定位前缀：
+- 名称从开头以及每个单词、每个汉字处各生成一个键，输入标题中间的词也能联想到；
+- 含中文的名称额外生成全拼和拼音首字母键，如“数据库”可由 shujuku、sjk 联想；
+- 键和查询都去掉空白，“vue r”与“vue router”、“vuer”均可匹配；
+- 查询对前缀范围内的所有键排序后取前几个，不按字典序截断，排在后面的更佳匹配不会丢失；
+- 写操作在当前进程内增量更新，后台任务定期从数据库重建，同步其他worker的修改。
+"""
+
+import asyncio
+import heapq
+import os
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from pypinyin import lazy_pinyin, Style
+from sqlalchemy import select
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.logger import log
+from src.utils.tokenizer import normalize, is_cjk
+
+# 后台重建间隔（秒）
+SUGGEST_REFRESH_INTERVAL = float(os.getenv("SUGGEST_REFRESH_INTERVAL", "60"))
+
+# 每个名称最多生成键的起始位置数、每个键的最大长度
+MAX_KEY_POSITIONS = 40
+MAX_KEY_LENGTH = 32
+
+# 大于所有键中字符的上界，用于定位前缀范围的末尾
+KEY_UPPER_BOUND = "\U0010ffff"
+
+# 联想对象类型，同等匹配程度下按此顺序排列
+SUGGEST_TYPES = ("tag", "category", "article")
+
+# 键的匹配程度：名称开头 < 名称中的词 < 拼音
+RANK_PREFIX = 0
+RANK_WORD = 1
+RANK_PINYIN = 2
+
+
+def _pinyin_syllables(text: str) -> Tuple[List[str], List[str]]:
+    """逐字转换为拼音和首字母，非汉字原样保留，结果与原文逐字对齐"""
+    full = lazy_pinyin(text, errors=lambda chars: list(chars))
+    initials = lazy_pinyin(text, style=Style.FIRST_LETTER, errors=lambda chars: list(chars))
+    return full, initials
+
+
+def _compact(parts) -> str:
+    """拼接并去掉所有空白，键和查询使用同样的处理"""
+    return "".join("".join(parts).split())[:MAX_KEY_LENGTH]
+
+
+def build_keys(name: str) -> List[Tuple[str, int]]:
+    """为名称生成 (键, 匹配程度) 列表"""
+    text = normalize(name).strip()
+    if not text:
+        return []
+
+    keys = {}
+
+    def add(key: str, rank: int):
+        if key and (key not in keys or rank < keys[key]):
+            keys[key] = rank
+
+    positions = [
+        i for i, char in enumerate(text)
+        if i == 0 or is_cjk(char) or (char.isalnum() and not text[i - 1].isalnum())
+    ][:MAX_KEY_POSITIONS]
+
+    for i in positions:
+        add(_compact(text[i:]), RANK_PREFIX if i == 0 else RANK_WORD)
+
+    if any(is_cjk(char) for char in text):
+        full, initials = _pinyin_syllables(text)
+        if len(full) == len(text):
+            for i in positions:
+                if i == 0 or is_cjk(text[i]):
+                    add(_compact(full[i:]), RANK_PINYIN)
+                    add(_compact(initials[i:]), RANK_PINYIN)
+
+    return list(keys.items())
+
+
+class SuggestIndex:
+    """基于有序数组的前缀索引"""
+
+    def __init__(self, interval: float = SUGGEST_REFRESH_INTERVAL):
+        self.interval = interval
+        # 按键排序的 (键, 匹配程度, 类型, ID)
+        self._entries: List[Tuple[str, int, str, int]] = []
+        # (类型, ID) -> (显示名称, 键列表)
+        self._items: Dict[Tuple[str, int], Tuple[str, List[Tuple[str, int]]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item_type: str, item_id: int, name: str):
+        """加入或更新一个联想对象"""
+        self.remove(item_type, item_id)
+        keys = build_keys(name)
+        for key, rank in keys:
+            insort(self._entries, (key, rank, item_type, item_id))
+        self._items[(item_type, item_id)] = (name, keys)
+
+    def remove(self, item_type: str, item_id: int):
+        """移除一个联想对象"""
+        item = self._items.pop((item_type, item_id), None)
+        if item is None:
+            return
+        for key, rank in item[1]:
+            entry = (key, rank, item_type, item_id)
+            index = bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+
+    def suggest(self, query: str, limit: int = 10, types: Optional[List[str]] = None) -> List[dict]:
+        """返回前缀匹配的联想结果"""
+        prefix = "".join(normalize(query).split())[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+
+        best: Dict[Tuple[str, int], int] = {}
+        start = bisect_left(self._entries, (prefix,))
+        end = bisect_left(self._entries, (prefix + KEY_UPPER_BOUND,), start)
+        for index in range(start, end):
+            _, rank, item_type, item_id = self._entries[index]
+            if types is None or item_type in types:
+                item = (item_type, item_id)
+                if item not in best or rank < best[item]:
+                    best[item] = rank
+
+        ranked = heapq.nsmallest(
+            limit,
+            best.items(),
+            key=lambda pair: (pair[1], SUGGEST_TYPES.index(pair[0][0]), len(self._items[pair[0]][0]))
+        )
+        return [
+            {"type": item_type, "id": item_id, "text": self._items[(item_type, item_id)][0]}
+            for (item_type, item_id), _ in ranked
+        ]
+
+    async def rebuild(self):
+        """从数据库重新建立索引，建好后整体替换"""
+        async with AsyncSessionLocal() as db:
+            articles = (await db.execute(
+                select(models.Article.id, models.Article.title).filter(models.Article.status == "published")
+            )).all()
+            tags = (await db.execute(select(models.Tag.id, models.Tag.name))).all()
+            categories = (await db.execute(
+                select(models.KnowledgeCategory.id, models.KnowledgeCategory.name)
+                .filter(models.KnowledgeCategory.is_active == True)
+            )).all()
+
+        entries = []
+        items = {}
+        for item_type, rows in (("article", articles), ("tag", tags), ("category", categories)):
+            for item_id, name in rows:
+                keys = build_keys(name)
+                entries.extend((key, rank, item_type, item_id) for key, rank in keys)
+                items[(item_type, item_id)] = (name, keys)
+        entries.sort()
+        self._entries, self._items = entries, items
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                log.error(f"联想索引重建失败: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """启动后台重建任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,84 @@
+"""
+标签文章数物化模块
+
+tags.article_count 保存每个标签下已发布文章的数量：
+- 文章的标签或发布状态变化时，在同一事务中按差值原子地加减，不重新统计；
+- reconcile_tag_counts 按 article_tags 分组统计重建，修正并发或其他途径造成的偏差，
+  见 reconcile_tag_counts.py。
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import select, update, func
+
+from src.model import models
+from src.utils.logger import log
+
+
+async def adjust_tag_counts(
+    db,
+    old_tag_ids: Iterable[int],
+    old_published: bool,
+    new_tag_ids: Iterable[int],
+    new_published: bool
+):
+    """根据一篇文章变化前后的标签和发布状态更新标签文章数，调用方负责提交
+
+    Args:
+        old_tag_ids / old_published: 变化前的标签ID和是否已发布，新建文章传空列表和False
+        new_tag_ids / new_published: 变化后的标签ID和是否已发布
+    """
+    deltas = Counter()
+    if old_published:
+        deltas.subtract(set(old_tag_ids))
+    if new_published:
+        deltas.update(set(new_tag_ids))
+
+    # 按差值分组，每组一条 UPDATE
+    groups: Dict[int, list] = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            groups.setdefault(delta, []).append(tag_id)
+    for delta, tag_ids in groups.items():
+        await db.execute(
+            update(models.Tag)
+            .where(models.Tag.id.in_(tag_ids))
+            .values(article_count=models.Tag.article_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def published_tag_counts(db) -> Dict[int, int]:
+    """按 article_tags 统计每个标签的已发布文章数"""
+    rows = (await db.execute(
+        select(models.article_tags.c.tag_id, func.count())
+        .join(models.Article, models.Article.id == models.article_tags.c.article_id)
+        .where(models.Article.status == "published")
+        .group_by(models.article_tags.c.tag_id)
+    )).all()
+    return dict(rows)
+
+
+async def reconcile_tag_counts(db) -> Dict[int, Tuple[int, int]]:
+    """重建标签文章数并提交，返回被修正的标签 {标签ID: (原值, 新值)}"""
+    actual = await published_tag_counts(db)
+    stored = dict((await db.execute(select(models.Tag.id, models.Tag.article_count))).all())
+
+    fixed = {}
+    for tag_id, count in stored.items():
+        expected = actual.get(tag_id, 0)
+        if count != expected:
+            fixed[tag_id] = (count, expected)
+
+    for tag_id, (_, expected) in fixed.items():
+        await db.execute(
+            update(models.Tag)
+            .where(models.Tag.id == tag_id)
+            .values(article_count=expected)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    if fixed:
+        log.warning(f"修正了 {len(fixed)} 个标签的文章数: {fixed}")
+    return fixed
@@ -0,0 +1,66 @@
+"""
+文本分词模块
+
+面向中英文混排的博客内容，不依赖分词词典：
+- 拉丁字母和数字按连续的字母数字切分为单词，统一转小写；
+- 中文按字切分二元组（bigram），同时保留单字，单字查询也能命中。
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_CJK_RANGES = "㐀-䶿一-鿿豈-﫿"
+_TOKEN_PATTERN = re.compile(rf"[0-9a-z]+|[{_CJK_RANGES}]+")
+_CJK_PATTERN = re.compile(rf"[{_CJK_RANGES}]")
+
+# Markdown中不参与检索的部分：图片和链接的地址、HTML标签
+_MARKDOWN_URL_PATTERN = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+_MARKDOWN_SYMBOL_PATTERN = re.compile(r"[#>*_`~|\-]{2,}|^\s*[#>*\-+]\s*", re.MULTILINE)
+
+
+def normalize(text: str) -> str:
+    """全角转半角并转小写"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def is_cjk(text: str) -> bool:
+    return bool(_CJK_PATTERN.match(text))
+
+
+def markdown_to_text(content: str) -> str:
+    """粗略去除Markdown标记，保留链接文字，用于检索和摘要"""
+    text = _MARKDOWN_URL_PATTERN.sub(r"\1", content or "")
+    text = _HTML_TAG_PATTERN.sub(" ", text)
+    text = _MARKDOWN_SYMBOL_PATTERN.sub(" ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def split_words(text: str) -> List[str]:
+    """切分出拉丁单词和连续的中文片段（不拆分为二元组）"""
+    return _TOKEN_PATTERN.findall(normalize(text))
+
+
+def tokenize(text: str) -> List[str]:
+    """索引用分词：拉丁单词 + 中文单字 + 中文二元组"""
+    tokens = []
+    for word in split_words(text):
+        if not is_cjk(word):
+            tokens.append(word)
+            continue
+        tokens.extend(word)
+        tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def query_tokens(text: str) -> List[str]:
+    """查询用分词：中文片段只取二元组（单字片段取单字），避免单字匹配过宽"""
+    tokens = []
+    for word in split_words(text):
+        if not is_cjk(word) or len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    # 去重并保持顺序
+    return list(dict.fromkeys(tokens))
@@ -0,0 +1,95 @@
+"""
+文章浏览量写回缓冲模块
+
+文章详情页每次访问不再直接 UPDATE 文章行，而是在进程内累加浏览增量，
+由后台任务定期合并为一条批量 UPDATE ... SET views = views + n 写回数据库，
+应用关闭时会写回剩余的增量。
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import update, case, func
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.logger import log
+
+# 浏览量写回间隔（秒）
+VIEW_COUNT_FLUSH_INTERVAL = float(os.getenv("VIEW_COUNT_FLUSH_INTERVAL", "10"))
+
+
+class ViewCounterBuffer:
+    """按文章累加浏览增量并定期批量写回"""
+
+    def __init__(self, interval: float = VIEW_COUNT_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def increment(self, article_id: int, count: int = 1):
+        """记录一次（或多次）浏览"""
+        self._pending[article_id] = self._pending.get(article_id, 0) + count
+
+    def pending(self, article_id: int) -> int:
+        """获取尚未写回数据库的浏览增量"""
+        return self._pending.get(article_id, 0)
+
+    async def flush(self) -> int:
+        """将累积的浏览增量写回数据库，返回写回的文章数"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            # 先交换缓冲区，写回期间的新浏览计入新的缓冲区
+            batch, self._pending = self._pending, {}
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(models.Article)
+                        .where(models.Article.id.in_(list(batch)))
+                        .values(
+                            views=func.coalesce(models.Article.views, 0) + case(batch, value=models.Article.id, else_=0),
+                            # 保持updated_at不变，浏览量变化不算文章更新
+                            updated_at=models.Article.updated_at
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                # 写回失败时把增量合并回缓冲区，下次重试
+                for article_id, count in batch.items():
+                    self.increment(article_id, count)
+                log.error(f"浏览量写回失败: {str(e)}")
+                return 0
+
+            # 文章详情缓存命中时会重新读取浏览量，这里不使缓存失效，避免频繁访问的文章的ETag不断变化
+            log.debug(f"已写回 {len(batch)} 篇文章的浏览量")
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        """启动后台写回任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写回剩余增量"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+view_counter = ViewCounterBuffer()
@@ -0,0 +1,204 @@
+"""
+访客IP地理位置解析模块
+
+visitor_logs 中每条记录都带有IP，按地区统计访问时不逐条查询地理位置，而是由后台任务
+把出现过的每个IP解析一次，结果存入 ip_geolocations 表，统计时与访问记录连接后分组：
+- 按ID分段扫描新增的访问记录，只解析表中还没有的IP，处理过的最大ID记在内存中，
+  重启后从头扫描一遍（已解析的IP会被跳过）；
+- 解析只使用本地IP库和在线查询结果的缓存，不访问网络；
+- 查不到位置的IP也会保存（“未知”），超过 VISITOR_GEO_UNKNOWN_RETRY 秒后重新解析，
+  期间可能已经被在线查询缓存或更新后的IP库覆盖。
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.ip_location import ip_location_service
+from src.utils.logger import log
+
+# 两次解析之间的间隔（秒），0表示不启动后台任务
+VISITOR_GEO_INTERVAL = float(os.getenv("VISITOR_GEO_INTERVAL", "600"))
+
+# 每段扫描的访问记录数
+VISITOR_GEO_CHUNK_SIZE = int(os.getenv("VISITOR_GEO_CHUNK_SIZE", "5000"))
+
+# 每段之间的暂停时间（秒）
+VISITOR_GEO_PAUSE = float(os.getenv("VISITOR_GEO_PAUSE", "0.1"))
+
+# 查不到位置的IP重新解析的间隔（秒）
+VISITOR_GEO_UNKNOWN_RETRY = float(os.getenv("VISITOR_GEO_UNKNOWN_RETRY", "86400"))
+
+# ip_geolocations 各位置列的长度
+LOCATION_COLUMN_LENGTH = 50
+
+
+def resolve_locations(ips: Iterable[str]) -> Dict[str, Dict]:
+    """用本地IP库和在线查询结果的缓存解析一批IP，不访问网络"""
+    locations = {}
+    for ip in ips:
+        location = ip_location_service.get_location(ip)
+        locations[ip] = {
+            name: str(location.get(name) or "未知")[:LOCATION_COLUMN_LENGTH]
+            for name in ("province", "city", "isp")
+        }
+    return locations
+
+
+class VisitorGeoLocator:
+    """把访问记录中新出现的IP解析为地理位置并保存"""
+
+    def __init__(
+        self,
+        interval: float = VISITOR_GEO_INTERVAL,
+        chunk_size: int = VISITOR_GEO_CHUNK_SIZE,
+        pause: float = VISITOR_GEO_PAUSE,
+        unknown_retry: float = VISITOR_GEO_UNKNOWN_RETRY
+    ):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.unknown_retry = unknown_retry
+        self.last_report: Optional[dict] = None
+        # 已处理的最大访问记录ID
+        self._last_log_id = 0
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def _locate_chunk(self, db, report: dict) -> bool:
+        """解析ID大于 _last_log_id 的一段访问记录中的新IP，没有更多记录时返回False"""
+        ids = (await db.scalars(
+            select(models.VisitorLog.id)
+            .filter(models.VisitorLog.id > self._last_log_id)
+            .order_by(models.VisitorLog.id)
+            .limit(self.chunk_size)
+        )).all()
+        if not ids:
+            return False
+        first_id, last_id = ids[0], ids[-1]
+
+        ips = set((await db.scalars(
+            select(models.VisitorLog.ip_address)
+            .filter(
+                models.VisitorLog.id.between(first_id, last_id),
+                models.VisitorLog.ip_address.is_not(None)
+            )
+            .distinct()
+        )).all())
+        if ips:
+            known = set((await db.scalars(
+                select(models.IPGeolocation.ip_address).filter(models.IPGeolocation.ip_address.in_(ips))
+            )).all())
+            ips -= known
+
+        if ips:
+            now = datetime.utcnow()
+            locations = resolve_locations(ips)
+            try:
+                await db.execute(
+                    insert(models.IPGeolocation),
+                    [{"ip_address": ip, **location, "updated_at": now} for ip, location in locations.items()]
+                )
+                await db.commit()
+            except IntegrityError:
+                # 其他worker同时写入了相同的IP，本段下次重新处理
+                await db.rollback()
+                log.warning(f"访客IP地理位置写入冲突，访问记录 {first_id}-{last_id} 将在下次重新解析")
+                return False
+            report["resolved"] += len(locations)
+            report["unknown"] += sum(1 for location in locations.values() if location["province"] == "未知")
+
+        report["scanned_logs"] += len(ids)
+        self._last_log_id = last_id
+        return True
+
+    async def _retry_unknown(self, db, report: dict):
+        """重新解析查不到位置且已超过重试间隔的IP"""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.unknown_retry)
+        while True:
+            ips = (await db.scalars(
+                select(models.IPGeolocation.ip_address)
+                .filter(models.IPGeolocation.province == "未知", models.IPGeolocation.updated_at < cutoff)
+                .limit(self.chunk_size)
+            )).all()
+            if not ips:
+                return
+            # 按解析结果分组，每组一条 UPDATE
+            groups: Dict[tuple, list] = {}
+            for ip, location in resolve_locations(ips).items():
+                groups.setdefault(tuple(location.items()), []).append(ip)
+            for location, group_ips in groups.items():
+                location = dict(location)
+                await db.execute(
+                    update(models.IPGeolocation)
+                    .where(models.IPGeolocation.ip_address.in_(group_ips))
+                    .values(**location, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                if location["province"] != "未知":
+                    report["retried"] += len(group_ips)
+            await db.commit()
+            await asyncio.sleep(self.pause)
+
+    async def run_once(self) -> dict:
+        """解析所有新增访问记录中的IP，返回报告"""
+        async with self._lock:
+            report = {
+                "started_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+                "scanned_logs": 0,
+                "resolved": 0,
+                "unknown": 0,
+                "retried": 0,
+            }
+            while True:
+                # 每段使用独立的会话和短事务
+                async with AsyncSessionLocal() as db:
+                    more = await self._locate_chunk(db, report)
+                if not more:
+                    break
+                await asyncio.sleep(self.pause)
+
+            async with AsyncSessionLocal() as db:
+                await self._retry_unknown(db, report)
+
+            report["finished_at"] = datetime.utcnow().isoformat()
+            self.last_report = report
+            if report["resolved"] or report["retried"]:
+                log.info(
+                    f"访客IP地理位置解析完成，新增 {report['resolved']} 个IP（未知 {report['unknown']} 个），"
+                    f"重新解析出 {report['retried']} 个"
+                )
+            return report
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                log.error(f"访客IP地理位置解析失败: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """启动后台解析任务"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+visitor_geo_locator = VisitorGeoLocator()
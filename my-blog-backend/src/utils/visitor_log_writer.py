@@ -0,0 +1,209 @@
+"""
+访问记录批量写入模块
+
+LoggingMiddleware 不再为每个请求单独打开会话、插入并提交一条 visitor_logs 记录，
+而是把记录放入进程内的有界队列，由后台任务批量写入：
+- 攒够 VISITOR_LOG_BATCH_SIZE 条或距本批第一条超过 VISITOR_LOG_FLUSH_INTERVAL_MS 毫秒时，
+  用一条多行 INSERT 写入；
+- 按路径前缀排除（健康检查、静态资源等）或按比例采样，不需要的记录不进入队列；
+- 队列满时（数据库变慢或不可用）直接丢弃新记录并计数，不阻塞请求、不占用更多内存；
+- 应用关闭时写入队列中剩余的记录。
+"""
+
+import asyncio
+import os
+import random
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from src.model import models
+from src.model.database import AsyncSessionLocal
+from src.utils.logger import log
+
+# 队列中最多等待写入的记录数
+VISITOR_LOG_QUEUE_SIZE = int(os.getenv("VISITOR_LOG_QUEUE_SIZE", "10000"))
+
+# 每批写入的最多记录数
+VISITOR_LOG_BATCH_SIZE = int(os.getenv("VISITOR_LOG_BATCH_SIZE", "200"))
+
+# 一批记录最长等待时间（毫秒）
+VISITOR_LOG_FLUSH_INTERVAL_MS = float(os.getenv("VISITOR_LOG_FLUSH_INTERVAL_MS", "1000"))
+
+# 不记录的路径前缀，逗号分隔
+VISITOR_LOG_EXCLUDE_PATHS = os.getenv(
+    "VISITOR_LOG_EXCLUDE_PATHS",
+    "/api/health,/static,/favicon.ico,/docs,/redoc,/openapi.json"
+)
+
+# 按路径前缀采样，格式为 前缀:比例，逗号分隔，如 /api/search:0.1
+VISITOR_LOG_SAMPLE_RULES = os.getenv("VISITOR_LOG_SAMPLE_RULES", "")
+
+# 其他路径的采样比例
+VISITOR_LOG_SAMPLE_RATE = float(os.getenv("VISITOR_LOG_SAMPLE_RATE", "1"))
+
+# visitor_logs 各字符串列的长度，超长的值截断，避免一条记录导致整批写入失败
+COLUMN_LENGTHS = {"ip_address": 50, "user_agent": 255, "path": 255, "method": 10, "referer": 255}
+
+
+def parse_sample_rules(exclude_paths: str, sample_rules: str) -> List[Tuple[str, float]]:
+    """解析排除路径和采样规则，排除视为比例0，按前缀长度降序排列（最长匹配优先）"""
+    rules: Dict[str, float] = {}
+    for item in sample_rules.split(","):
+        prefix, _, rate = item.strip().rpartition(":")
+        if prefix:
+            try:
+                rules[prefix] = min(max(float(rate), 0.0), 1.0)
+            except ValueError:
+                log.warning(f"忽略无效的访问记录采样规则: {item}")
+    for prefix in exclude_paths.split(","):
+        if prefix.strip():
+            rules[prefix.strip()] = 0.0
+    return sorted(rules.items(), key=lambda rule: len(rule[0]), reverse=True)
+
+
+class VisitorLogWriter:
+    """访问记录的有界队列和批量写入任务"""
+
+    def __init__(
+        self,
+        session_maker=AsyncSessionLocal,
+        queue_size: int = VISITOR_LOG_QUEUE_SIZE,
+        batch_size: int = VISITOR_LOG_BATCH_SIZE,
+        interval_ms: float = VISITOR_LOG_FLUSH_INTERVAL_MS,
+        exclude_paths: str = VISITOR_LOG_EXCLUDE_PATHS,
+        sample_rules: str = VISITOR_LOG_SAMPLE_RULES,
+        sample_rate: float = VISITOR_LOG_SAMPLE_RATE
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.rules = parse_sample_rules(exclude_paths, sample_rules)
+        self.sample_rate = sample_rate
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._stats = {
+            "written": 0,
+            "batches": 0,
+            "excluded": 0,
+            "sampled_out": 0,
+            "dropped_queue_full": 0,
+            "dropped_write_error": 0,
+        }
+        # 正在攒的一批记录
+        self._pending: List[Dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._writing = False
+
+    def sample_rate_for(self, path: str) -> float:
+        for prefix, rate in self.rules:
+            if path.startswith(prefix):
+                return rate
+        return self.sample_rate
+
+    def submit(self, **record) -> bool:
+        """提交一条访问记录，返回是否进入了写入队列
+
+        记录的字段与 VisitorLog 相同，request_time 默认为当前时间。
+        """
+        rate = self.sample_rate_for(record.get("path") or "")
+        if rate <= 0:
+            self._stats["excluded"] += 1
+            return False
+        if rate < 1 and random.random() >= rate:
+            self._stats["sampled_out"] += 1
+            return False
+
+        record.setdefault("request_time", datetime.utcnow())
+        for name, length in COLUMN_LENGTHS.items():
+            value = record.get(name)
+            if isinstance(value, str) and len(value) > length:
+                record[name] = value[:length]
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self._stats["dropped_queue_full"] += 1
+            if self._stats["dropped_queue_full"] % 1000 == 1:
+                log.warning(f"访问记录队列已满，累计丢弃 {self._stats['dropped_queue_full']} 条")
+            return False
+        return True
+
+    def stats(self) -> Dict:
+        return {**self._stats, "queued": self._queue.qsize(), "queue_size": self._queue.maxsize}
+
+    def _take(self, batch: List[Dict]):
+        """不等待地从队列中取记录，直到取空或本批已满"""
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _collect(self):
+        """等待第一条记录，然后在 interval 内攒够一批，放在 _pending 中"""
+        batch = self._pending
+        batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.interval
+        while len(batch) < self.batch_size:
+            self._take(batch)
+            timeout = deadline - loop.time()
+            if len(batch) >= self.batch_size or timeout <= 0 or self._stopping:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write(self, batch: List[Dict]):
+        """一条多行 INSERT 写入一批记录，失败时丢弃该批并计数"""
+        try:
+            async with self.session_maker() as db:
+                await db.execute(insert(models.VisitorLog).values(batch))
+                await db.commit()
+        except Exception as e:
+            self._stats["dropped_write_error"] += len(batch)
+            log.error(f"批量写入 {len(batch)} 条访问记录失败: {str(e)}")
+            return
+        self._stats["written"] += len(batch)
+        self._stats["batches"] += 1
+
+    async def flush(self) -> int:
+        """立即写入队列中的所有记录，返回写入的条数"""
+        written = self._stats["written"]
+        while self._pending or not self._queue.empty():
+            batch, self._pending = self._pending, []
+            self._take(batch)
+            await self._write(batch)
+        return self._stats["written"] - written
+
+    async def _run(self):
+        while not self._stopping:
+            await self._collect()
+            batch, self._pending = self._pending, []
+            self._writing = True
+            try:
+                await self._write(batch)
+            finally:
+                self._writing = False
+
+    def start(self):
+        """启动后台写入任务"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写入队列中剩余的记录"""
+        if self._task is not None:
+            # 正在写入的一批写完后再退出，只取消等待，已攒的记录由 flush 写入
+            self._stopping = True
+            if not self._writing:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+visitor_log_writer = VisitorLogWriter()
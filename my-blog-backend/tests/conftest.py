@@ -0,0 +1,18 @@
+"""
+测试配置
+
+模块导入时会按环境变量创建数据库引擎（不会立即连接），这里提供占位的连接配置，
+需要数据库的测试自行创建 SQLite 引擎。
+"""
+
+import os
+
+for name, value in {
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "3306",
+    "DB_NAME": "test",
+    "JWT_SECRET": "test",
+}.items():
+    os.environ.setdefault(name, value)
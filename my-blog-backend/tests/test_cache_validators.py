@@ -0,0 +1,32 @@
+"""条件请求校验测试"""
+
+from starlette.requests import Request
+
+from src.utils.cache import CacheValidators, is_not_modified
+
+
+def make_request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+VALIDATORS = CacheValidators(etag='"abc"', last_modified=1700000000)
+
+
+def test_matching_etag_is_not_modified():
+    assert is_not_modified(make_request(if_none_match='"abc"'), VALIDATORS)
+    assert is_not_modified(make_request(if_none_match='"x", W/"abc"'), VALIDATORS)
+
+
+def test_wildcard_etag_is_not_honored():
+    # 校验信息不能说明资源存在，* 不应得到304
+    assert not is_not_modified(make_request(if_none_match="*"), VALIDATORS)
+
+
+def test_if_none_match_takes_precedence():
+    request = make_request(if_none_match='"old"', if_modified_since="Fri, 01 Jan 2100 00:00:00 GMT")
+    assert not is_not_modified(request, VALIDATORS)
@@ -0,0 +1,17 @@
+"""Markdown渲染测试"""
+
+from src.utils.markdown_render import render_markdown
+
+
+def test_table_cell_style_keeps_only_text_align():
+    html = render_markdown('| a |\n|:-:|\n| <td style="color:red;position:fixed;text-align:right">x</td> |').html
+    assert 'style="text-align:center"' in html
+    assert 'style="text-align:right"' in html
+    assert "color" not in html and "position" not in html
+
+
+def test_excerpt_skips_script_and_style_content():
+    rendered = render_markdown("hello <script>alert(1)</script> world <style>p{color:red}</style> <b>bold</b>")
+    assert rendered.excerpt == "hello world bold"
+    assert rendered.word_count == 3
+    assert "alert" not in rendered.html
@@ -0,0 +1,52 @@
+import asyncio
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.model import models
+from src.model.database import PrimarySession, begin_request_db_state
+
+
+def run_in_session(work):
+    """在 SQLite 上的主库会话中执行 work(db)，返回请求的读写状态"""
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Tag.__table__.create)
+        session_maker = async_sessionmaker(
+            bind=engine, class_=AsyncSession, sync_session_class=PrimarySession, expire_on_commit=False
+        )
+        async with session_maker() as db:
+            await db.execute(insert(models.Tag).values(id=1, name="vue"))
+            await db.commit()
+
+        state = begin_request_db_state()
+        async with session_maker() as db:
+            await work(db)
+        await engine.dispose()
+        return state
+
+    return asyncio.run(main())
+
+
+def test_select_does_not_mark_write():
+    async def work(db):
+        await db.execute(select(models.Tag))
+
+    assert run_in_session(work)["wrote"] is False
+
+
+def test_core_update_marks_write():
+    async def work(db):
+        await db.execute(update(models.Tag).where(models.Tag.id == 1).values(article_count=models.Tag.article_count + 1))
+        await db.commit()
+
+    assert run_in_session(work)["wrote"] is True
+
+
+def test_orm_flush_marks_write():
+    async def work(db):
+        db.add(models.Tag(name="python"))
+        await db.commit()
+
+    assert run_in_session(work)["wrote"] is True
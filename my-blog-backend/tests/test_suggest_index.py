@@ -0,0 +1,53 @@
+from src.utils.suggest_index import SuggestIndex, build_keys
+
+
+def make_index():
+    index = SuggestIndex()
+    index.add("article", 1, "Vue Router Guide")
+    index.add("article", 2, "MySQL 数据库优化")
+    index.add("article", 3, "Python 笔记")
+    index.add("tag", 1, "Vue")
+    return index
+
+
+def ids(results):
+    return [(item["type"], item["id"]) for item in results]
+
+
+def test_keys_contain_no_whitespace():
+    assert all(not any(char.isspace() for char in key) for key, _ in build_keys("Vue Router Guide"))
+
+
+def test_multi_word_prefix():
+    index = make_index()
+    assert ids(index.suggest("vue r")) == [("article", 1)]
+    assert ids(index.suggest("vue router g")) == [("article", 1)]
+    assert ids(index.suggest("router  guide")) == [("article", 1)]
+
+
+def test_mixed_language_multi_word_prefix():
+    index = make_index()
+    assert ids(index.suggest("mysql 数")) == [("article", 2)]
+    assert ids(index.suggest("Python 笔")) == [("article", 3)]
+
+
+def test_prefix_without_spaces_still_matches():
+    index = make_index()
+    assert ids(index.suggest("vuer")) == [("article", 1)]
+    assert ids(index.suggest("vue")) == [("tag", 1), ("article", 1)]
+
+
+def test_pinyin_prefix():
+    index = make_index()
+    assert ids(index.suggest("shujuku")) == [("article", 2)]
+    assert ids(index.suggest("sjk")) == [("article", 2)]
+
+
+def test_best_match_beyond_many_earlier_keys():
+    # 前缀范围内排在前面的大量键不会挤掉后面的更佳匹配
+    index = SuggestIndex()
+    for article_id in range(1, 1001):
+        index.add("article", article_id, f"aa {article_id}")
+    index.add("tag", 1, "az")
+    assert ids(index.suggest("a", limit=3))[0] == ("tag", 1)
+    assert len(index.suggest("a", limit=3)) == 3
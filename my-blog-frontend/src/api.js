@@ -96,6 +96,33 @@ export const getArticles = async (page = 1, limit = 10, knowledge_base = null) =
   }
 };
 
+// 搜索文章，结果中的 title_highlight 和 snippet 为已转义的HTML
+export const searchArticles = async (q, page = 1, limit = 10, filters = {}) => {
+  const skip = (page - 1) * limit;
+  const params = { q, skip, limit, ...filters };
+
+  try {
+    return await apiClient.get('/api/search', { params });
+  } catch (error) {
+    return handleApiError(error, () => searchArticles(q, page, limit, filters));
+  }
+};
+
+// 输入联想（文章标题、标签、知识库分类），types 为逗号分隔的类型
+export const getSuggestions = async (q, limit = 10, types = null) => {
+  const params = { q, limit };
+  if (types) {
+    params.types = types;
+  }
+
+  try {
+    const response = await apiClient.get('/api/suggest', { params });
+    return response.data;
+  } catch (error) {
+    return handleApiError(error, () => getSuggestions(q, limit, types));
+  }
+};
+
 // 获取文章详情
 export const getArticle = async (id) => {
   try {
@@ -106,6 +133,37 @@ export const getArticle = async (id) => {
   }
 };
 
+// 按标签、分类、日期筛选文章，filters: { tags: [], categories: [], date_from, date_to, knowledge_base }
+// 数组参数以 tags=1&tags=2 的形式传递
+export const filterArticles = async (filters = {}, page = 1, limit = 10) => {
+  const params = { ...filters, skip: (page - 1) * limit, limit };
+  try {
+    return await apiClient.get('/api/articles', { params, paramsSerializer: { indexes: null } });
+  } catch (error) {
+    return handleApiError(error, () => filterArticles(filters, page, limit));
+  }
+};
+
+// 获取分面计数（标签、分类、月份），筛选参数同 filterArticles
+export const getArticleFacets = async (filters = {}) => {
+  try {
+    const response = await apiClient.get('/api/articles/facets', { params: filters, paramsSerializer: { indexes: null } });
+    return response.data;
+  } catch (error) {
+    return handleApiError(error, () => getArticleFacets(filters));
+  }
+};
+
+// 获取相关文章
+export const getRelatedArticles = async (id, limit = 6) => {
+  try {
+    const response = await apiClient.get(`/api/articles/${id}/related`, { params: { limit } });
+    return response.data;
+  } catch (error) {
+    return handleApiError(error, () => getRelatedArticles(id, limit));
+  }
+};
+
 // 创建文章
 export const createArticle = async (articleData) => {
   try {
@@ -124,6 +182,16 @@ export const getTags = async () => {
   }
 };
 
+// 获取热门标签及其已发布文章数，用于标签云
+export const getPopularTags = async (limit = 30) => {
+  try {
+    const response = await apiClient.get('/api/tags', { params: { with_counts: true, sort: 'popular', limit } });
+    return response.data;
+  } catch (error) {
+    return handleApiError(error, () => getPopularTags(limit));
+  }
+};
+
 // 创建标签
 export const createTag = async (tagName) => {
   try {
@@ -143,6 +211,29 @@ export const getComments = async (articleId, page = 1, limit = 50) => {
   }
 };
 
+// 按楼层获取评论树，cursor 取自上一页响应头 X-Next-Cursor
+export const getCommentThreads = async (articleId, { limit = 10, cursor = null, depth = 3 } = {}) => {
+  const params = { limit, depth };
+  if (cursor) {
+    params.cursor = cursor;
+  }
+  try {
+    return await apiClient.get(`/api/articles/${articleId}/comment-threads`, { params });
+  } catch (error) {
+    return handleApiError(error, () => getCommentThreads(articleId, { limit, cursor, depth }));
+  }
+};
+
+// 展开评论下未加载的深层回复
+export const getCommentReplies = async (commentId, depth = 3) => {
+  try {
+    const response = await apiClient.get(`/api/comments/${commentId}/replies`, { params: { depth } });
+    return response.data;
+  } catch (error) {
+    return handleApiError(error, () => getCommentReplies(commentId, depth));
+  }
+};
+
 // 创建评论
 export const createComment = async (content, articleId, replyToId = null) => {
   try {
@@ -250,6 +341,26 @@ export const getIpGeolocation = async (ip) => {
   }
 };
 
+// 批量获取IP地理位置信息（一次最多1000个）
+export const getIpGeolocationBatch = async (ips) => {
+  try {
+    const response = await apiClient.post('/api/admin/ip-geolocation/batch', { ips });
+    return response.data;
+  } catch (error) {
+    console.error('批量获取IP地理位置失败:', error);
+    return null;
+  }
+};
+
+// 按省份或城市统计访问量
+export const getVisitorGeoStats = async (days = 7, level = 'province') => {
+  try {
+    return await apiClient.get('/api/admin/visitor-geo', { params: { days, level } });
+  } catch (error) {
+    return handleApiError(error, () => getVisitorGeoStats(days, level));
+  }
+};
+
 // 获取文章详情
 export const getArticleDetail = async (articleId) => {
   try {
@@ -162,4 +162,11 @@ export function renderMarkdown(content) {
 }
 
 // 导出函数供外部使用
+// 高亮服务端渲染的HTML中的代码块
+export function highlightCodeBlocks(container) {
+  if (container) {
+    Prism.highlightAllUnder(container)
+  }
+}
+
 export { attachImageEventListeners }
\ No newline at end of file